@@ -0,0 +1,113 @@
+"""Times item analysis of a quiz with many logged submissions.
+
+    python -m benchmarks.item_analysis --submissions 100000 --questions 10
+
+--url must point to a scratch database, tables are created and dropped.
+"""
+import argparse
+import asyncio
+import random
+import time
+from itertools import groupby
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from quiz.item_analysis import correctness_matrix, item_statistics
+from quiz.models.db_models import User, Company, Quiz, Question, Result, ResultAnswer
+from quiz.service import AnalyticService
+
+
+def seed(db, submissions: int, questions: int) -> int:
+    owner = User(email="owner@example.com", username="owner", password="x")
+    db.add(owner)
+    db.commit()
+    company = Company(name="benchmark", description="benchmark", owner=owner.id)
+    db.add(company)
+    db.commit()
+    quiz = Quiz(title="quiz", description="", company_id=company.id)
+    db.add(quiz)
+    db.commit()
+    db.execute(
+        Question.__table__.insert(),
+        [{"question_title": f"q{i}", "quiz_id": quiz.id} for i in range(questions)],
+    )
+    question_ids = [question.id for question in db.query(Question.id)]
+    db.execute(
+        Result.__table__.insert(),
+        [
+            {
+                "user_id": owner.id,
+                "company_id": company.id,
+                "quiz_id": quiz.id,
+                "result": 0,
+                "correct_answers": 0,
+                "attempts": 1,
+                "average_result": 0,
+            }
+            for _ in range(submissions)
+        ],
+    )
+    result_ids = [result.id for result in db.query(Result.id)]
+    # harder questions are answered correctly less often
+    difficulty = [random.uniform(0.2, 0.9) for _ in question_ids]
+    layout = ",".join(str(question_id) for question_id in question_ids)
+    db.execute(
+        ResultAnswer.__table__.insert(),
+        [
+            {
+                "result_id": result_id,
+                "quiz_id": quiz.id,
+                "question_ids": layout,
+                "answer_ids": layout,
+                "correct": "".join(
+                    "1" if random.random() < chance else "0" for chance in difficulty
+                ),
+            }
+            for result_id in result_ids
+        ],
+    )
+    db.commit()
+    return quiz.id
+
+
+async def run(args: argparse.Namespace) -> None:
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        quiz_id = seed(db, args.submissions, args.questions)
+        service = AnalyticService(db=db, credentials=None)
+
+        start = time.perf_counter()
+        analysis = await service.query_item_analysis(quiz_id=quiz_id)
+        total = time.perf_counter() - start
+
+        rows = [
+            (layout, "".join(correct for _, correct in group))
+            for layout, group in groupby(
+                db.query(ResultAnswer.question_ids, ResultAnswer.correct),
+                key=lambda row: row[0],
+            )
+        ]
+        question_ids = [question.id for question in db.query(Question.id)]
+        start = time.perf_counter()
+        item_statistics(correctness_matrix(rows, question_ids))
+        compute = time.perf_counter() - start
+
+        print(f"submissions: {analysis.submissions}, questions: {args.questions}")
+        print(f"cronbach alpha: {analysis.cronbach_alpha:.3f}")
+        print(f"load + analyse: {total * 1000:.1f} ms")
+        print(f"matrix + statistics only: {compute * 1000:.1f} ms")
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--submissions", type=int, default=100000)
+    parser.add_argument("--questions", type=int, default=10)
+    asyncio.run(run(parser.parse_args()))
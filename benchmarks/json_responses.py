@@ -0,0 +1,90 @@
+"""Compares response serialization paths on list endpoint payloads.
+
+    python -m benchmarks.json_responses --items 1000 --repeat 50
+
+default: response_model validation + jsonable_encoder + JSONResponse
+orjson: response_model validation + jsonable_encoder + ORJSONResponse
+fast: FastJSONResponse returned by the service, no validation
+"""
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from core.responses import FastJSONResponse
+from quiz.schemas.result import QuizResultAvarage
+from quiz.schemas.user import UserInfo
+
+
+def user_list(items: int) -> list:
+    return [
+        UserInfo(id=i, email=f"user{i}@example.com", username=f"user{i}")
+        for i in range(items)
+    ]
+
+
+def quiz_average_results(items: int) -> list:
+    now = datetime.utcnow()
+    return [
+        QuizResultAvarage(
+            user_id=i, average_result=i % 100 / 3, created_at=now - timedelta(hours=i)
+        )
+        for i in range(items)
+    ]
+
+
+async def through_response_model(field, content, response_class) -> bytes:
+    value = await serialize_response(field=field, response_content=content)
+    return response_class(value).body
+
+
+async def fast(field, content, response_class) -> bytes:
+    return FastJSONResponse(content).body
+
+
+async def timed(path, field, content, response_class, repeat: int) -> tuple:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        body = await path(field, content, response_class)
+    return (time.perf_counter() - start) / repeat, body
+
+
+async def run(args: argparse.Namespace) -> None:
+    payloads = {
+        "user_list": (List[UserInfo], user_list(args.items)),
+        "quiz_avarege_result": (
+            List[QuizResultAvarage],
+            quiz_average_results(args.items),
+        ),
+    }
+    for name, (model, content) in payloads.items():
+        field = create_response_field(name=name, type_=model)
+        default_time, default_body = await timed(
+            through_response_model, field, content, JSONResponse, args.repeat
+        )
+        orjson_time, orjson_body = await timed(
+            through_response_model, field, content, ORJSONResponse, args.repeat
+        )
+        fast_time, fast_body = await timed(fast, field, content, None, args.repeat)
+        assert json.loads(default_body) == json.loads(orjson_body)
+        assert json.loads(default_body) == json.loads(fast_body)
+        print(f"{name} ({args.items} items)")
+        print(f"  default: {default_time * 1000:.2f} ms")
+        print(
+            f"  orjson:  {orjson_time * 1000:.2f} ms "
+            f"({default_time / orjson_time:.1f}x)"
+        )
+        print(f"  fast:    {fast_time * 1000:.2f} ms ({default_time / fast_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--items", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=50)
+    asyncio.run(run(parser.parse_args()))
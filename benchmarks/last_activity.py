@@ -0,0 +1,132 @@
+"""Compares per-employee last activity lookups with the GROUP BY query.
+
+    python -m benchmarks.last_activity --employees 10000
+
+--url must point to a scratch database, tables are created and dropped.
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine, desc
+from sqlalchemy.orm import sessionmaker
+
+from core.database import Base
+from quiz.models.db_models import User, Company, Quiz, Result, company_user
+from quiz.service import AnalyticService
+
+
+def seed(db, employees: int, results_per_employee: int, quizzes: int) -> int:
+    owner = User(email="owner@example.com", username="owner", password="x")
+    db.add(owner)
+    db.commit()
+    company = Company(name="benchmark", description="benchmark", owner=owner.id)
+    db.add(company)
+    db.commit()
+    quiz_ids = []
+    for number in range(quizzes):
+        quiz = Quiz(title=f"quiz {number}", description="", company_id=company.id)
+        db.add(quiz)
+        db.commit()
+        quiz_ids.append(quiz.id)
+
+    db.execute(
+        User.__table__.insert(),
+        [
+            {"email": f"user{i}@example.com", "username": f"user{i}", "password": "x"}
+            for i in range(employees)
+        ],
+    )
+    user_ids = [user.id for user in db.query(User.id).filter(User.id != owner.id)]
+    db.execute(
+        company_user.insert(),
+        [{"company_id": company.id, "user_id": user_id} for user_id in user_ids],
+    )
+    now = datetime.utcnow()
+    db.execute(
+        Result.__table__.insert(),
+        [
+            {
+                "user_id": user_id,
+                "company_id": company.id,
+                "quiz_id": random.choice(quiz_ids),
+                "result": 50,
+                "correct_answers": 1,
+                "attempts": 1,
+                "average_result": 50,
+                "created_at": now - timedelta(minutes=random.randint(0, 100000)),
+            }
+            for user_id in user_ids
+            for _ in range(results_per_employee)
+        ],
+    )
+    db.commit()
+    return company.id
+
+
+async def per_employee_queries(db, company_id: int) -> list:
+    company = db.query(Company).filter_by(id=company_id).first()
+    activity = []
+    for employee in company.employees:
+        result = (
+            db.query(Result)
+            .filter_by(user_id=employee.id)
+            .order_by(desc("created_at"))
+            .first()
+        )
+        activity.append((employee.id, result.created_at))
+    return activity
+
+
+async def group_by_query(db, company_id: int, page_size: int) -> list:
+    service = AnalyticService(db=db, credentials=None)
+    activity = []
+    skip = 0
+    while True:
+        page = await service.get_employees_last_activity(
+            company_id=company_id, skip=skip, limit=page_size
+        )
+        activity.extend((item.user_id, item.last_activity) for item in page)
+        if len(page) < page_size:
+            return activity
+        skip += page_size
+
+
+async def timed(coroutine) -> tuple:
+    start = time.perf_counter()
+    result = await coroutine
+    return time.perf_counter() - start, result
+
+
+async def run(args: argparse.Namespace) -> None:
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        company_id = seed(db, args.employees, args.results_per_employee, args.quizzes)
+        old_time, old_activity = await timed(per_employee_queries(db, company_id))
+        db.expunge_all()
+        new_time, new_activity = await timed(
+            group_by_query(db, company_id, args.page_size)
+        )
+        assert sorted(old_activity) == sorted(new_activity)
+        results = args.employees * args.results_per_employee
+        print(f"employees: {args.employees}, results: {results}")
+        print(f"per-employee queries: {old_time * 1000:.1f} ms")
+        print(f"GROUP BY (pages of {args.page_size}): {new_time * 1000:.1f} ms")
+        print(f"speedup: {old_time / new_time:.1f}x")
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--employees", type=int, default=10000)
+    parser.add_argument("--results-per-employee", type=int, default=5)
+    parser.add_argument("--quizzes", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=1000)
+    asyncio.run(run(parser.parse_args()))
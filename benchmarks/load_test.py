@@ -0,0 +1,445 @@
+"""Load test of the quiz lifecycle, reports RPS and p50/p95/p99 per endpoint.
+
+    python -m benchmarks.load_test --base-url http://localhost:8000 --users 20
+    python -m benchmarks.load_test --output before.json
+    python -m benchmarks.load_test --baseline before.json --threshold 10
+
+Users register and log in, an owner creates a company and its quizzes. Then,
+for --duration seconds, --users virtual users read and pass random quizzes,
+--dashboards owners poll the analytics endpoints and --exporters owners run
+CSV exports to completion.
+
+Without --base-url the app runs in-process against --url, with tables
+created there, so point it at a scratch database. Answer stats are flushed
+into it too and warm-up is off. Redis comes from REDIS_HOST as usual, its
+keys are written under a random prefix and deleted afterwards. --output
+saves the report, --baseline compares against a saved one and exits with 1
+if any endpoint's p95 grew or its RPS dropped by more than --threshold
+percent, e.g. to compare two commits.
+
+With --idp DIR (see `manage.py idp-init`) the virtual users authenticate with
+RS256 tokens from the local identity provider instead of their login tokens,
+so every request goes through the JWKS verification. A --base-url server has
+to run with JWKS_URL pointing at that provider, in-process it is set here.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+import numpy
+
+QUESTION_ANSWERS = 4
+DASHBOARD_ENDPOINTS = (
+    "/analytic/quiz_statistics/{quiz_id}",
+    "/analytic/quiz_avarege_result/{quiz_id}",
+    "/analytic/item_analysis/{quiz_id}",
+    "/analytic/question_distribution/{quiz_id}",
+    "/analytic/company_statistics/{company_id}",
+    "/analytic/leaderboard/company/{company_id}",
+)
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.started = time.perf_counter()
+        self.elapsed = None
+
+    async def request(
+        self, client: httpx.AsyncClient, method: str, name: str, url: str, **kwargs
+    ) -> httpx.Response:
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            self.latencies[name].append(time.perf_counter() - start)
+            raise
+        self.latencies[name].append(time.perf_counter() - start)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+    def stop(self) -> None:
+        self.elapsed = time.perf_counter() - self.started
+
+    def report(self) -> Dict[str, dict]:
+        report = {}
+        for name, latencies in sorted(self.latencies.items()):
+            p50, p95, p99 = numpy.percentile(latencies, [50, 95, 99]) * 1000
+            report[name] = {
+                "count": len(latencies),
+                "errors": self.errors[name],
+                "rps": len(latencies) / self.elapsed,
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+            }
+        return report
+
+
+def auth(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def quiz_payload(number: int, questions: int) -> dict:
+    return {
+        "id": 0,
+        "title": f"load test quiz {number}",
+        "description": "load test",
+        "questions": [
+            {
+                "question_title": f"question {question}",
+                "answers": [
+                    {"answer_text": f"answer {answer}", "is_correct": answer == 0}
+                    for answer in range(QUESTION_ANSWERS)
+                ],
+            }
+            for question in range(questions)
+        ],
+    }
+
+
+async def register(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    email: str,
+    password: str,
+    idp=None,
+) -> str:
+    response = await recorder.request(
+        client,
+        "POST",
+        "POST /user/register",
+        "/user/register",
+        json={
+            "email": email,
+            "password": password,
+            "confirm_password": password,
+            "username": email.split("@")[0],
+        },
+    )
+    response.raise_for_status()
+    response = await recorder.request(
+        client,
+        "POST",
+        "POST /user/login",
+        "/user/login",
+        json={"email": email, "password": password},
+    )
+    response.raise_for_status()
+    if idp is not None:
+        return idp.mint(email=email, expires_in=86400)
+    return response.json()["token"]
+
+
+async def setup(
+    client: httpx.AsyncClient, recorder: Recorder, args: argparse.Namespace
+) -> tuple:
+    run_id = uuid.uuid4().hex[:8]
+    password = "load-test"
+    idp = None
+    if args.idp:
+        from core.local_idp import LocalIdentityProvider
+
+        idp = LocalIdentityProvider(args.idp)
+    owner_token = await register(
+        client, recorder, f"owner-{run_id}@example.com", password, idp
+    )
+    user_tokens = await asyncio.gather(
+        *(
+            register(client, recorder, f"user{i}-{run_id}@example.com", password, idp)
+            for i in range(args.users)
+        )
+    )
+
+    response = await recorder.request(
+        client,
+        "POST",
+        "POST /company/create",
+        "/company/create",
+        json={"name": f"load test {run_id}", "description": "load test"},
+        headers=auth(owner_token),
+    )
+    response.raise_for_status()
+    company_id = response.json()["id"]
+
+    quiz_ids = []
+    for number in range(args.quizzes):
+        response = await recorder.request(
+            client,
+            "POST",
+            "POST /quiz/create/{company_id}",
+            f"/quiz/create/{company_id}",
+            json=quiz_payload(number, args.questions),
+            headers=auth(owner_token),
+        )
+        response.raise_for_status()
+        quiz_ids.append(response.json()["id"])
+    return owner_token, list(user_tokens), company_id, quiz_ids
+
+
+async def quiz_taker(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    token: str,
+    quiz_ids: List[int],
+    deadline: float,
+) -> None:
+    while time.perf_counter() < deadline:
+        quiz_id = random.choice(quiz_ids)
+        response = await recorder.request(
+            client,
+            "GET",
+            "GET /quiz/read_question/{quiz_id}",
+            f"/quiz/read_question/{quiz_id}",
+            headers=auth(token),
+        )
+        if response.status_code != 200:
+            continue
+        answers = [
+            {
+                "question_id": question["id"],
+                "choosed_answer_id": random.choice(question["answers"])["id"],
+            }
+            for question in response.json()["questions"]
+        ]
+        await recorder.request(
+            client,
+            "POST",
+            "POST /quiz/pass/{quiz_id}",
+            f"/quiz/pass/{quiz_id}",
+            json={"answers": answers},
+            headers=auth(token),
+        )
+
+
+async def dashboard(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    token: str,
+    company_id: int,
+    quiz_ids: List[int],
+    deadline: float,
+) -> None:
+    while time.perf_counter() < deadline:
+        quiz_id = random.choice(quiz_ids)
+        for template in DASHBOARD_ENDPOINTS:
+            url = template.format(quiz_id=quiz_id, company_id=company_id)
+            await recorder.request(
+                client, "GET", f"GET {template}", url, headers=auth(token)
+            )
+
+
+async def exporter(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    token: str,
+    company_id: int,
+    deadline: float,
+) -> None:
+    while time.perf_counter() < deadline:
+        response = await recorder.request(
+            client,
+            "POST",
+            "POST /quiz/export/company/{company_id}",
+            f"/quiz/export/company/{company_id}",
+            headers=auth(token),
+        )
+        if response.status_code != 202:
+            await asyncio.sleep(1)
+            continue
+        job_id = response.json()["id"]
+        started = time.perf_counter()
+        status = response.json()["status"]
+        while status not in ("done", "failed"):
+            await asyncio.sleep(0.2)
+            response = await recorder.request(
+                client,
+                "GET",
+                "GET /quiz/export/{job_id}",
+                f"/quiz/export/{job_id}",
+                headers=auth(token),
+            )
+            status = response.json()["status"]
+        if status == "done":
+            await recorder.request(
+                client,
+                "GET",
+                "GET /quiz/export/{job_id}/download",
+                f"/quiz/export/{job_id}/download",
+                headers=auth(token),
+            )
+        # end to end time of an export, polling included
+        recorder.latencies["export job"].append(time.perf_counter() - started)
+
+
+def print_report(title: str, report: Dict[str, dict]) -> None:
+    print(title)
+    print(
+        f"  {'endpoint':<52} {'count':>7} {'errors':>6} {'rps':>8} "
+        f"{'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+    )
+    for name, row in report.items():
+        print(
+            f"  {name:<52} {row['count']:>7} {row['errors']:>6} {row['rps']:>8.1f} "
+            f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f}"
+        )
+
+
+def regressions(report: dict, baseline: dict, threshold: float) -> List[str]:
+    found = []
+    for phase, endpoints in baseline.items():
+        for name, before in endpoints.items():
+            after = report.get(phase, {}).get(name)
+            if after is None:
+                continue
+            if after["p95_ms"] > before["p95_ms"] * (1 + threshold / 100):
+                found.append(
+                    f"{name}: p95 {before['p95_ms']:.1f} -> {after['p95_ms']:.1f} ms"
+                )
+            if phase == "load" and after["rps"] < before["rps"] * (1 - threshold / 100):
+                found.append(f"{name}: rps {before['rps']:.1f} -> {after['rps']:.1f}")
+    return found
+
+
+async def load(client: httpx.AsyncClient, args: argparse.Namespace) -> dict:
+    setup_recorder = Recorder()
+    owner_token, user_tokens, company_id, quiz_ids = await setup(
+        client, setup_recorder, args
+    )
+    setup_recorder.stop()
+
+    recorder = Recorder()
+    deadline = time.perf_counter() + args.duration
+    await asyncio.gather(
+        *(
+            quiz_taker(client, recorder, token, quiz_ids, deadline)
+            for token in user_tokens
+        ),
+        *(
+            dashboard(client, recorder, owner_token, company_id, quiz_ids, deadline)
+            for _ in range(args.dashboards)
+        ),
+        *(
+            exporter(client, recorder, owner_token, company_id, deadline)
+            for _ in range(args.exporters)
+        ),
+    )
+    recorder.stop()
+    return {"setup": setup_recorder.report(), "load": recorder.report()}
+
+
+def in_process_app(url: str, namespace: str):
+    # warm-up would only reach the database of core.database
+    os.environ.setdefault("WARMUP", "0")
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from core.base import Base
+    from core.cache import analytics_cache, quiz_payloads
+    from core.database import get_db
+    from main import app
+    from quiz.answer_stats import answer_stats
+    from quiz.answer_store import answer_store
+    from quiz.leaderboard import leaderboard
+
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    analytics_cache.prefix = f"load-cache:{namespace}"
+    leaderboard.prefix = f"load-leaderboard:{namespace}"
+    answer_stats.prefix = f"load-answer-stats:{namespace}"
+    answer_stats.session_factory = session
+    answer_store.prefix = f"load-answers:{namespace}"
+    quiz_payloads.prefix = f"load-payload:{namespace}"
+
+    def get_scratch_db():
+        db = session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = get_scratch_db
+    return app
+
+
+async def run(args: argparse.Namespace) -> int:
+    if args.base_url:
+        client = httpx.AsyncClient(
+            base_url=args.base_url,
+            timeout=60,
+            limits=httpx.Limits(max_connections=args.users + args.dashboards + 8),
+        )
+        report = await load(client, args)
+    else:
+        if args.idp:
+            from core.local_idp import LocalIdentityProvider
+
+            os.environ["JWKS_URL"] = LocalIdentityProvider(args.idp).jwks_url
+        from core.database import redis_db
+        from quiz.answer_stats import answer_stats
+
+        namespace = uuid.uuid4().hex
+        app = in_process_app(args.url, namespace)
+        client = httpx.AsyncClient(app=app, base_url="http://load-test", timeout=60)
+        await app.router.startup()
+        try:
+            report = await load(client, args)
+        finally:
+            db = answer_stats.session_factory()
+            try:
+                await answer_stats.flush(db)
+            finally:
+                db.close()
+            async for key in redis_db.scan_iter(match=f"load-*:{namespace}*"):
+                await redis_db.delete(key)
+            await app.router.shutdown()
+    await client.aclose()
+
+    print_report("setup", report["setup"])
+    print_report(f"load ({args.duration}s)", report["load"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            found = regressions(report, json.load(f), args.threshold)
+        for line in found:
+            print(f"REGRESSION {line}")
+        if found:
+            return 1
+        print(f"no regressions over {args.threshold}% against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--base-url", help="running server, default in-process")
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--dashboards", type=int, default=2)
+    parser.add_argument("--exporters", type=int, default=1)
+    parser.add_argument("--quizzes", type=int, default=5)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--output", help="save the report as JSON")
+    parser.add_argument("--baseline", help="report JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="percent")
+    parser.add_argument("--idp", help="local identity provider directory")
+    sys.exit(asyncio.run(run(parser.parse_args())))
@@ -0,0 +1,534 @@
+"""Micro-benchmarks of the expensive quiz.service methods.
+
+    python -m benchmarks.services --users 500 --quizzes 10 --output run.json
+    python -m benchmarks.services --url postgresql://localhost/scratch
+    python -m benchmarks.services --baseline run.json
+
+Seeds --url with a company of --users employees, --quizzes quizzes and
+--attempts results per employee, plus their Redis answer hashes, then times
+every case --repeat times after a warm-up run. Each case reports min and
+median time, SQL statements per call and peak Python memory of one call
+traced by tracemalloc. Cached analytics methods get their scopes bumped
+before every call, so the numbers are for a cache miss.
+
+--url must point to a scratch database, tables are created and dropped.
+Redis keys, answer hashes included, are written under a random prefix and
+deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.auth import Auth
+from core.cache import analytics_cache, quiz_payloads
+from core.database import Base, redis_db
+from core.query_stats import QueryStats, current_stats
+from quiz.answer_stats import answer_stats
+from quiz.answer_store import answer_store
+from quiz.leaderboard import leaderboard
+from quiz.models.db_models import (
+    Answer,
+    AnswerStat,
+    Company,
+    Question,
+    Quiz,
+    Result,
+    ResultAnswer,
+    ResultRollup,
+    User,
+    company_user,
+)
+from quiz.schemas.quiz import QuizCreate, QuizPass
+from quiz.schemas.result import RollupGranularity
+from quiz.service import AnalyticService, QuizService
+
+
+class Case:
+    def __init__(
+        self,
+        name: str,
+        call: Callable[[], Awaitable],
+        before: Optional[Callable[[], Awaitable]] = None,
+    ):
+        self.name = name
+        self.call = call
+        self.before = before
+
+    async def run_once(self, stats: QueryStats) -> float:
+        if self.before is not None:
+            await self.before()
+        token = current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            await self.call()
+        finally:
+            elapsed = time.perf_counter() - start
+            current_stats.reset(token)
+        return elapsed
+
+    async def measure(self, repeat: int) -> dict:
+        await self.run_once(QueryStats())
+        times = []
+        stats = QueryStats()
+        for _ in range(repeat):
+            stats = QueryStats()
+            times.append(await self.run_once(stats))
+
+        tracemalloc.start()
+        try:
+            await self.run_once(QueryStats())
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            "min_ms": min(times) * 1000,
+            "median_ms": statistics.median(times) * 1000,
+            "queries": stats.count,
+            "peak_kib": peak / 1024,
+        }
+
+
+def seed(db, args: argparse.Namespace) -> dict:
+    owner = User(email="owner@example.com", username="owner", password="benchmark")
+    db.add(owner)
+    db.commit()
+    company = Company(name="benchmark", description="benchmark", owner=owner.id)
+    db.add(company)
+    db.commit()
+
+    db.execute(
+        User.__table__.insert(),
+        [
+            {
+                "email": f"user{i}@example.com",
+                "username": f"user{i}",
+                "password": "benchmark",
+                "passed_questions": 0,
+                "correct_answers": 0,
+            }
+            for i in range(args.users)
+        ],
+    )
+    user_ids = [user.id for user in db.query(User.id).filter(User.id != owner.id)]
+    db.execute(
+        company_user.insert(),
+        [{"company_id": company.id, "user_id": user_id} for user_id in user_ids],
+    )
+
+    quizzes = {}
+    for number in range(args.quizzes):
+        quiz = Quiz(title=f"quiz {number}", description="", company_id=company.id)
+        db.add(quiz)
+        db.flush()
+        db.execute(
+            Question.__table__.insert(),
+            [
+                {"question_title": f"question {i}", "quiz_id": quiz.id}
+                for i in range(args.questions)
+            ],
+        )
+        question_ids = [
+            question.id for question in db.query(Question.id).filter_by(quiz_id=quiz.id)
+        ]
+        db.execute(
+            Answer.__table__.insert(),
+            [
+                {
+                    "answer_text": f"answer {i}",
+                    "is_correct": i == 0,
+                    "question_id": question_id,
+                }
+                for question_id in question_ids
+                for i in range(args.answers)
+            ],
+        )
+        answers = {question_id: [] for question_id in question_ids}
+        for answer in (
+            db.query(Answer.id, Answer.question_id, Answer.is_correct)
+            .filter(Answer.question_id.in_(question_ids))
+            .order_by(Answer.id)
+        ):
+            answers[answer.question_id].append((answer.id, answer.is_correct))
+        quizzes[quiz.id] = answers
+    db.commit()
+
+    now = datetime.utcnow()
+    submissions = []
+    for user_id in user_ids:
+        for attempt in range(args.attempts):
+            quiz_id = random.choice(list(quizzes))
+            chosen = {
+                question_id: random.choice(options)
+                for question_id, options in quizzes[quiz_id].items()
+            }
+            correct = sum(is_correct for _, is_correct in chosen.values())
+            submissions.append(
+                {
+                    "user_id": user_id,
+                    "quiz_id": quiz_id,
+                    "chosen": chosen,
+                    "result": correct / len(chosen) * 100,
+                    "correct": correct,
+                    "created_at": now - timedelta(days=random.randrange(90)),
+                }
+            )
+    db.execute(
+        Result.__table__.insert(),
+        [
+            {
+                "user_id": submission["user_id"],
+                "company_id": company.id,
+                "quiz_id": submission["quiz_id"],
+                "result": submission["result"],
+                "correct_answers": submission["correct"],
+                "attempts": 1,
+                "average_result": submission["result"],
+                "created_at": submission["created_at"],
+            }
+            for submission in submissions
+        ],
+    )
+    result_ids = [result.id for result in db.query(Result.id).order_by(Result.id)]
+    db.execute(
+        ResultAnswer.__table__.insert(),
+        [
+            {
+                "result_id": result_id,
+                "quiz_id": submission["quiz_id"],
+                "question_ids": ",".join(map(str, sorted(submission["chosen"]))),
+                "answer_ids": ",".join(
+                    str(submission["chosen"][question_id][0])
+                    for question_id in sorted(submission["chosen"])
+                ),
+                "correct": "".join(
+                    "1" if submission["chosen"][question_id][1] else "0"
+                    for question_id in sorted(submission["chosen"])
+                ),
+            }
+            for result_id, submission in zip(result_ids, submissions)
+        ],
+    )
+
+    rollups = {}
+    answer_counts = {}
+    for submission in submissions:
+        key = (
+            submission["quiz_id"],
+            submission["user_id"],
+            submission["created_at"].date(),
+        )
+        count, total, low, high = rollups.get(key, (0, 0.0, 100.0, 0.0))
+        value = submission["result"]
+        rollups[key] = (count + 1, total + value, min(low, value), max(high, value))
+        for question_id, (answer_id, _) in submission["chosen"].items():
+            answer_counts[answer_id] = (
+                question_id,
+                submission["quiz_id"],
+                answer_counts.get(answer_id, (0, 0, 0))[2] + 1,
+            )
+    db.execute(
+        ResultRollup.__table__.insert(),
+        [
+            {
+                "quiz_id": quiz_id,
+                "user_id": user_id,
+                "day": day,
+                "company_id": company.id,
+                "results_count": count,
+                "results_sum": total,
+                "results_min": low,
+                "results_max": high,
+            }
+            for (quiz_id, user_id, day), (count, total, low, high) in rollups.items()
+        ],
+    )
+    db.execute(
+        AnswerStat.__table__.insert(),
+        [
+            {
+                "answer_id": answer_id,
+                "question_id": question_id,
+                "quiz_id": quiz_id,
+                "count": count,
+            }
+            for answer_id, (question_id, quiz_id, count) in answer_counts.items()
+        ],
+    )
+    db.commit()
+    return {
+        "owner": owner,
+        "company_id": company.id,
+        "user_ids": user_ids,
+        "quizzes": quizzes,
+        "submissions": submissions,
+    }
+
+
+async def seed_answers(submissions: List[dict]) -> None:
+    for submission in submissions:
+        await answer_store.save_answers(
+            user_id=submission["user_id"],
+            quiz_id=submission["quiz_id"],
+            answers={
+                question_id: answer_id
+                for question_id, (answer_id, _) in submission["chosen"].items()
+            },
+        )
+
+
+def credentials_for(email: str) -> HTTPAuthorizationCredentials:
+    return HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=Auth().encode_token(email)
+    )
+
+
+def cases(db, seeded: dict, args: argparse.Namespace) -> List[Case]:
+    company_id = seeded["company_id"]
+    quiz_id = next(iter(seeded["quizzes"]))
+    user_id = seeded["user_ids"][0]
+    owner = credentials_for(seeded["owner"].email)
+    employee = credentials_for("user0@example.com")
+    quizzes = QuizService(db=db, credentials=owner)
+    taker = QuizService(db=db, credentials=employee)
+    analytics = AnalyticService(db=db, credentials=owner)
+    employee_analytics = AnalyticService(db=db, credentials=employee)
+    created = iter(range(1000000))
+
+    def quiz_pass() -> QuizPass:
+        return QuizPass(
+            answers=[
+                {"question_id": question_id, "choosed_answer_id": options[0][0]}
+                for question_id, options in seeded["quizzes"][quiz_id].items()
+            ]
+        )
+
+    def quiz_create() -> QuizCreate:
+        return QuizCreate(
+            id=0,
+            title=f"created {next(created)}",
+            description="benchmark",
+            questions=[
+                {
+                    "question_title": f"question {question}",
+                    "answers": [
+                        {"answer_text": f"answer {answer}", "is_correct": answer == 0}
+                        for answer in range(args.answers)
+                    ],
+                }
+                for question in range(args.create_questions)
+            ],
+        )
+
+    async def miss_quiz_payload():
+        quiz_payloads.clear()
+        await analytics_cache.bump(f"quiz_content:{quiz_id}")
+
+    async def miss_analytics():
+        await analytics_cache.bump(
+            f"quiz:{quiz_id}", f"company:{company_id}", f"user:{user_id}"
+        )
+
+    return [
+        Case("pass_quiz", lambda: taker.pass_quiz(quiz_id, quiz_pass())),
+        Case("build_quiz_questions", lambda: quizzes.build_quiz_questions(quiz_id)),
+        Case(
+            "get_quiz_questions (miss)",
+            lambda: quizzes.get_quiz_questions(quiz_id),
+            before=miss_quiz_payload,
+        ),
+        Case("get_quiz_questions (hit)", lambda: quizzes.get_quiz_questions(quiz_id)),
+        Case(
+            f"create_quiz ({args.create_questions} questions)",
+            lambda: quizzes.create_quiz(quiz_create(), company_id),
+        ),
+        Case("get_user_answers_from_redis", taker.get_user_answers_from_redis),
+        Case(
+            "get_all_company_user_answers_from_redis",
+            lambda: quizzes.get_all_company_user_answers_from_redis(company_id),
+        ),
+        Case(
+            "get_company_employee_answers_from_redis",
+            lambda: quizzes.get_company_employee_answers_from_redis(
+                company_id, user_id
+            ),
+        ),
+        *(
+            Case(name, call, before=miss_analytics)
+            for name, call in (
+                (
+                    "get_quiz_average_results",
+                    lambda: analytics.get_quiz_average_results(quiz_id),
+                ),
+                (
+                    "get_employee_avarege_results",
+                    lambda: analytics.get_employee_avarege_results(company_id, user_id),
+                ),
+                (
+                    "get_employee_last_activity_list",
+                    lambda: analytics.get_employee_last_activity_list(company_id),
+                ),
+                (
+                    "get_user_average_result",
+                    lambda: analytics.get_user_average_result(user_id),
+                ),
+                (
+                    "get_user_average_quiz_result",
+                    lambda: employee_analytics.get_user_average_quiz_result(quiz_id),
+                ),
+                (
+                    "get_list_quizzes_last_activity",
+                    employee_analytics.get_list_quizzes_last_activity,
+                ),
+                (
+                    "get_quiz_rollup",
+                    lambda: analytics.get_quiz_rollup(quiz_id, RollupGranularity.day),
+                ),
+                (
+                    "get_company_rollup",
+                    lambda: analytics.get_company_rollup(
+                        company_id, RollupGranularity.week
+                    ),
+                ),
+                (
+                    "get_employee_rollup",
+                    lambda: analytics.get_employee_rollup(
+                        company_id, user_id, RollupGranularity.month
+                    ),
+                ),
+                (
+                    "get_quiz_statistics",
+                    lambda: analytics.get_quiz_statistics(quiz_id, 10, 50),
+                ),
+                (
+                    "get_company_statistics",
+                    lambda: analytics.get_company_statistics(company_id, 10, 50),
+                ),
+                ("get_item_analysis", lambda: analytics.get_item_analysis(quiz_id)),
+                (
+                    "get_question_distribution",
+                    lambda: analytics.get_question_distribution(quiz_id),
+                ),
+                (
+                    "get_company_leaderboard",
+                    lambda: analytics.get_company_leaderboard(company_id),
+                ),
+                (
+                    "get_quiz_leaderboard",
+                    lambda: analytics.get_quiz_leaderboard(quiz_id),
+                ),
+            )
+        ),
+    ]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: dict, baseline: Optional[dict]) -> None:
+    print(
+        f"{'case':<48} {'min ms':>9} {'median ms':>10} {'queries':>8} "
+        f"{'peak KiB':>9} {'vs base':>8}"
+    )
+    for name, row in results.items():
+        change = ""
+        before = (baseline or {}).get(name)
+        if before:
+            change = f"{(row['median_ms'] / before['median_ms'] - 1) * 100:+.0f}%"
+        print(
+            f"{name:<48} {row['min_ms']:>9.2f} {row['median_ms']:>10.2f} "
+            f"{row['queries']:>8} {row['peak_kib']:>9.1f} {change:>8}"
+        )
+
+
+async def run(args: argparse.Namespace) -> None:
+    random.seed(args.seed)
+    namespace = uuid.uuid4().hex
+    analytics_cache.prefix = f"bench-cache:{namespace}"
+    leaderboard.prefix = f"bench-leaderboard:{namespace}"
+    answer_stats.prefix = f"bench-answer-stats:{namespace}"
+    quiz_payloads.prefix = f"bench-payload:{namespace}"
+    answer_store.prefix = f"bench-answers:{namespace}"
+
+    engine = create_engine(args.url)
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        seeded = seed(db, args)
+        await seed_answers(seeded["submissions"])
+        await leaderboard.rebuild(db)
+
+        results = {}
+        for case in cases(db, seeded, args):
+            results[case.name] = await case.measure(args.repeat)
+    finally:
+        db.close()
+        Base.metadata.drop_all(engine)
+        async for key in redis_db.scan_iter(match=f"bench-*:{namespace}*"):
+            await redis_db.delete(key)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+    if args.output:
+        report = {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "dialect": engine.dialect.name,
+            "sizes": {
+                name: getattr(args, name)
+                for name in (
+                    "users",
+                    "quizzes",
+                    "questions",
+                    "answers",
+                    "attempts",
+                    "create_questions",
+                    "repeat",
+                )
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--url", default="sqlite:///./benchmark.db")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--quizzes", type=int, default=10)
+    parser.add_argument("--questions", type=int, default=10)
+    parser.add_argument("--answers", type=int, default=4)
+    parser.add_argument("--attempts", type=int, default=5)
+    parser.add_argument("--create-questions", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="results JSON to compare against")
+    asyncio.run(run(parser.parse_args()))
@@ -1,2 +1,14 @@
 from .database import Base
-from quiz.models.db_models import User, Company, Request, Invite, Quiz, Answer, Question
+from quiz.models.db_models import (
+    User,
+    Company,
+    Request,
+    Invite,
+    Quiz,
+    Answer,
+    Question,
+    Result,
+    ResultRollup,
+    AnswerStat,
+    ResultAnswer,
+)
@@ -0,0 +1,229 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+import json
+import os
+import time
+import uuid
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from core.database import redis_db
+from core.metrics import CACHE_REQUESTS
+
+CACHE_TTL = int(os.getenv("ANALYTICS_CACHE_TTL", "3600"))
+CACHE_VERSION_TTL = int(os.getenv("ANALYTICS_CACHE_VERSION_TTL", "604800"))
+CACHE_LOCK_TIMEOUT = float(os.getenv("ANALYTICS_CACHE_LOCK_TIMEOUT", "10"))
+CACHE_WAIT_TIMEOUT = float(os.getenv("ANALYTICS_CACHE_WAIT_TIMEOUT", "2"))
+PAYLOAD_CACHE_SIZE = int(os.getenv("PAYLOAD_CACHE_SIZE", "256"))
+
+RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class VersionedCache:
+    """Response cache keyed by (endpoint, params, data version).
+
+    Every cached value depends on one or more version scopes such as
+    "quiz:1" or "company:2". Writers bump the scopes they change, which moves
+    readers to new keys, so entries never need to be purged. Missing versions
+    start from the current time in ms, so a flushed or expired version never
+    points back at an older entry.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "cache",
+        name: str = "analytics",
+        ttl: int = CACHE_TTL,
+        version_ttl: int = CACHE_VERSION_TTL,
+        lock_timeout: float = CACHE_LOCK_TIMEOUT,
+        wait_timeout: float = CACHE_WAIT_TIMEOUT,
+    ):
+        self.prefix = prefix
+        self.name = name
+        self.ttl = ttl
+        self.version_ttl = version_ttl
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+
+    def version_key(self, scope: str) -> str:
+        return f"{self.prefix}:version:{scope}"
+
+    def params_key(self, endpoint: str, params: dict) -> str:
+        params_hash = hashlib.sha1(
+            json.dumps(params, sort_keys=True, default=str).encode()
+        ).hexdigest()
+        return f"{self.prefix}:{endpoint}:{params_hash}"
+
+    def entry_key(self, endpoint: str, params: dict, versions: List[str]) -> str:
+        return f"{self.params_key(endpoint, params)}:{'.'.join(versions)}"
+
+    def stale_key(self, endpoint: str, params: dict) -> str:
+        return f"{self.params_key(endpoint, params)}:stale"
+
+    async def get_versions(self, *scopes: str) -> List[str]:
+        keys = [self.version_key(scope) for scope in scopes]
+        versions = await redis_db.mget(keys)
+        missing = [key for key, version in zip(keys, versions) if version is None]
+        if missing:
+            async with redis_db.pipeline(transaction=False) as pipe:
+                for key in missing:
+                    pipe.set(
+                        key, time.time_ns() // 1000000, nx=True, ex=self.version_ttl
+                    )
+                await pipe.execute()
+            versions = await redis_db.mget(keys)
+        return versions
+
+    async def bump(self, *scopes: str) -> None:
+        async with redis_db.pipeline(transaction=False) as pipe:
+            for scope in scopes:
+                key = self.version_key(scope)
+                pipe.set(key, time.time_ns() // 1000000, nx=True)
+                pipe.incr(key)
+                pipe.expire(key, self.version_ttl)
+            await pipe.execute()
+
+    async def get_or_set(
+        self,
+        endpoint: str,
+        params: dict,
+        scopes: List[str],
+        builder: Callable[[], Awaitable[Any]],
+        versions: Optional[List[str]] = None,
+    ) -> Any:
+        value, _ = await self.get_or_set_versioned(
+            endpoint, params, scopes, builder, versions
+        )
+        return value
+
+    async def get_or_set_versioned(
+        self,
+        endpoint: str,
+        params: dict,
+        scopes: List[str],
+        builder: Callable[[], Awaitable[Any]],
+        versions: Optional[List[str]] = None,
+    ) -> Tuple[Any, List[str]]:
+        """Like get_or_set, also returns the versions of the value served,
+        older ones when the stale fallback was used."""
+        if versions is None:
+            versions = await self.get_versions(*scopes)
+        key = self.entry_key(endpoint, params, versions)
+        cached = await redis_db.get(key)
+        if cached is not None:
+            CACHE_REQUESTS.labels(self.name, "hit").inc()
+            return json.loads(cached), versions
+        CACHE_REQUESTS.labels(self.name, "miss").inc()
+
+        lock_key = f"{key}:lock"
+        token = uuid.uuid4().hex
+        if await redis_db.set(
+            lock_key, token, nx=True, px=int(self.lock_timeout * 1000)
+        ):
+            try:
+                value = await builder()
+                encoded = jsonable_encoder(value)
+                # the stale copy keeps its versions, they are not the ones of
+                # the readers falling back to it
+                stale = json.dumps({"versions": versions, "value": encoded})
+                async with redis_db.pipeline(transaction=False) as pipe:
+                    pipe.set(key, json.dumps(encoded), ex=self.ttl)
+                    pipe.set(self.stale_key(endpoint, params), stale, ex=self.ttl)
+                    await pipe.execute()
+                return value, versions
+            finally:
+                await redis_db.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+
+        # another worker is rebuilding this key, serve the previous version if any
+        stale = await redis_db.get(self.stale_key(endpoint, params))
+        if stale is not None:
+            CACHE_REQUESTS.labels(self.name, "stale").inc()
+            stale = json.loads(stale)
+            return stale["value"], stale["versions"]
+        deadline = time.monotonic() + self.wait_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            cached = await redis_db.get(key)
+            if cached is not None:
+                return json.loads(cached), versions
+        return await builder(), versions
+
+
+analytics_cache = VersionedCache()
+
+
+def render_json(value: Any) -> bytes:
+    """Same bytes FastAPI's JSONResponse would send for value."""
+    return json.dumps(
+        jsonable_encoder(value),
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class PayloadCache:
+    """Rendered JSON responses per (key, data version).
+
+    Hot payloads are kept as bytes in a per-process LRU, the rest in Redis
+    where every worker can reuse them. Like VersionedCache, entries are
+    invalidated by bumping the scopes they depend on.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "payload",
+        name: str = "payload",
+        max_entries: int = PAYLOAD_CACHE_SIZE,
+        ttl: int = CACHE_TTL,
+        versions: VersionedCache = analytics_cache,
+    ):
+        self.prefix = prefix
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.versions = versions
+        self._entries = OrderedDict()
+
+    async def get_or_set(
+        self,
+        key: str,
+        scopes: List[str],
+        builder: Callable[[], Awaitable[Any]],
+        versions: Optional[List[str]] = None,
+    ) -> bytes:
+        if versions is None:
+            versions = await self.versions.get_versions(*scopes)
+        entry_key = f"{self.prefix}:{key}:{'.'.join(versions)}"
+        payload = self._entries.get(entry_key)
+        if payload is not None:
+            self._entries.move_to_end(entry_key)
+            CACHE_REQUESTS.labels(self.name, "local_hit").inc()
+            return payload
+
+        cached = await redis_db.get(entry_key)
+        if cached is None:
+            CACHE_REQUESTS.labels(self.name, "miss").inc()
+            payload = render_json(await builder())
+            await redis_db.set(entry_key, payload, ex=self.ttl)
+        else:
+            CACHE_REQUESTS.labels(self.name, "hit").inc()
+            payload = cached.encode("utf-8")
+        self._entries[entry_key] = payload
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return payload
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+quiz_payloads = PayloadCache()
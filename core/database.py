@@ -1,10 +1,12 @@
 from os import environ
-import aioredis
 import databases
 from sqlalchemy import create_engine
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
+from core.metrics import InstrumentedRedis, instrument_pool
+
 DB_USER = environ.get("DB_USER", "marko")
 DB_HOST = environ.get("DB_HOST", "localhost")
 DB_NAME = environ.get("DB_NAME", "marko")
@@ -13,6 +15,7 @@ SQLALCHEMY_DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_N
 
 
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
+instrument_pool(engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 database = databases.Database(SQLALCHEMY_DATABASE_URL)
@@ -27,9 +30,18 @@ def get_db():
         db.close()
 
 
+def dialect_insert(db, table):
+    """INSERT supporting ON CONFLICT for the dialect the session is bound to"""
+    if db.get_bind().dialect.name == "sqlite":
+        return sqlite.insert(table)
+    return postgresql.insert(table)
+
+
 
 host = environ.get("REDIS_HOST", "localhost")
 port = environ.get("REDIS_PORT", "6379")
 password = environ.get("REDIS_PASSWORD")
-redis_db = aioredis.from_url(f"redis://{host}:{port}/{password}", decode_responses=True)
+redis_db = InstrumentedRedis.from_url(
+    f"redis://{host}:{port}/{password}", decode_responses=True
+)
 
@@ -0,0 +1,69 @@
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from fastapi import Request, Response
+
+from core.cache import analytics_cache
+
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+async def not_modified_handler(request: Request, exc: NotModified) -> Response:
+    return Response(status_code=304, headers={"ETag": exc.etag})
+
+
+def make_etag(endpoint: str, params: dict, versions: List[str]) -> str:
+    digest = hashlib.sha1(
+        json.dumps([endpoint, params, versions], sort_keys=True, default=str).encode()
+    ).hexdigest()
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, W/ prefixes don't matter
+    tags = [tag.strip().replace("W/", "", 1) for tag in if_none_match.split(",")]
+    return etag in tags
+
+
+class ConditionalGet:
+    """ETag support for reads whose content only changes with cache versions.
+
+    The ETag hashes the endpoint, its params and the versions of the scopes
+    the payload depends on, so clients get a 304 without the payload being
+    loaded or serialized again.
+    """
+
+    def __init__(self, request: Request, response: Response):
+        self.if_none_match = request.headers.get("if-none-match")
+        self.response = response
+        self.etag = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"ETag": self.etag} if self.etag else {}
+
+    async def check(self, endpoint: str, scopes: List[str], **params) -> List[str]:
+        """Raises NotModified for a matching If-None-Match, returns versions."""
+        versions = await analytics_cache.get_versions(*scopes)
+        etag = make_etag(endpoint, params, versions)
+        if etag_matches(self.if_none_match, etag):
+            raise NotModified(etag)
+        self.tag(etag)
+        return versions
+
+    def tag(self, etag: str) -> None:
+        self.etag = etag
+        self.response.headers["ETag"] = etag
+
+    def served(self, endpoint: str, params: dict, versions: List[str]) -> None:
+        """Tags the response with the versions its payload was built from,
+        which are older than the checked ones for a stale payload."""
+        self.tag(make_etag(endpoint, params, versions))
@@ -0,0 +1,88 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from core.utils import set_up
+
+LOCAL_IDP_DIR = os.getenv("LOCAL_IDP_DIR", ".local-idp")
+LOCAL_IDP_KID = "local-idp"
+
+
+class LocalIdentityProvider:
+    """Offline stand-in for the Auth0 tenant behind VerifyToken.
+
+    Keeps an RSA key pair in directory, publishes the public half as
+    jwks.json and mints RS256 tokens signed with the private one. Run the app
+    with JWKS_URL set to jwks_url (or the file served over HTTP) and tokens
+    go through the same verification as Auth0 ones.
+    """
+
+    def __init__(self, directory: Optional[str] = None, kid: str = LOCAL_IDP_KID):
+        self.directory = Path(directory or LOCAL_IDP_DIR)
+        self.kid = kid
+
+    @property
+    def private_key_path(self) -> Path:
+        return self.directory / "private_key.pem"
+
+    @property
+    def jwks_path(self) -> Path:
+        return self.directory / "jwks.json"
+
+    @property
+    def jwks_url(self) -> str:
+        return self.jwks_path.resolve().as_uri()
+
+    def init(self, key_size: int = 2048, force: bool = False) -> dict:
+        if self.private_key_path.exists() and not force:
+            raise FileExistsError(f"{self.private_key_path} already exists")
+        self.directory.mkdir(parents=True, exist_ok=True)
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        fd = os.open(
+            self.private_key_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600
+        )
+        with os.fdopen(fd, "wb") as f:
+            f.write(pem)
+
+        jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+        jwk.update({"kid": self.kid, "use": "sig", "alg": "RS256"})
+        self.jwks_path.write_text(json.dumps({"keys": [jwk]}, indent=2))
+        return {"jwks_url": self.jwks_url, "kid": self.kid}
+
+    def mint(
+        self,
+        email: Optional[str] = None,
+        claims: Optional[dict] = None,
+        expires_in: int = 1800,
+    ) -> str:
+        """Signs a token the app accepts, issuer and audience come from
+        set_up() so they match the app running with the same environment.
+        claims are added last and can override any of the defaults."""
+        config = set_up()
+        now = int(time.time())
+        payload = {
+            "iss": config["ISSUER"],
+            "aud": config["API_AUDIENCE"],
+            "iat": now,
+            "exp": now + expires_in,
+        }
+        if email:
+            payload.update({"sub": f"local|{email}", "email": email})
+        payload.update(claims or {})
+        return jwt.encode(
+            payload,
+            self.private_key_path.read_bytes(),
+            algorithm="RS256",
+            headers={"kid": self.kid},
+        )
@@ -1,3 +1,18 @@
+import os
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+# "json" writes one JSON object per record with request id and timings
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+# "1" hands records to a writer thread, see core/structured_logging.py
+LOG_QUEUE = os.getenv("LOG_QUEUE", "1") == "1"
+LOG_SAMPLE_RATES = {
+    "DEBUG": float(os.getenv("LOG_SAMPLE_DEBUG", "1")),
+    "INFO": float(os.getenv("LOG_SAMPLE_INFO", "1")),
+}
+QUEUED_LOGGERS = ("quiz-logger", "slow-query-logger", "trace-logger")
+# spans of TRACING_EXPORTER=log, stdout when empty
+TRACING_FILE = os.getenv("TRACING_FILE", "")
+
 log_config = {
     "version": 1,
     "disable_existing_loggers": False,
@@ -7,15 +22,66 @@ log_config = {
             "fmt": "%(levelprefix)s %(asctime)s %(message)s",
             "datefmt": "%Y-%m-%d %H:%M:%S",
         },
+        "plain": {
+            "format": "%(asctime)s %(message)s",
+            "datefmt": "%Y-%m-%d %H:%M:%S",
+        },
+        "json": {"()": "core.structured_logging.JsonFormatter"},
+        "message": {"format": "%(message)s"},
+    },
+    "filters": {
+        "request_context": {"()": "core.structured_logging.RequestContextFilter"},
+        "sampling": {
+            "()": "core.structured_logging.SamplingFilter",
+            "rates": LOG_SAMPLE_RATES,
+        },
     },
     "handlers": {
         "default": {
-            "formatter": "default",
+            "formatter": "json" if LOG_FORMAT == "json" else "default",
             "class": "logging.StreamHandler",
             "stream": "ext://sys.stderr",
         },
+        # gunicorn workers share the log files, see SharedRotatingFileHandler
+        "slow_queries": {
+            "formatter": "plain",
+            "()": "core.structured_logging.SharedRotatingFileHandler",
+            "filename": os.getenv("SLOW_QUERY_LOG_FILE", "slow_queries.log"),
+            "maxBytes": int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", "10485760")),
+            "backupCount": int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5")),
+            "delay": True,
+        },
+        "traces": {
+            "formatter": "message",
+            **(
+                {
+                    "()": "core.structured_logging.SharedRotatingFileHandler",
+                    "filename": TRACING_FILE,
+                    "maxBytes": int(os.getenv("TRACING_FILE_MAX_BYTES", "104857600")),
+                    "backupCount": int(os.getenv("TRACING_FILE_BACKUPS", "5")),
+                    "delay": True,
+                }
+                if TRACING_FILE
+                else {"class": "logging.StreamHandler", "stream": "ext://sys.stdout"}
+            ),
+        },
     },
     "loggers": {
-        "quiz-logger": {"handlers": ["default"], "level": "DEBUG"},
+        "quiz-logger": {
+            "handlers": ["default"],
+            "level": LOG_LEVEL,
+            # logger filters run in the calling thread, before the queue
+            "filters": ["request_context", "sampling"],
+        },
+        "slow-query-logger": {
+            "handlers": ["slow_queries"],
+            "level": "WARNING",
+            "propagate": False,
+        },
+        "trace-logger": {
+            "handlers": ["traces"],
+            "level": "INFO",
+            "propagate": False,
+        },
     },
 }
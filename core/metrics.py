@@ -0,0 +1,174 @@
+import os
+import time
+
+import aioredis
+from aioredis.client import Pipeline
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.pool import Pool
+from starlette.requests import Request
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.middleware import route_path
+from core.tracing import tracer
+
+# Under gunicorn every worker writes its samples to files in
+# PROMETHEUS_MULTIPROC_DIR and /metrics merges them, see gunicorn.conf.py.
+# Gauges say how their per-process values are combined.
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, by route template.",
+    ["method", "route", "status"],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool.",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "DB connections held open by the pool.",
+    multiprocess_mode="livesum",
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    "db_pool_checked_out",
+    "DB connections currently checked out of the pool.",
+    multiprocess_mode="livesum",
+)
+REDIS_COMMAND_LATENCY = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip time, pipelines count as one PIPELINE command.",
+    ["command"],
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5),
+)
+CACHE_REQUESTS = Counter(
+    "cache_requests",
+    "Cache lookups by outcome, hit ratio is hit / all.",
+    ["cache", "result"],
+)
+
+
+def metrics_registry() -> CollectorRegistry:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+async def metrics(request: Request) -> Response:
+    return Response(generate_latest(metrics_registry()), media_type=CONTENT_TYPE_LATEST)
+
+
+class MetricsMiddleware:
+    """Records latency and in-flight requests per route template."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            REQUEST_LATENCY.labels(scope["method"], route_path(scope), status).observe(
+                time.perf_counter() - start
+            )
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            with tracer.span(
+                "redis PIPELINE", "redis", commands=len(self.command_stack)
+            ):
+                return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_LATENCY.labels("PIPELINE").observe(
+                time.perf_counter() - start
+            )
+
+
+class InstrumentedRedis(aioredis.Redis):
+    """aioredis client timing every command it sends."""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0]).upper()
+        start = time.perf_counter()
+        try:
+            with tracer.span(
+                f"redis {command}", "redis", key=str(args[1]) if len(args) > 1 else None
+            ):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_LATENCY.labels(command).observe(time.perf_counter() - start)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> Pipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
+
+
+def instrument_pool(pool: Pool) -> None:
+    """Times how long callers wait for a connection from pool."""
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+
+@event.listens_for(Pool, "connect")
+def count_connection(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.inc()
+
+
+@event.listens_for(Pool, "close")
+def uncount_connection(dbapi_connection, connection_record):
+    DB_POOL_CONNECTIONS.dec()
+
+
+@event.listens_for(Pool, "checkout")
+def count_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKED_OUT.inc()
+
+
+@event.listens_for(Pool, "checkin")
+def count_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
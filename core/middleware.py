@@ -0,0 +1,168 @@
+import gzip
+import io
+import os
+import re
+import uuid
+from typing import Dict, Iterable
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.structured_logging import request_id
+
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))
+COMPRESSION_EXCLUDE_PATHS = [
+    path for path in os.getenv("COMPRESSION_EXCLUDE_PATHS", "").split(",") if path
+]
+REQUEST_ID_PATTERN = re.compile(r"[A-Za-z0-9._:-]{1,128}")
+
+
+route_paths: Dict[object, str] = {}
+
+
+def route_path(scope: Scope) -> str:
+    """Template ("/quiz/info/{quiz_id}") of the route that handled scope,
+    "unmatched" if none did, so labels keep a bounded cardinality."""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    if endpoint not in route_paths:
+        for route in scope["app"].routes:
+            if getattr(route, "endpoint", None) is endpoint:
+                route_paths[endpoint] = route.path
+                break
+        else:
+            return "unmatched"
+    return route_paths[endpoint]
+
+
+class CompressionMiddleware:
+    """GZips responses of at least minimum_size bytes for clients accepting it.
+
+    Requests under one of exclude_paths are left alone, and so are responses
+    that already set Content-Encoding, so a route can opt out by sending
+    "Content-Encoding: identity".
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MINIMUM_SIZE,
+        compresslevel: int = COMPRESSION_LEVEL,
+        exclude_paths: Iterable[str] = COMPRESSION_EXCLUDE_PATHS,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.exclude_paths = tuple(exclude_paths)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] == "http"
+            and not scope["path"].startswith(self.exclude_paths)
+            and "gzip" in Headers(scope=scope).get("Accept-Encoding", "")
+        ):
+            responder = GZipResponder(self.app, self.minimum_size, self.compresslevel)
+            await responder(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
+
+
+class GZipResponder:
+    def __init__(self, app: ASGIApp, minimum_size: int, compresslevel: int):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.buffer = io.BytesIO()
+        self.gzip_file = gzip.GzipFile(
+            mode="wb", fileobj=self.buffer, compresslevel=compresslevel
+        )
+        self.send = None
+        self.start_message = None
+        self.started = False
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def compress(self, body: bytes, more_body: bool) -> bytes:
+        self.gzip_file.write(body)
+        if more_body:
+            # push what we have so far to the client instead of letting zlib
+            # hold it back until the stream ends
+            self.gzip_file.flush()
+        else:
+            self.gzip_file.close()
+        compressed = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return compressed
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            self.passthrough = "content-encoding" in Headers(raw=message["headers"])
+            if self.passthrough:
+                await self.send(message)
+            return
+        if self.passthrough or message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if not self.started:
+            self.started = True
+            if len(body) < self.minimum_size and not more_body:
+                await self.send(self.start_message)
+                await self.send(message)
+                self.passthrough = True
+                return
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+            body = self.compress(body, more_body)
+            if not more_body:
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+        else:
+            body = self.compress(body, more_body)
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
+
+
+class RequestIdMiddleware:
+    """Gives every request an id for its log records and X-Request-ID header.
+
+    A well formed X-Request-ID sent by the client or a proxy is kept, so
+    records can be matched across services.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = Headers(scope=scope).get("X-Request-ID", "")
+        if REQUEST_ID_PATTERN.fullmatch(incoming):
+            current = incoming
+        else:
+            current = uuid.uuid4().hex
+
+        async def send_with_id(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append("X-Request-ID", current)
+            await send(message)
+
+        token = request_id.set(current)
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id.reset(token)
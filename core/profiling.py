@@ -0,0 +1,157 @@
+import hashlib
+import hmac
+import os
+import random
+import time
+from pathlib import Path
+from typing import Optional
+
+from pyinstrument import Profiler
+from pyinstrument.renderers import ConsoleRenderer, HTMLRenderer, SpeedscopeRenderer
+from pyinstrument.session import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.responses import HTMLResponse, PlainTextResponse, Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.middleware import REQUEST_ID_PATTERN
+from core.structured_logging import request_id
+
+# empty secret and zero rate leave profiling off
+PROFILING_SECRET = os.getenv("PROFILING_SECRET", "")
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL", "0.001"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "200"))
+PROFILE_HEADER = "X-Profile"
+
+
+def sign(expires: int, secret: str = PROFILING_SECRET) -> str:
+    digest = hmac.new(secret.encode(), str(expires).encode(), hashlib.sha256)
+    return f"{expires}.{digest.hexdigest()}"
+
+
+def profile_token(ttl: int, secret: str = PROFILING_SECRET) -> str:
+    """Value for the X-Profile header, valid for ttl seconds."""
+    return sign(int(time.time()) + ttl, secret)
+
+
+def valid_token(token: str, secret: str = PROFILING_SECRET) -> bool:
+    if not secret or not token:
+        return False
+    expires, _, _ = token.partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(token, sign(int(expires), secret))
+
+
+class ProfileStore:
+    """Profiles saved as pyinstrument sessions, one file per request id.
+
+    Only the newest keep files are kept.
+    """
+
+    def __init__(self, directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        self.directory = Path(directory)
+        self.keep = keep
+
+    def path(self, profile_id: str) -> Path:
+        return self.directory / f"{profile_id}.pyisession"
+
+    def save(self, profile_id: str, session: Session) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        session.save(str(self.path(profile_id)))
+        saved = sorted(
+            self.directory.glob("*.pyisession"), key=lambda path: path.stat().st_mtime
+        )
+        for path in saved[: -self.keep]:
+            path.unlink(missing_ok=True)
+
+    def load(self, profile_id: str) -> Optional[Session]:
+        if not REQUEST_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = self.path(profile_id)
+        if not path.exists():
+            return None
+        return Session.load(str(path))
+
+
+profile_store = ProfileStore()
+
+
+class ProfilingMiddleware:
+    """Runs a request under pyinstrument when asked to.
+
+    A request is profiled when it carries a valid signed X-Profile header
+    (see `manage.py profile-token`) or falls into sample_rate. The profile
+    is stored under the request id, given back as X-Profile-URL. With no
+    secret and no sample rate requests pass straight through.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        secret: str = PROFILING_SECRET,
+        sample_rate: float = PROFILING_SAMPLE_RATE,
+        interval: float = PROFILING_INTERVAL,
+        store: ProfileStore = profile_store,
+    ):
+        self.app = app
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.store = store
+        self.enabled = bool(secret) or sample_rate > 0
+
+    def wanted(self, scope: Scope) -> bool:
+        # reading a profile sends the header too
+        if scope["path"].startswith("/profiles/"):
+            return False
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return True
+        token = Headers(scope=scope).get(PROFILE_HEADER)
+        return token is not None and valid_token(token, self.secret)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if not self.enabled or scope["type"] != "http" or not self.wanted(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = request_id.get() or os.urandom(16).hex()
+
+        async def send_with_profile_url(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "X-Profile-URL", f"/profiles/{profile_id}"
+                )
+            await send(message)
+
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_with_profile_url)
+        finally:
+            session = profiler.stop()
+            await run_in_threadpool(self.store.save, profile_id, session)
+
+
+async def profile(request: Request) -> Response:
+    """A stored profile as an HTML timeline, a text call tree (?format=text)
+    or a speedscope flame graph (?format=speedscope). Needs the same signed
+    header as the profiled request."""
+    if not valid_token(request.headers.get(PROFILE_HEADER, ""), PROFILING_SECRET):
+        return PlainTextResponse("Forbidden", status_code=403)
+    session = await run_in_threadpool(
+        profile_store.load, request.path_params["profile_id"]
+    )
+    if session is None:
+        return PlainTextResponse("Not found", status_code=404)
+    output = request.query_params.get("format", "html")
+    if output == "text":
+        return PlainTextResponse(ConsoleRenderer(unicode=True).render(session))
+    if output == "speedscope":
+        return Response(
+            SpeedscopeRenderer().render(session), media_type="application/json"
+        )
+    return HTMLResponse(HTMLRenderer().render(session))
@@ -0,0 +1,126 @@
+import logging
+import os
+import time
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.slow_queries import slow_query_log
+
+logger = logging.getLogger("quiz-logger")
+
+
+class QueryStats:
+    def __init__(self, route: Optional[str] = None):
+        self.route = route
+        self.count = 0
+        self.duration = 0.0
+        self.budget = None
+
+
+current_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "query_stats", default=None
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def count_query(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["query_start"].pop()
+    stats = current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.duration += duration
+    slow_query_log.record(
+        conn,
+        statement,
+        parameters,
+        duration,
+        stats.route if stats is not None else None,
+        executemany,
+    )
+
+
+def query_budget(limit: int):
+    """Route dependency declaring how many statements the request may run.
+
+    Going over it logs a warning, or raises QueryBudgetExceeded in strict
+    mode so tests catch new N+1 walks.
+    """
+
+    def declare_budget() -> None:
+        stats = current_stats.get()
+        if stats is not None:
+            stats.budget = limit
+
+    return declare_budget
+
+
+class QueryStatsMiddleware:
+    """Counts SQL statements and DB time of every request.
+
+    Both go to a Server-Timing header and to the request's log line.
+    """
+
+    def __init__(self, app: ASGIApp, strict: Optional[bool] = None):
+        self.app = app
+        self.strict = strict
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        stats = QueryStats(route=f"{scope['method']} {scope['path']}")
+        token = current_stats.set(stats)
+        strict = self.strict
+        if strict is None:
+            strict = os.getenv("QUERY_BUDGET_STRICT", "") == "1"
+
+        async def send_with_stats(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                duration = stats.duration * 1000
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing",
+                    f'db;dur={duration:.1f};desc="{stats.count} queries"',
+                )
+                logger.info(
+                    f"{scope['method']} {scope['path']} {message['status']} "
+                    f"queries={stats.count} db={duration:.1f}ms",
+                    extra={
+                        "method": scope["method"],
+                        "path": scope["path"],
+                        "status": message["status"],
+                        "queries": stats.count,
+                        "db_ms": round(duration, 1),
+                        "duration_ms": round((time.perf_counter() - started) * 1000, 1),
+                    },
+                )
+                if stats.budget is not None and stats.count > stats.budget:
+                    detail = (
+                        f"{scope['method']} {scope['path']} ran {stats.count} "
+                        f"queries, budget is {stats.budget}"
+                    )
+                    if strict:
+                        raise QueryBudgetExceeded(detail)
+                    logger.warning(detail)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            current_stats.reset(token)
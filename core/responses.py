@@ -0,0 +1,23 @@
+from typing import Any
+
+import orjson
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+def pydantic_default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.dict()
+    raise TypeError
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response that also renders pydantic models.
+
+    FastAPI passes returned Response objects through untouched, so services
+    return it for data they already built as the route's response_model to
+    skip the second validation and jsonable_encoder.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=pydantic_default)
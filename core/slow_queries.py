@@ -0,0 +1,125 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger("slow-query-logger")
+
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "500"))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "") == "1"
+SLOW_QUERY_MAX_PENDING_EXPLAINS = int(os.getenv("SLOW_QUERY_MAX_PENDING_EXPLAINS", "4"))
+SLOW_QUERY_PARAMS_LIMIT = 1000
+
+
+class SlowQueryLog:
+    """Writes statements slower than threshold_ms to the slow-query-logger.
+
+    With explain on, SELECTs on Postgres are re-run under
+    EXPLAIN (ANALYZE, BUFFERS) by a background thread and the plan is logged
+    as a second record, so the request that hit the slow statement does not
+    wait for it. Writes are never explained, ANALYZE would execute them again.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: float = SLOW_QUERY_THRESHOLD_MS,
+        explain: bool = SLOW_QUERY_EXPLAIN,
+        max_pending_explains: int = SLOW_QUERY_MAX_PENDING_EXPLAINS,
+    ):
+        self.threshold_ms = threshold_ms
+        self.explain = explain
+        self.max_pending_explains = max_pending_explains
+        self._executor = None
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        conn: Connection,
+        statement: str,
+        parameters,
+        duration: float,
+        route: Optional[str],
+        executemany: bool,
+    ) -> None:
+        duration_ms = duration * 1000
+        if duration_ms < self.threshold_ms:
+            return
+        if conn.get_execution_options().get("skip_slow_query_log"):
+            return
+        logger.warning(
+            json.dumps(
+                {
+                    "event": "slow_query",
+                    "route": route,
+                    "duration_ms": round(duration_ms, 1),
+                    "statement": statement,
+                    "parameters": repr(parameters)[:SLOW_QUERY_PARAMS_LIMIT],
+                }
+            )
+        )
+        if self.explain and not executemany and self.explainable(conn, statement):
+            self.schedule_explain(conn.engine, statement, parameters, route)
+
+    @staticmethod
+    def explainable(conn: Connection, statement: str) -> bool:
+        if conn.dialect.name != "postgresql":
+            return False
+        return statement.lstrip()[:6].upper() in ("SELECT", "WITH ")
+
+    def schedule_explain(
+        self, engine: Engine, statement: str, parameters, route: Optional[str]
+    ) -> None:
+        with self._lock:
+            # the same slow statement tends to come in bursts, one plan is enough
+            if statement in self._pending:
+                return
+            if len(self._pending) >= self.max_pending_explains:
+                return
+            self._pending.add(statement)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1, thread_name_prefix="slow-query-explain"
+                )
+        self._executor.submit(self.run_explain, engine, statement, parameters, route)
+
+    def run_explain(
+        self, engine: Engine, statement: str, parameters, route: Optional[str]
+    ) -> None:
+        try:
+            with engine.connect() as connection:
+                connection = connection.execution_options(skip_slow_query_log=True)
+                transaction = connection.begin()
+                try:
+                    rows = connection.exec_driver_sql(
+                        f"EXPLAIN (ANALYZE, BUFFERS) {statement}", parameters
+                    ).fetchall()
+                finally:
+                    transaction.rollback()
+            logger.warning(
+                json.dumps(
+                    {
+                        "event": "slow_query_plan",
+                        "route": route,
+                        "statement": statement,
+                        "plan": "\n".join(row[0] for row in rows),
+                    }
+                )
+            )
+        except Exception:
+            logging.getLogger("quiz-logger").exception("EXPLAIN of a slow query failed")
+        finally:
+            with self._lock:
+                self._pending.discard(statement)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+slow_query_log = SlowQueryLog()
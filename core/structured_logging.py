@@ -0,0 +1,189 @@
+import copy
+import logging
+import os
+import queue
+import random
+import zlib
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Dict, Iterable, List, Optional
+
+import orjson
+
+try:
+    import fcntl
+except ImportError:  # Windows, a single process writes its files there
+    fcntl = None
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# attributes every LogRecord has, anything else was passed with extra=
+RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message",
+    "asctime",
+}
+
+
+class RequestContextFilter(logging.Filter):
+    """Stamps records with the id of the request being handled."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps only a fraction of the records of the sampled levels.
+
+    rates maps level names to the fraction kept, levels not in it are kept
+    whole. Records of a request are kept or dropped together, by request id.
+    """
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = {
+            logging.getLevelName(level): rate for level, rate in rates.items()
+        }
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1:
+            return True
+        key = getattr(record, "request_id", None)
+        if key is None:
+            return random.random() < rate
+        return zlib.crc32(key.encode()) % 10000 < rate * 10000
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class RecordQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # unlike QueueHandler.prepare this leaves formatting to the real
+        # handlers, only args and tracebacks are resolved in the caller
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class SharedRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler for a file every gunicorn worker writes to.
+
+    Writes and rollovers hold an exclusive flock on a lock file next to the
+    log, so only one process rotates at a time, and a process whose file was
+    rotated by another one reopens it instead of writing to the backup.
+    """
+
+    def __init__(self, filename: str, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self.lock_path = f"{self.baseFilename}.lock"
+        self._lock_file = None
+        self._lock_pid = None
+
+    def lock_file(self):
+        # a lock file opened before a fork would be shared with the workers
+        if self._lock_pid != os.getpid():
+            self._lock_file = open(self.lock_path, "a")
+            self._lock_pid = os.getpid()
+        return self._lock_file
+
+    def reopen_if_rotated(self) -> None:
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename)
+        except FileNotFoundError:
+            current = None
+        opened = os.fstat(self.stream.fileno())
+        if current is None or (current.st_dev, current.st_ino) != (
+            opened.st_dev,
+            opened.st_ino,
+        ):
+            self.stream.close()
+            self.stream = None
+
+    def emit(self, record: logging.LogRecord) -> None:
+        if fcntl is None:
+            super().emit(record)
+            return
+        lock_file = self.lock_file()
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            self.reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def close(self) -> None:
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+            self._lock_pid = None
+
+
+class QueueLogging:
+    """Moves the handlers of loggers behind a queue and a writer thread.
+
+    Requests only pay for putting records on the queue, a slow stderr or
+    disk no longer blocks them. stop() drains the queue and puts the
+    handlers back.
+    """
+
+    def __init__(self, logger_names: Iterable[str]):
+        self.logger_names = list(logger_names)
+        self._listeners: List[QueueListener] = []
+        self._handlers: Dict[str, list] = {}
+
+    def start(self) -> None:
+        if self._listeners:
+            return
+        for name in self.logger_names:
+            logger = logging.getLogger(name)
+            handlers = logger.handlers[:]
+            if not handlers:
+                continue
+            records = queue.SimpleQueue()
+            for handler in handlers:
+                logger.removeHandler(handler)
+            logger.addHandler(RecordQueueHandler(records))
+            listener = QueueListener(records, *handlers, respect_handler_level=True)
+            listener.start()
+            self._listeners.append(listener)
+            self._handlers[name] = handlers
+
+    def stop(self) -> None:
+        for listener in self._listeners:
+            listener.stop()
+        for name, handlers in self._handlers.items():
+            logger = logging.getLogger(name)
+            for handler in logger.handlers[:]:
+                if isinstance(handler, RecordQueueHandler):
+                    logger.removeHandler(handler)
+            for handler in handlers:
+                logger.addHandler(handler)
+        self._listeners = []
+        self._handlers = {}
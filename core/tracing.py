@@ -0,0 +1,313 @@
+import functools
+import inspect
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from importlib import import_module
+from typing import Callable, List, Optional
+
+import orjson
+from fastapi.routing import APIRoute
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from core.middleware import route_path
+from core.structured_logging import request_id
+
+# "" leaves tracing off, "log" writes spans through the trace-logger (see
+# TRACING_FILE in core/log_conf.py), anything else is "module:factory"
+# returning a SpanExporter
+TRACING_EXPORTER = os.getenv("TRACING_EXPORTER", "")
+TRACING_SAMPLE_RATE = float(os.getenv("TRACING_SAMPLE_RATE", "1"))
+TRACING_STATEMENT_LIMIT = 1000
+
+
+class Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+
+
+class Span:
+    __slots__ = (
+        "trace",
+        "span_id",
+        "parent_id",
+        "name",
+        "kind",
+        "attributes",
+        "start",
+        "duration",
+        "error",
+    )
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        kind: str,
+        attributes: dict,
+        parent_id: Optional[str] = None,
+    ):
+        self.trace = trace
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        trace.spans.append(self)
+
+    def finish(self) -> None:
+        self.duration = time.time() - self.start
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": round((self.duration or 0) * 1000, 3),
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """Receives the finished spans of one trace at a time.
+
+    Called from the request after its response is sent, implementations
+    should hand the spans off rather than do slow I/O themselves.
+    """
+
+    def export(self, spans: List[dict]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+
+class LogExporter(SpanExporter):
+    """One JSON line per span to the trace-logger, which the QueueLogging
+    writer thread puts on stdout or in TRACING_FILE."""
+
+    def __init__(self):
+        self.logger = logging.getLogger("trace-logger")
+
+    def export(self, spans: List[dict]) -> None:
+        for span in spans:
+            self.logger.info(orjson.dumps(span).decode())
+
+
+def load_exporter(spec: str) -> Optional[SpanExporter]:
+    if not spec:
+        return None
+    if spec == "log":
+        return LogExporter()
+    module, _, factory = spec.partition(":")
+    return getattr(import_module(module), factory)()
+
+
+class Tracer:
+    """Spans of a request, collected while it runs and exported at its end.
+
+    Spans are only recorded inside a trace started by TracingMiddleware,
+    everywhere else span() costs a context variable lookup.
+    """
+
+    def __init__(
+        self,
+        exporter: Optional[SpanExporter] = None,
+        sample_rate: float = TRACING_SAMPLE_RATE,
+    ):
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+
+    @contextmanager
+    def span(self, name: str, kind: str = "internal", **attributes):
+        parent = current_span.get()
+        if parent is None:
+            yield None
+            return
+        span = Span(parent.trace, name, kind, attributes, parent.span_id)
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as error:
+            span.error = repr(error)
+            raise
+        finally:
+            current_span.reset(token)
+            span.finish()
+
+    def export(self, trace: Trace) -> None:
+        try:
+            self.exporter.export([span.to_dict() for span in trace.spans])
+        except Exception:
+            logging.getLogger("quiz-logger").exception("Exporting spans failed")
+
+
+tracer = Tracer(load_exporter(TRACING_EXPORTER))
+
+
+def parse_traceparent(value: str) -> Optional[tuple]:
+    """(trace id, parent span id, sampled) of a W3C traceparent header."""
+    parts = value.split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        sampled = bool(int(parts[3], 16) & 1)
+    except ValueError:
+        return None
+    return parts[1], parts[2], sampled
+
+
+class TracingMiddleware:
+    """Starts a trace per request and exports its spans when it is done.
+
+    An incoming traceparent header is continued, its sampling decision
+    kept. The response carries traceparent and X-Trace-Id so a slow
+    response can be looked up.
+    """
+
+    def __init__(self, app: ASGIApp, tracer: Tracer = tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if self.tracer.exporter is None or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = parse_traceparent(Headers(scope=scope).get("traceparent", ""))
+        if incoming is None:
+            trace_id, parent_id = os.urandom(16).hex(), None
+            sampled = random.random() < self.tracer.sample_rate
+        else:
+            trace_id, parent_id, sampled = incoming
+        if not sampled:
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id)
+        root = Span(
+            trace,
+            scope["method"],
+            "server",
+            {"path": scope["path"], "request_id": request_id.get()},
+            parent_id,
+        )
+
+        async def send_with_trace(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                root.attributes["status"] = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("traceparent", f"00-{trace_id}-{root.span_id}-01")
+                headers.append("X-Trace-Id", trace_id)
+            await send(message)
+
+        token = current_span.set(root)
+        try:
+            await self.app(scope, receive, send_with_trace)
+        except BaseException as error:
+            root.error = repr(error)
+            raise
+        finally:
+            current_span.reset(token)
+            root.finish()
+            root.name = f"{scope['method']} {route_path(scope)}"
+            self.tracer.export(trace)
+
+
+class TracedRoute(APIRoute):
+    """Route class giving the dependencies and handler of a route a span."""
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        name = f"route {self.path}"
+
+        async def traced_handler(request):
+            if current_span.get() is None:
+                return await handler(request)
+            with tracer.span(name, "route"):
+                return await handler(request)
+
+        return traced_handler
+
+
+def traced(cls):
+    """Class decorator giving every method of a service a span."""
+    for name, attribute in list(vars(cls).items()):
+        if name.startswith("__"):
+            continue
+        if isinstance(attribute, staticmethod):
+            setattr(cls, name, staticmethod(traced_function(attribute.__func__, cls)))
+        elif inspect.isfunction(attribute):
+            setattr(cls, name, traced_function(attribute, cls))
+    return cls
+
+
+def traced_function(function: Callable, cls: type) -> Callable:
+    name = f"{cls.__name__}.{function.__name__}"
+    if inspect.iscoroutinefunction(function):
+
+        @functools.wraps(function)
+        async def async_wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return await function(*args, **kwargs)
+            with tracer.span(name):
+                return await function(*args, **kwargs)
+
+        return async_wrapper
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if current_span.get() is None:
+            return function(*args, **kwargs)
+        with tracer.span(name):
+            return function(*args, **kwargs)
+
+    return wrapper
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def start_statement_span(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span.get()
+    if parent is None:
+        return
+    span = Span(
+        parent.trace,
+        "db",
+        "db",
+        {"statement": statement[:TRACING_STATEMENT_LIMIT], "executemany": executemany},
+        parent.span_id,
+    )
+    conn.info.setdefault("trace_spans", []).append(span)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def finish_statement_span(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    if spans:
+        spans.pop().finish()
+
+
+@event.listens_for(Engine, "handle_error")
+def fail_statement_span(context):
+    spans = context.connection.info.get("trace_spans") if context.connection else None
+    if spans:
+        span = spans.pop()
+        span.error = repr(context.original_exception)
+        span.finish()
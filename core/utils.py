@@ -1,21 +1,59 @@
 import os
+import time
 from configparser import ConfigParser
+from functools import lru_cache
 
 import jwt
 
+from core.tracing import traced
+
+JWKS_RETRY_AFTER = float(os.getenv("JWKS_RETRY_AFTER", "30"))
+
 
 def set_up():
     """Sets up configuration for the app"""
 
+    domain = os.getenv("DOMAIN", "your.domain.com")
     config = {
-        "DOMAIN": os.getenv("DOMAIN", "your.domain.com"),
+        "DOMAIN": domain,
         "API_AUDIENCE": os.getenv("API_AUDIENCE", "your.audience.com"),
         "ISSUER": os.getenv("ISSUER", "https://your.domain.com/"),
         "ALGORITHMS": os.getenv("ALGORITHMS", "RS256"),
+        # file:// URLs work too, see core/local_idp.py
+        "JWKS_URL": os.getenv("JWKS_URL", f"https://{domain}/.well-known/jwks.json"),
     }
     return config
 
 
+class CachingJWKClient(jwt.PyJWKClient):
+    """PyJWKClient that also remembers failed fetches for retry_after seconds,
+    so an unreachable JWKS costs one timeout per period, not per request."""
+
+    def __init__(self, uri: str, retry_after: float = JWKS_RETRY_AFTER):
+        super().__init__(uri, cache_keys=True)
+        self.retry_after = retry_after
+        self.failure = None
+
+    def fetch_data(self):
+        if self.failure and time.monotonic() - self.failure[0] < self.retry_after:
+            raise self.failure[1]
+        try:
+            data = super().fetch_data()
+        except jwt.exceptions.PyJWKClientError as error:
+            self.failure = (time.monotonic(), error)
+            raise
+        self.failure = None
+        return data
+
+
+@lru_cache(maxsize=None)
+def jwks_client(url: str) -> CachingJWKClient:
+    """One client per JWKS URL for the whole process, keys are fetched once
+    and reused until they expire."""
+    return CachingJWKClient(url)
+
+
+@traced
 class VerifyToken:
     """Does all the token verification using PyJWT"""
 
@@ -25,10 +63,18 @@ class VerifyToken:
 
         # This gets the JWKS from a given URL and does processing so you can
         # use any of the keys available
-        jwks_url = f'https://{self.config["DOMAIN"]}/.well-known/jwks.json'
-        self.jwks_client = jwt.PyJWKClient(jwks_url)
+        self.jwks_client = jwks_client(self.config["JWKS_URL"])
 
     def verify(self):
+        # tokens of our own login are HS256 without a kid, there is no
+        # signing key to look up for them
+        try:
+            header = jwt.get_unverified_header(self.token)
+        except jwt.exceptions.DecodeError as error:
+            return {"status": "error", "msg": error.__str__()}
+        if header.get("alg") not in self.config["ALGORITHMS"].split(","):
+            return {"status": "error", "msg": "Unsupported algorithm"}
+
         # This gets the 'kid' from the passed token
         try:
             self.signing_key = self.jwks_client.get_signing_key_from_jwt(self.token).key
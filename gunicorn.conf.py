@@ -0,0 +1,89 @@
+import math
+import os
+import shutil
+import tempfile
+
+# workers write their metrics here and /metrics aggregates them.
+# prometheus_client picks its single or multi process mode when it is first
+# imported, so this has to run before anything imports it, hence the local
+# imports in the hooks below. It also runs before the app is preloaded, which
+# happens ahead of on_starting. Samples of a previous run would be summed into
+# the new one, so the directory starts empty.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "quiz-metrics")
+)
+shutil.rmtree(os.environ["PROMETHEUS_MULTIPROC_DIR"], ignore_errors=True)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"])
+
+
+def available_cpus() -> int:
+    """CPUs this process may run on, capped by a cgroup CPU quota, which
+    is how containers get limited while os.cpu_count() shows the host."""
+    if hasattr(os, "sched_getaffinity"):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    return max(cpus, 1)
+
+
+wsgi_app = "main:app"
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = os.getenv("BIND", f"0.0.0.0:{os.getenv('PORT', '8000')}")
+# one async worker per CPU, every worker is a full event loop
+workers = int(os.getenv("WEB_CONCURRENCY", "0")) or available_cpus()
+# import the app once in the master, workers share its pages copy-on-write
+preload_app = os.getenv("PRELOAD_APP", "1") == "1"
+# recycle workers to bound memory growth, jitter keeps them from restarting
+# all at once
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+# longer than the load balancer's idle timeout (60s on ALB and App Runner),
+# so it never sends a request on a connection we are closing
+keepalive = int(os.getenv("KEEPALIVE", "75"))
+backlog = int(os.getenv("BACKLOG", "2048"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+# a recycled worker finishes its running export jobs within this, see
+# EXPORT_DRAIN_TIMEOUT in quiz/export_jobs.py
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# the heartbeat file on a container's overlay disk can stall workers
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+
+def when_ready(server):
+    try:
+        import uvloop  # noqa: F401
+
+        loop = "uvloop"
+    except ImportError:
+        loop = "asyncio"
+    try:
+        import httptools  # noqa: F401
+
+        http = "httptools"
+    except ImportError:
+        http = "h11"
+    server.log.info(
+        f"Serving with {server.cfg.workers} workers, {loop} loop, {http} parser"
+    )
+
+
+def post_fork(server, worker):
+    # connections opened by the master while preloading must not be shared
+    if preload_app:
+        from core.database import engine
+
+        engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
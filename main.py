@@ -1,17 +1,34 @@
 import logging
+import os
 from fastapi.middleware.cors import CORSMiddleware
 from core.database import database, redis_db
 from logging.config import dictConfig
 from fastapi import FastAPI
-from core.log_conf import log_config
+from fastapi.responses import ORJSONResponse
+from core.log_conf import LOG_QUEUE, QUEUED_LOGGERS, log_config
+from core.etag import NotModified, not_modified_handler
+from core.metrics import MetricsMiddleware, metrics
+from core.profiling import ProfilingMiddleware, profile
+from core.middleware import CompressionMiddleware, RequestIdMiddleware
+from core.query_stats import QueryStatsMiddleware
+from core.slow_queries import slow_query_log
+from core.tracing import TracingMiddleware
+from core.structured_logging import QueueLogging
+from quiz.answer_stats import answer_stats
+from quiz.export_jobs import export_jobs
+from quiz.warmup import live, ready, warm_up
 from routes import routes
 
 
 
 dictConfig(log_config)
 logger = logging.getLogger("quiz-logger")
+queue_logging = QueueLogging(QUEUED_LOGGERS)
 
-app = FastAPI(debug=True)
+app = FastAPI(
+    debug=os.getenv("DEBUG", "") == "1", default_response_class=ORJSONResponse
+)
+app.add_exception_handler(NotModified, not_modified_handler)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,16 +36,36 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(QueryStatsMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(TracingMiddleware)
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(RequestIdMiddleware)
+app.add_route("/metrics", metrics, include_in_schema=False)
+app.add_route("/live", live, include_in_schema=False)
+app.add_route("/ready", ready, include_in_schema=False)
+app.add_route("/profiles/{profile_id}", profile, include_in_schema=False)
 
 
 @app.on_event("startup")
 async def startup():
+    if LOG_QUEUE:
+        queue_logging.start()
     await database.connect()
+    answer_stats.start()
+    warm_up.start()
 
 
 @app.on_event("shutdown")
 async def shutdown():
+    await warm_up.shutdown()
+    await export_jobs.shutdown()
+    await answer_stats.shutdown()
+    slow_query_log.shutdown()
     await database.disconnect()
     await redis_db.close()
+    await redis_db.connection_pool.disconnect()
+    queue_logging.stop()
 
 app.include_router(routes)
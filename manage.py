@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+
+from core.database import redis_db
+
+
+async def redis_usage(args: argparse.Namespace) -> None:
+    from quiz.answer_store import answer_store
+
+    usage = await answer_store.memory_usage()
+    for scope in ("per_user", "per_quiz"):
+        top = sorted(usage[scope].items(), key=lambda item: item[1], reverse=True)
+        usage[scope] = dict(top[: args.top]) if args.top else dict(top)
+    print(json.dumps(usage, indent=2))
+
+
+async def rebuild_leaderboards(args: argparse.Namespace) -> None:
+    from core.database import SessionLocal
+    from quiz.leaderboard import leaderboard
+
+    db = SessionLocal()
+    try:
+        print(json.dumps(await leaderboard.rebuild(db=db)))
+    finally:
+        db.close()
+
+
+async def flush_answer_stats(args: argparse.Namespace) -> None:
+    from core.database import SessionLocal
+    from quiz.answer_stats import answer_stats
+
+    db = SessionLocal()
+    try:
+        print(json.dumps({"quizzes": await answer_stats.flush(db=db)}))
+    finally:
+        db.close()
+
+
+async def seed(args: argparse.Namespace) -> None:
+    import sys
+
+    from core.database import SessionLocal, engine
+    from quiz.leaderboard import leaderboard
+    from quiz.seed import DatasetGenerator
+
+    generator = DatasetGenerator(
+        users=args.users,
+        companies=args.companies,
+        quizzes=args.quizzes,
+        results=args.results,
+        questions=args.questions,
+        answers=args.answers,
+        memberships=args.memberships,
+        days=args.days,
+        seed=args.seed,
+        redis_answers=not args.skip_redis,
+        progress=lambda message: print(message, file=sys.stderr),
+    )
+    summary = await generator.generate(engine)
+    if not args.skip_redis:
+        db = SessionLocal()
+        try:
+            summary["leaderboards"] = await leaderboard.rebuild(db=db)
+        finally:
+            db.close()
+    print(json.dumps(summary))
+
+
+async def idp_init(args: argparse.Namespace) -> None:
+    from core.local_idp import LocalIdentityProvider
+
+    idp = LocalIdentityProvider(args.dir)
+    print(json.dumps(idp.init(force=args.force)))
+
+
+async def idp_token(args: argparse.Namespace) -> None:
+    from core.local_idp import LocalIdentityProvider
+
+    claims = {}
+    for claim in args.claim:
+        key, _, value = claim.partition("=")
+        try:
+            claims[key] = json.loads(value)
+        except ValueError:
+            claims[key] = value
+    idp = LocalIdentityProvider(args.dir)
+    print(idp.mint(email=args.email, claims=claims, expires_in=args.expires_in))
+
+
+async def idp_serve(args: argparse.Namespace) -> None:
+    from functools import partial
+    from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+    from core.local_idp import LocalIdentityProvider
+
+    idp = LocalIdentityProvider(args.dir)
+
+    class JWKSHandler(SimpleHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/.well-known/jwks.json":
+                self.send_error(404)
+                return
+            self.path = "/jwks.json"
+            super().do_GET()
+
+    handler = partial(JWKSHandler, directory=str(idp.directory))
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), handler)
+    print(f"JWKS_URL=http://127.0.0.1:{args.port}/.well-known/jwks.json")
+    server.serve_forever()
+
+
+async def profile_token(args: argparse.Namespace) -> None:
+    from core.profiling import PROFILING_SECRET, profile_token
+
+    if not PROFILING_SECRET:
+        raise SystemExit("PROFILING_SECRET is not set")
+    print(profile_token(args.ttl))
+
+
+async def serve(args: argparse.Namespace) -> None:
+    import os
+    import sys
+
+    # settings live in gunicorn.conf.py, these only override its defaults
+    if args.workers:
+        os.environ["WEB_CONCURRENCY"] = str(args.workers)
+    if args.bind:
+        os.environ["BIND"] = args.bind
+    root = os.path.dirname(os.path.abspath(__file__))
+    os.execvp(
+        sys.executable,
+        [
+            sys.executable,
+            "-m",
+            "gunicorn",
+            "--chdir",
+            root,
+            "--config",
+            os.path.join(root, "gunicorn.conf.py"),
+        ],
+    )
+
+
+COMMANDS = {
+    "redis-usage": redis_usage,
+    "rebuild-leaderboards": rebuild_leaderboards,
+    "flush-answer-stats": flush_answer_stats,
+    "seed": seed,
+    "idp-init": idp_init,
+    "idp-token": idp_token,
+    "idp-serve": idp_serve,
+    "profile-token": profile_token,
+    "serve": serve,
+}
+
+
+def get_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Quiz app management commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    usage_parser = subparsers.add_parser(
+        "redis-usage", help="Report Redis bytes used by answers per user and quiz"
+    )
+    usage_parser.add_argument(
+        "--top",
+        type=int,
+        default=20,
+        help="Show only N biggest users/quizzes, 0 for all",
+    )
+    subparsers.add_parser(
+        "rebuild-leaderboards",
+        help="Recreate company and quiz leaderboards from the results table",
+    )
+    subparsers.add_parser(
+        "flush-answer-stats",
+        help="Write pending answer counters from Redis to the database",
+    )
+    seed_parser = subparsers.add_parser(
+        "seed",
+        help="Bulk load a synthetic dataset into an empty Postgres database",
+    )
+    seed_parser.add_argument("--users", type=int, default=50000)
+    seed_parser.add_argument("--companies", type=int, default=2000)
+    seed_parser.add_argument("--quizzes", type=int, default=5000)
+    seed_parser.add_argument("--results", type=int, default=10000000)
+    seed_parser.add_argument("--questions", type=int, default=10, help="Per quiz")
+    seed_parser.add_argument("--answers", type=int, default=4, help="Per question")
+    seed_parser.add_argument(
+        "--memberships", type=float, default=1.5, help="Companies per user on average"
+    )
+    seed_parser.add_argument(
+        "--days", type=int, default=365, help="How far back results go"
+    )
+    seed_parser.add_argument("--seed", type=int, default=0)
+    seed_parser.add_argument(
+        "--skip-redis",
+        action="store_true",
+        help="Don't write answer hashes and leaderboards",
+    )
+    idp_init_parser = subparsers.add_parser(
+        "idp-init", help="Generate the local identity provider key pair and JWKS"
+    )
+    idp_init_parser.add_argument("--force", action="store_true")
+    idp_token_parser = subparsers.add_parser(
+        "idp-token", help="Mint an RS256 token signed by the local identity provider"
+    )
+    idp_token_parser.add_argument("--email")
+    idp_token_parser.add_argument(
+        "--claim",
+        action="append",
+        default=[],
+        help="key=value, value parsed as JSON when it is valid JSON, repeatable",
+    )
+    idp_token_parser.add_argument("--expires-in", type=int, default=1800)
+    idp_serve_parser = subparsers.add_parser(
+        "idp-serve", help="Serve the local identity provider JWKS over HTTP"
+    )
+    idp_serve_parser.add_argument("--port", type=int, default=8765)
+    for idp_parser in (idp_init_parser, idp_token_parser, idp_serve_parser):
+        idp_parser.add_argument("--dir", help="Key directory, default LOCAL_IDP_DIR")
+    profile_parser = subparsers.add_parser(
+        "profile-token",
+        help="Sign an X-Profile header value that turns on request profiling",
+    )
+    profile_parser.add_argument("--ttl", type=int, default=600, help="Seconds")
+    serve_parser = subparsers.add_parser(
+        "serve", help="Run the app under gunicorn with uvicorn workers"
+    )
+    serve_parser.add_argument(
+        "--workers", type=int, help="Default WEB_CONCURRENCY or one per CPU"
+    )
+    serve_parser.add_argument("--bind", help="Default BIND or 0.0.0.0:$PORT")
+    return parser
+
+
+async def run(args: argparse.Namespace) -> None:
+    try:
+        await COMMANDS[args.command](args)
+    finally:
+        await redis_db.close()
+        await redis_db.connection_pool.disconnect()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(get_parser().parse_args()))
@@ -0,0 +1,51 @@
+"""result rollups
+
+Revision ID: 3f2a9c41d8e7
+Revises: 7c88515497b0
+Create Date: 2026-10-19 12:40:11.204518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2a9c41d8e7'
+down_revision = '7c88515497b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('result_rollups',
+    sa.Column('quiz_id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('company_id', sa.Integer(), nullable=True),
+    sa.Column('results_count', sa.Integer(), nullable=False),
+    sa.Column('results_sum', sa.Float(), nullable=False),
+    sa.Column('results_min', sa.Float(), nullable=False),
+    sa.Column('results_max', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('quiz_id', 'user_id', 'day')
+    )
+    op.create_index('ix_result_rollups_company_id_day', 'result_rollups', ['company_id', 'day'], unique=False)
+    op.create_index('ix_result_rollups_user_id_day', 'result_rollups', ['user_id', 'day'], unique=False)
+    # backfill from the results written before rollups existed
+    op.execute(
+        """
+        INSERT INTO result_rollups (quiz_id, user_id, day, company_id, results_count, results_sum, results_min, results_max)
+        SELECT quiz_id, user_id, CAST(created_at AS DATE), MAX(company_id), COUNT(*), SUM(result), MIN(result), MAX(result)
+        FROM results
+        WHERE quiz_id IS NOT NULL AND user_id IS NOT NULL AND created_at IS NOT NULL
+        GROUP BY quiz_id, user_id, CAST(created_at AS DATE)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_result_rollups_user_id_day', table_name='result_rollups')
+    op.drop_index('ix_result_rollups_company_id_day', table_name='result_rollups')
+    op.drop_table('result_rollups')
@@ -0,0 +1,24 @@
+"""results activity index
+
+Revision ID: 8d14e0b6c2a5
+Revises: 3f2a9c41d8e7
+Create Date: 2026-10-19 13:05:42.811907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d14e0b6c2a5'
+down_revision = '3f2a9c41d8e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_results_user_id_quiz_id_created_at', 'results', ['user_id', 'quiz_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_results_user_id_quiz_id_created_at', table_name='results')
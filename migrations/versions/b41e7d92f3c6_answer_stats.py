@@ -0,0 +1,35 @@
+"""answer stats
+
+Revision ID: b41e7d92f3c6
+Revises: 8d14e0b6c2a5
+Create Date: 2026-10-19 14:22:08.530174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41e7d92f3c6'
+down_revision = '8d14e0b6c2a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('answer_stats',
+    sa.Column('answer_id', sa.Integer(), nullable=False),
+    sa.Column('question_id', sa.Integer(), nullable=True),
+    sa.Column('quiz_id', sa.Integer(), nullable=True),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['answer_id'], ['answers.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['question_id'], ['questions.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('answer_id')
+    )
+    op.create_index(op.f('ix_answer_stats_quiz_id'), 'answer_stats', ['quiz_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_answer_stats_quiz_id'), table_name='answer_stats')
+    op.drop_table('answer_stats')
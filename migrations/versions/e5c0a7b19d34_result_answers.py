@@ -0,0 +1,35 @@
+"""result answers
+
+Revision ID: e5c0a7b19d34
+Revises: b41e7d92f3c6
+Create Date: 2026-10-19 15:10:37.916244
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c0a7b19d34'
+down_revision = 'b41e7d92f3c6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('result_answers',
+    sa.Column('result_id', sa.Integer(), nullable=False),
+    sa.Column('quiz_id', sa.Integer(), nullable=True),
+    sa.Column('question_ids', sa.Text(), nullable=False),
+    sa.Column('answer_ids', sa.Text(), nullable=False),
+    sa.Column('correct', sa.Text(), nullable=False),
+    sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['result_id'], ['results.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('result_id')
+    )
+    op.create_index(op.f('ix_result_answers_quiz_id'), 'result_answers', ['quiz_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_result_answers_quiz_id'), table_name='result_answers')
+    op.drop_table('result_answers')
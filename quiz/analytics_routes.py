@@ -1,27 +1,37 @@
 from typing import List
 
-from fastapi import APIRouter, Security, Depends, HTTPException
+from fastapi import APIRouter, Security, Depends, HTTPException, Query
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from core.database import get_db
+from core.etag import ConditionalGet
+from core.query_stats import query_budget
+from core.tracing import TracedRoute
 from quiz.schemas.company import CompanyUserLastActivity
+from quiz.schemas.leaderboard import LeaderboardEntry
+from quiz.schemas.questions import QuestionDistribution
 from quiz.schemas.result import (
     QuizResultAvarage,
     UserResultAvarage,
     UserQuizResultAvarage,
     UserQuizLastActivity,
+    RollupGranularity,
+    ResultRollupPoint,
+    ResultStatistics,
+    ItemAnalysis,
 )
 from quiz.schemas.user import UserAverageResult
 from quiz.service import UserService, AnalyticService
 
-router = APIRouter()
+router = APIRouter(dependencies=[Depends(query_budget(10))], route_class=TracedRoute)
 
 
 def get_analytic_service(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Security(UserService.security),
+    conditional: ConditionalGet = Depends(),
 ):
-    return AnalyticService(db=db, credentials=credentials)
+    return AnalyticService(db=db, credentials=credentials, conditional=conditional)
 
 
 @router.get("/quiz_avarege_result/{quiz_id}", response_model=List[QuizResultAvarage])
@@ -52,9 +62,13 @@ async def employee_avarege_result(
 )
 async def list_employees_last_activity(
     company_id: int,
+    skip: int = 0,
+    limit: int = 100,
     analytic_repo: AnalyticService = Depends(get_analytic_service),
 ) -> List[CompanyUserLastActivity]:
-    return await analytic_repo.get_employee_last_activity_list(company_id=company_id)
+    return await analytic_repo.get_employee_last_activity_list(
+        company_id=company_id, skip=skip, limit=limit
+    )
 
 
 @router.get("/user_average_result/{user_id}", response_model=UserAverageResult)
@@ -79,6 +93,127 @@ async def user_average_quiz_result(
     "/list_user_quizzes_last_activity", response_model=List[UserQuizLastActivity]
 )
 async def list_quizzes_last_activity(
+    skip: int = 0,
+    limit: int = 100,
     analytic_repo: AnalyticService = Depends(get_analytic_service),
 ) -> List[UserQuizLastActivity]:
-    return await analytic_repo.get_list_quizzes_last_activity()
+    return await analytic_repo.get_list_quizzes_last_activity(skip=skip, limit=limit)
+
+
+@router.get("/quiz_rollup/{quiz_id}", response_model=List[ResultRollupPoint])
+async def quiz_rollup(
+    quiz_id: int,
+    granularity: RollupGranularity = RollupGranularity.day,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[ResultRollupPoint]:
+    return await analytic_repo.get_quiz_rollup(quiz_id=quiz_id, granularity=granularity)
+
+
+@router.get("/company_rollup/{company_id}", response_model=List[ResultRollupPoint])
+async def company_rollup(
+    company_id: int,
+    granularity: RollupGranularity = RollupGranularity.day,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[ResultRollupPoint]:
+    return await analytic_repo.get_company_rollup(
+        company_id=company_id, granularity=granularity
+    )
+
+
+@router.get(
+    "/employee_rollup/{company_id}/{user_id}", response_model=List[ResultRollupPoint]
+)
+async def employee_rollup(
+    company_id: int,
+    user_id: int,
+    granularity: RollupGranularity = RollupGranularity.day,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[ResultRollupPoint]:
+    return await analytic_repo.get_employee_rollup(
+        company_id=company_id, user_id=user_id, granularity=granularity
+    )
+
+
+@router.get("/quiz_statistics/{quiz_id}", response_model=ResultStatistics)
+async def quiz_statistics(
+    quiz_id: int,
+    buckets: int = Query(10, ge=1, le=50),
+    pass_mark: float = Query(50, ge=0, le=100),
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> ResultStatistics:
+    return await analytic_repo.get_quiz_statistics(
+        quiz_id=quiz_id, buckets=buckets, pass_mark=pass_mark
+    )
+
+
+@router.get("/item_analysis/{quiz_id}", response_model=ItemAnalysis)
+async def item_analysis(
+    quiz_id: int,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> ItemAnalysis:
+    return await analytic_repo.get_item_analysis(quiz_id=quiz_id)
+
+
+@router.get(
+    "/question_distribution/{quiz_id}", response_model=List[QuestionDistribution]
+)
+async def question_distribution(
+    quiz_id: int,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[QuestionDistribution]:
+    return await analytic_repo.get_question_distribution(quiz_id=quiz_id)
+
+
+@router.get("/company_statistics/{company_id}", response_model=ResultStatistics)
+async def company_statistics(
+    company_id: int,
+    buckets: int = Query(10, ge=1, le=50),
+    pass_mark: float = Query(50, ge=0, le=100),
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> ResultStatistics:
+    return await analytic_repo.get_company_statistics(
+        company_id=company_id, buckets=buckets, pass_mark=pass_mark
+    )
+
+
+@router.get("/leaderboard/company/{company_id}", response_model=List[LeaderboardEntry])
+async def company_leaderboard(
+    company_id: int,
+    limit: int = Query(10, ge=1, le=1000),
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[LeaderboardEntry]:
+    return await analytic_repo.get_company_leaderboard(
+        company_id=company_id, limit=limit
+    )
+
+
+@router.get(
+    "/leaderboard/company/{company_id}/rank/{user_id}",
+    response_model=LeaderboardEntry,
+)
+async def company_rank(
+    company_id: int,
+    user_id: int,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> LeaderboardEntry:
+    return await analytic_repo.get_company_rank(company_id=company_id, user_id=user_id)
+
+
+@router.get("/leaderboard/quiz/{quiz_id}", response_model=List[LeaderboardEntry])
+async def quiz_leaderboard(
+    quiz_id: int,
+    limit: int = Query(10, ge=1, le=1000),
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> List[LeaderboardEntry]:
+    return await analytic_repo.get_quiz_leaderboard(quiz_id=quiz_id, limit=limit)
+
+
+@router.get(
+    "/leaderboard/quiz/{quiz_id}/rank/{user_id}", response_model=LeaderboardEntry
+)
+async def quiz_rank(
+    quiz_id: int,
+    user_id: int,
+    analytic_repo: AnalyticService = Depends(get_analytic_service),
+) -> LeaderboardEntry:
+    return await analytic_repo.get_quiz_rank(quiz_id=quiz_id, user_id=user_id)
@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import os
+import uuid
+from typing import Callable, Dict
+
+from aioredis.exceptions import ResponseError
+from sqlalchemy.orm import Session
+
+from core.database import SessionLocal, dialect_insert, redis_db
+from quiz.models.db_models import AnswerStat
+
+logger = logging.getLogger("quiz-logger")
+
+ANSWER_STATS_FLUSH_INTERVAL = int(os.getenv("ANSWER_STATS_FLUSH_INTERVAL", "60"))
+
+
+class AnswerStats:
+    """How many times every answer was chosen.
+
+    Passing a quiz only increments Redis counters in a per-quiz pending hash,
+    flush() moves the accumulated deltas into the answer_stats table. Readers
+    add both, so counts are current even between flushes.
+    """
+
+    def __init__(
+        self,
+        prefix: str = "answer_stats",
+        interval: int = ANSWER_STATS_FLUSH_INTERVAL,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.prefix = prefix
+        self.interval = interval
+        self.session_factory = session_factory
+        self._task = None
+
+    def pending_key(self, quiz_id: int) -> str:
+        return f"{self.prefix}:pending:{quiz_id}"
+
+    @property
+    def dirty_key(self) -> str:
+        return f"{self.prefix}:dirty"
+
+    async def record(self, quiz_id: int, answers: Dict[int, int]) -> None:
+        """Counts chosen answers given as {question_id: answer_id}."""
+        key = self.pending_key(quiz_id)
+        async with redis_db.pipeline(transaction=True) as pipe:
+            for question_id, answer_id in answers.items():
+                pipe.hincrby(key, f"{question_id}:{answer_id}", 1)
+            pipe.sadd(self.dirty_key, quiz_id)
+            await pipe.execute()
+
+    async def pending(self, quiz_id: int) -> Dict[int, int]:
+        counts = await redis_db.hgetall(self.pending_key(quiz_id))
+        return {
+            int(field.partition(":")[2]): int(count) for field, count in counts.items()
+        }
+
+    async def flush(self, db: Session) -> int:
+        """Writes pending counters to the database, returns flushed quizzes."""
+        flushed = 0
+        while True:
+            quiz_id = await redis_db.spop(self.dirty_key)
+            if quiz_id is None:
+                return flushed
+            key = self.pending_key(quiz_id)
+            # new answers go to a fresh pending hash while this one is written
+            flushing_key = f"{key}:flushing:{uuid.uuid4().hex}"
+            try:
+                await redis_db.rename(key, flushing_key)
+            except ResponseError:
+                continue
+            counts = await redis_db.hgetall(flushing_key)
+            try:
+                self.save(db=db, quiz_id=int(quiz_id), counts=counts)
+            except Exception:
+                db.rollback()
+                async with redis_db.pipeline(transaction=True) as pipe:
+                    for field, count in counts.items():
+                        pipe.hincrby(key, field, count)
+                    pipe.sadd(self.dirty_key, quiz_id)
+                    pipe.delete(flushing_key)
+                    await pipe.execute()
+                raise
+            await redis_db.delete(flushing_key)
+            flushed += 1
+
+    @staticmethod
+    def save(db: Session, quiz_id: int, counts: Dict[str, str]) -> None:
+        for field, count in counts.items():
+            question_id, _, answer_id = field.partition(":")
+            insert = dialect_insert(db, AnswerStat).values(
+                answer_id=int(answer_id),
+                question_id=int(question_id),
+                quiz_id=quiz_id,
+                count=int(count),
+            )
+            db.execute(
+                insert.on_conflict_do_update(
+                    index_elements=["answer_id"],
+                    set_={"count": AnswerStat.count + insert.excluded.count},
+                )
+            )
+        db.commit()
+
+    async def _flush_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            db = self.session_factory()
+            try:
+                await self.flush(db=db)
+            except Exception:
+                logger.exception("Answer stats flush failed")
+            finally:
+                db.close()
+
+    def start(self) -> None:
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.create_task(self._flush_periodically())
+
+    async def shutdown(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+answer_stats = AnswerStats()
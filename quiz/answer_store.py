@@ -0,0 +1,94 @@
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from core.database import redis_db
+
+ANSWERS_TTL = 172800
+# HGETALLs per pipeline round trip when loading many keys
+ANSWERS_LOAD_BATCH = 1000
+
+
+class AnswerStore:
+    """Chosen answer ids of the latest attempt, one hash per (user, quiz)."""
+
+    def __init__(self, prefix: str = "answers", ttl: int = ANSWERS_TTL):
+        self.prefix = prefix
+        self.ttl = ttl
+
+    def answers_key(self, user_id: int, quiz_id: int) -> str:
+        return f"{self.prefix}:{user_id}:{quiz_id}"
+
+    async def save_answers(
+        self, user_id: int, quiz_id: int, answers: Dict[int, int]
+    ) -> None:
+        """Stores chosen answer ids as one small hash per (user, quiz).
+
+        Field and value are both integers, so the hash stays in Redis's compact
+        listpack encoding for any realistic number of questions.
+        """
+        key = self.answers_key(user_id=user_id, quiz_id=quiz_id)
+        async with redis_db.pipeline(transaction=True) as pipe:
+            pipe.delete(key)
+            pipe.hset(key, mapping=answers)
+            pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+    async def get_answer_keys(self, user_id="*", quiz_id="*") -> List[Tuple[int, int]]:
+        answer_keys = []
+        async for key in redis_db.scan_iter(match=self.answers_key(user_id, quiz_id)):
+            _, key_user_id, key_quiz_id = key.rsplit(":", 2)
+            answer_keys.append((int(key_user_id), int(key_quiz_id)))
+        return answer_keys
+
+    async def load_answers(
+        self, keys: Iterable[Tuple[int, int]]
+    ) -> List[Tuple[int, int, Dict[int, int]]]:
+        keys = list(keys)
+        stored = []
+        for start in range(0, len(keys), ANSWERS_LOAD_BATCH):
+            async with redis_db.pipeline(transaction=False) as pipe:
+                for user_id, quiz_id in keys[start : start + ANSWERS_LOAD_BATCH]:
+                    pipe.hgetall(self.answers_key(user_id=user_id, quiz_id=quiz_id))
+                stored.extend(await pipe.execute())
+        return [
+            (
+                user_id,
+                quiz_id,
+                {int(question): int(answer) for question, answer in answers.items()},
+            )
+            for (user_id, quiz_id), answers in zip(keys, stored)
+            if answers
+        ]
+
+    async def memory_usage(self) -> dict:
+        """Reports bytes used by stored answers, summed per user and per quiz."""
+        keys = await self.get_answer_keys()
+        async with redis_db.pipeline(transaction=False) as pipe:
+            for user_id, quiz_id in keys:
+                key = self.answers_key(user_id=user_id, quiz_id=quiz_id)
+                pipe.memory_usage(key)
+                pipe.object("encoding", key)
+            replies = await pipe.execute()
+
+        per_user = defaultdict(int)
+        per_quiz = defaultdict(int)
+        encodings = defaultdict(int)
+        for (user_id, quiz_id), used, encoding in zip(
+            keys, replies[::2], replies[1::2]
+        ):
+            per_user[user_id] += used or 0
+            per_quiz[quiz_id] += used or 0
+            encodings[encoding] += 1
+
+        total = sum(per_user.values())
+        return {
+            "keys": len(keys),
+            "total_bytes": total,
+            "bytes_per_key": total / len(keys) if keys else 0,
+            "encodings": dict(encodings),
+            "per_user": dict(per_user),
+            "per_quiz": dict(per_quiz),
+        }
+
+
+answer_store = AnswerStore()
@@ -6,6 +6,8 @@ from sqlalchemy.orm import Session
 from starlette import status
 
 from core.database import get_db
+from core.query_stats import query_budget
+from core.tracing import TracedRoute
 from quiz.schemas.company import (
     CompanyCreate,
     CompanyUpdate,
@@ -17,10 +19,14 @@ from quiz.schemas.invite import InviteBase
 from quiz.schemas.request import RequestBase
 from quiz.service import CompanyService, UserService, auth_required
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
-@router.get("/", response_model=List[CompanyBase])
+@router.get(
+    "/",
+    response_model=List[CompanyBase],
+    dependencies=[Depends(query_budget(3))],
+)
 async def company_list(
     skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
 ) -> List[CompanyBase]:
@@ -0,0 +1,208 @@
+import asyncio
+import csv
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core.database import redis_db
+
+logger = logging.getLogger("quiz-logger")
+
+EXPORT_DIR = os.getenv("EXPORT_DIR", "exports")
+EXPORT_RESULT_TTL = int(os.getenv("EXPORT_RESULT_TTL", "3600"))
+EXPORT_CONCURRENCY_PER_COMPANY = int(os.getenv("EXPORT_CONCURRENCY_PER_COMPANY", "1"))
+# a job holds its company slot at most this long, a slot of a killed worker
+# is freed after it
+EXPORT_JOB_TIMEOUT = int(os.getenv("EXPORT_JOB_TIMEOUT", "600"))
+EXPORT_SLOT_POLL_INTERVAL = float(os.getenv("EXPORT_SLOT_POLL_INTERVAL", "0.5"))
+# seconds a stopping worker waits for its running jobs, keep it below
+# gunicorn's graceful_timeout
+EXPORT_DRAIN_TIMEOUT = float(os.getenv("EXPORT_DRAIN_TIMEOUT", "20"))
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# slots are job ids in a sorted set scored by when they were taken
+ACQUIRE_SLOT_SCRIPT = """
+redis.call("ZREMRANGEBYSCORE", KEYS[1], "-inf", ARGV[1] - ARGV[3])
+if redis.call("ZCARD", KEYS[1]) < tonumber(ARGV[2]) then
+    redis.call("ZADD", KEYS[1], ARGV[1], ARGV[4])
+    redis.call("EXPIRE", KEYS[1], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+
+def write_csv(path: str, headers: list, rows: list) -> None:
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(headers)
+        w.writerows(rows)
+
+
+class ExportJobQueue:
+    """Runs CSV exports as asyncio tasks inside the worker that accepted them.
+
+    Job state lives in Redis so any worker can answer status polls, the CSV
+    itself is written to EXPORT_DIR. Both expire after EXPORT_RESULT_TTL.
+    The running jobs of a company are bounded across workers by slots in
+    Redis, a job waits as pending until it gets one.
+    """
+
+    def __init__(
+        self,
+        export_dir: str = EXPORT_DIR,
+        result_ttl: int = EXPORT_RESULT_TTL,
+        concurrency_per_company: int = EXPORT_CONCURRENCY_PER_COMPANY,
+        drain_timeout: float = EXPORT_DRAIN_TIMEOUT,
+        job_timeout: int = EXPORT_JOB_TIMEOUT,
+        slot_poll_interval: float = EXPORT_SLOT_POLL_INTERVAL,
+    ):
+        self.export_dir = export_dir
+        self.result_ttl = result_ttl
+        self.concurrency_per_company = concurrency_per_company
+        self.drain_timeout = drain_timeout
+        self.job_timeout = job_timeout
+        self.slot_poll_interval = slot_poll_interval
+        self._tasks: Dict[asyncio.Task, Tuple[str, int]] = {}
+
+    @staticmethod
+    def job_key(job_id: str) -> str:
+        return f"export_job:{job_id}"
+
+    def file_path(self, job_id: str) -> str:
+        return os.path.join(self.export_dir, f"{job_id}.csv")
+
+    @staticmethod
+    def slots_key(company_id: int) -> str:
+        return f"export_slots:{company_id}"
+
+    async def _acquire_slot(self, company_id: int, job_id: str) -> None:
+        while not await redis_db.eval(
+            ACQUIRE_SLOT_SCRIPT,
+            1,
+            self.slots_key(company_id),
+            time.time(),
+            self.concurrency_per_company,
+            self.job_timeout,
+            job_id,
+        ):
+            await asyncio.sleep(self.slot_poll_interval)
+
+    async def _release_slot(self, company_id: int, job_id: str) -> None:
+        await redis_db.zrem(self.slots_key(company_id), job_id)
+
+    async def _update(self, job_id: str, **fields) -> None:
+        key = self.job_key(job_id)
+        await redis_db.hset(key, mapping=fields)
+        await redis_db.expire(key, self.result_ttl)
+
+    def purge_expired_files(self) -> None:
+        if not os.path.isdir(self.export_dir):
+            return
+        expired_before = time.time() - self.result_ttl
+        for name in os.listdir(self.export_dir):
+            path = os.path.join(self.export_dir, name)
+            if os.path.getmtime(path) < expired_before:
+                os.remove(path)
+
+    async def submit(
+        self,
+        company_id: int,
+        headers: List[str],
+        collect: Callable[[], Awaitable[list]],
+    ) -> dict:
+        self.purge_expired_files()
+        job_id = uuid.uuid4().hex
+        await self._update(
+            job_id,
+            company_id=company_id,
+            status=PENDING,
+            created_at=datetime.utcnow().isoformat(),
+        )
+        task = asyncio.create_task(self._run(job_id, company_id, headers, collect))
+        self._tasks[task] = (job_id, company_id)
+        task.add_done_callback(self._tasks.pop)
+        return await self.get(job_id)
+
+    async def _run(
+        self,
+        job_id: str,
+        company_id: int,
+        headers: List[str],
+        collect: Callable[[], Awaitable[list]],
+    ) -> None:
+        try:
+            await self._acquire_slot(company_id, job_id)
+            try:
+                await self._update(job_id, status=RUNNING)
+                await asyncio.wait_for(
+                    self._export(job_id, headers, collect), self.job_timeout
+                )
+            finally:
+                await self._release_slot(company_id, job_id)
+        except asyncio.TimeoutError:
+            logger.error(f"Export job {job_id} timed out")
+            await self._fail(job_id, f"timed out after {self.job_timeout}s")
+            return
+        except Exception as e:
+            logger.exception(f"Export job {job_id} failed")
+            await self._fail(job_id, str(e))
+            return
+        await self._update(
+            job_id, status=DONE, finished_at=datetime.utcnow().isoformat()
+        )
+        logger.debug(f"Export job {job_id} for company {company_id} finished")
+
+    async def _export(
+        self, job_id: str, headers: List[str], collect: Callable[[], Awaitable[list]]
+    ) -> None:
+        rows = await collect()
+        os.makedirs(self.export_dir, exist_ok=True)
+        await asyncio.get_running_loop().run_in_executor(
+            None, write_csv, self.file_path(job_id), headers, rows
+        )
+
+    async def _fail(self, job_id: str, error: str) -> None:
+        await self._update(
+            job_id,
+            status=FAILED,
+            error=error,
+            finished_at=datetime.utcnow().isoformat(),
+        )
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        job = await redis_db.hgetall(self.job_key(job_id))
+        if not job:
+            return None
+        return {"id": job_id, **job}
+
+    async def wait(self) -> None:
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def shutdown(self) -> None:
+        # workers are recycled after max_requests, let their jobs finish
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=self.drain_timeout)
+        cancelled = dict(self._tasks)
+        # a cancel can get lost inside the Redis client, so it is repeated
+        # until the job stops
+        while self._tasks:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.wait(list(self._tasks), timeout=0.1)
+        # otherwise their state would stay running
+        for task, (job_id, company_id) in cancelled.items():
+            if task.cancelled():
+                await self._release_slot(company_id, job_id)
+                await self._fail(job_id, "cancelled by worker shutdown")
+
+
+export_jobs = ExportJobQueue()
@@ -0,0 +1,83 @@
+"""Classical test theory statistics over a submissions x questions matrix."""
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# share of the best and worst submissions compared by the discrimination index
+EXTREME_GROUP_FRACTION = 0.27
+
+
+def correctness_matrix(
+    rows: Sequence[Tuple[str, str]], question_ids: Iterable[int]
+) -> np.ndarray:
+    """Decodes answer log rows into a submissions x questions 0/1 matrix.
+
+    Every row is (question_ids, patterns): the comma separated layout shared by
+    a group of submissions and their "0"/"1" patterns concatenated. Columns
+    follow sorted question_ids. Questions a submission has no answer for, e.g.
+    added later, count as incorrect, answers to removed questions are dropped.
+    """
+    columns = {
+        question_id: column for column, question_id in enumerate(sorted(question_ids))
+    }
+    blocks = []
+    for layout, patterns in rows:
+        layout_ids = [int(question_id) for question_id in layout.split(",")]
+        encoded = np.frombuffer(patterns.encode(), dtype=np.uint8) - ord("0")
+        decoded = encoded.reshape(-1, len(layout_ids))
+        known = [
+            i for i, question_id in enumerate(layout_ids) if question_id in columns
+        ]
+        block = np.zeros((len(decoded), len(columns)), dtype=np.int8)
+        block[:, [columns[layout_ids[i]] for i in known]] = decoded[:, known]
+        blocks.append(block)
+    if not blocks:
+        return np.zeros((0, len(columns)), dtype=np.int8)
+    return np.concatenate(blocks)
+
+
+def to_optional(values: np.ndarray) -> List[Optional[float]]:
+    return [float(value) if np.isfinite(value) else None for value in values]
+
+
+def item_statistics(matrix: np.ndarray) -> dict:
+    submissions, items = matrix.shape
+    empty = [None] * items
+    if not submissions:
+        return {
+            "submissions": 0,
+            "cronbach_alpha": None,
+            "difficulty": empty,
+            "discrimination": empty,
+            "point_biserial": empty,
+        }
+
+    x = matrix.astype(np.float64)
+    totals = x.sum(axis=1)
+    difficulty = x.mean(axis=0)
+
+    # correlate with the rest score so an item isn't correlated with itself
+    rest = totals[:, None] - x
+    with np.errstate(divide="ignore", invalid="ignore"):
+        covariance = (x * rest).mean(axis=0) - difficulty * rest.mean(axis=0)
+        point_biserial = covariance / (x.std(axis=0) * rest.std(axis=0))
+
+    group = max(1, int(np.ceil(submissions * EXTREME_GROUP_FRACTION)))
+    order = np.argsort(totals, kind="stable")
+    discrimination = x[order[-group:]].mean(axis=0) - x[order[:group]].mean(axis=0)
+
+    cronbach_alpha = None
+    if items > 1 and submissions > 1:
+        total_variance = totals.var(ddof=1)
+        if total_variance > 0:
+            cronbach_alpha = float(
+                items / (items - 1) * (1 - x.var(axis=0, ddof=1).sum() / total_variance)
+            )
+
+    return {
+        "submissions": submissions,
+        "cronbach_alpha": cronbach_alpha,
+        "difficulty": to_optional(difficulty),
+        "discrimination": to_optional(discrimination),
+        "point_biserial": to_optional(point_biserial),
+    }
@@ -0,0 +1,142 @@
+from collections import defaultdict
+from typing import List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from core.cache import analytics_cache
+from core.database import redis_db
+from quiz.models.db_models import Question, Result
+
+RECORD_RESULT_SCRIPT = """
+local correct = redis.call("HINCRBY", KEYS[1], ARGV[1] .. ":correct", ARGV[2])
+local answered = redis.call("HINCRBY", KEYS[1], ARGV[1] .. ":answered", ARGV[3])
+redis.call("ZADD", KEYS[2], correct / answered * 100, ARGV[1])
+redis.call("ZADD", KEYS[3], ARGV[4], ARGV[1])
+return 1
+"""
+
+
+class Leaderboard:
+    """Per-company and per-quiz rankings kept in Redis sorted sets.
+
+    A quiz score is the user's running average on that quiz. A company score
+    is correct answers / answered questions over all company quizzes, the
+    totals for it live in a hash next to the sorted set. The leaderboard
+    responses are cached under their own analytics scopes, bumped once the
+    sorted sets are written.
+    """
+
+    def __init__(self, prefix: str = "leaderboard"):
+        self.prefix = prefix
+
+    def company_key(self, company_id: int) -> str:
+        return f"{self.prefix}:company:{company_id}"
+
+    def company_progress_key(self, company_id: int) -> str:
+        return f"{self.prefix}:company:{company_id}:progress"
+
+    def quiz_key(self, quiz_id: int) -> str:
+        return f"{self.prefix}:quiz:{quiz_id}"
+
+    @staticmethod
+    def company_scope(company_id: int) -> str:
+        return f"company_leaderboard:{company_id}"
+
+    @staticmethod
+    def quiz_scope(quiz_id: int) -> str:
+        return f"quiz_leaderboard:{quiz_id}"
+
+    async def record_result(
+        self,
+        user_id: int,
+        company_id: int,
+        quiz_id: int,
+        quiz_average: float,
+        correct_answers: int,
+        questions_quantity: int,
+    ) -> None:
+        await redis_db.eval(
+            RECORD_RESULT_SCRIPT,
+            3,
+            self.company_progress_key(company_id),
+            self.company_key(company_id),
+            self.quiz_key(quiz_id),
+            user_id,
+            correct_answers,
+            questions_quantity,
+            quiz_average,
+        )
+        await analytics_cache.bump(
+            self.company_scope(company_id), self.quiz_scope(quiz_id)
+        )
+
+    @staticmethod
+    async def top(key: str, limit: int) -> List[Tuple[int, float, int]]:
+        entries = await redis_db.zrevrange(key, 0, limit - 1, withscores=True)
+        return [
+            (int(user_id), score, rank)
+            for rank, (user_id, score) in enumerate(entries, start=1)
+        ]
+
+    @staticmethod
+    async def rank(key: str, user_id: int) -> Optional[Tuple[int, float, int]]:
+        async with redis_db.pipeline(transaction=False) as pipe:
+            pipe.zrevrank(key, user_id)
+            pipe.zscore(key, user_id)
+            rank, score = await pipe.execute()
+        if rank is None:
+            return None
+        return user_id, score, rank + 1
+
+    async def rebuild(self, db: Session) -> dict:
+        """Recreates every leaderboard from the latest result per (user, quiz)."""
+        latest_ids = (
+            db.query(func.max(Result.id))
+            .group_by(Result.user_id, Result.quiz_id)
+            .scalar_subquery()
+        )
+        latest_results = db.query(Result).filter(Result.id.in_(latest_ids))
+        questions_count = dict(
+            db.query(Question.quiz_id, func.count(Question.id))
+            .group_by(Question.quiz_id)
+            .all()
+        )
+
+        quizzes = defaultdict(dict)
+        progress = defaultdict(lambda: defaultdict(int))
+        for result in latest_results:
+            quizzes[result.quiz_id][result.user_id] = result.average_result
+            company_progress = progress[result.company_id]
+            company_progress[f"{result.user_id}:correct"] += result.correct_answers
+            company_progress[
+                f"{result.user_id}:answered"
+            ] += result.attempts * questions_count.get(result.quiz_id, 0)
+
+        stale_keys = [key async for key in redis_db.scan_iter(f"{self.prefix}:*")]
+        async with redis_db.pipeline(transaction=True) as pipe:
+            if stale_keys:
+                pipe.delete(*stale_keys)
+            for quiz_id, scores in quizzes.items():
+                pipe.zadd(self.quiz_key(quiz_id), scores)
+            for company_id, company_progress in progress.items():
+                pipe.hset(
+                    self.company_progress_key(company_id), mapping=company_progress
+                )
+                scores = {}
+                for field, answered in company_progress.items():
+                    user_id, _, counter = field.partition(":")
+                    if counter == "answered" and answered:
+                        correct = company_progress[f"{user_id}:correct"]
+                        scores[user_id] = correct / answered * 100
+                if scores:
+                    pipe.zadd(self.company_key(company_id), scores)
+            await pipe.execute()
+        await analytics_cache.bump(
+            *(self.quiz_scope(quiz_id) for quiz_id in quizzes),
+            *(self.company_scope(company_id) for company_id in progress),
+        )
+        return {"quizzes": len(quizzes), "companies": len(progress)}
+
+
+leaderboard = Leaderboard()
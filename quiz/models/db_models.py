@@ -7,6 +7,9 @@ from sqlalchemy import (
     Table,
     Float,
     TIMESTAMP,
+    Date,
+    Index,
+    Text,
     func,
 )
 from sqlalchemy.orm import relationship
@@ -139,6 +142,11 @@ class Answer(Base):
 
 class Result(Base):
     __tablename__ = "results"
+    __table_args__ = (
+        Index(
+            "ix_results_user_id_quiz_id_created_at", "user_id", "quiz_id", "created_at"
+        ),
+    )
 
     id = Column(Integer, primary_key=True, index=True, unique=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -152,6 +160,50 @@ class Result(Base):
     created_at = Column(TIMESTAMP, default=func.now())
 
 
+class ResultRollup(Base):
+    __tablename__ = "result_rollups"
+    __table_args__ = (
+        Index("ix_result_rollups_company_id_day", "company_id", "day"),
+        Index("ix_result_rollups_user_id_day", "user_id", "day"),
+    )
+
+    quiz_id = Column(
+        Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), primary_key=True
+    )
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    company_id = Column(Integer, ForeignKey("companies.id", ondelete="CASCADE"))
+    results_count = Column(Integer, nullable=False)
+    results_sum = Column(Float, nullable=False)
+    results_min = Column(Float, nullable=False)
+    results_max = Column(Float, nullable=False)
+
+
+class AnswerStat(Base):
+    __tablename__ = "answer_stats"
+
+    answer_id = Column(
+        Integer, ForeignKey("answers.id", ondelete="CASCADE"), primary_key=True
+    )
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"))
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), index=True)
+    count = Column(Integer, nullable=False)
+
+
+class ResultAnswer(Base):
+    __tablename__ = "result_answers"
+
+    result_id = Column(
+        Integer, ForeignKey("results.id", ondelete="CASCADE"), primary_key=True
+    )
+    quiz_id = Column(Integer, ForeignKey("quizzes.id", ondelete="CASCADE"), index=True)
+    # one submission per row, ids comma separated and correct as a "0"/"1"
+    # string in the same order, so a quiz's log decodes straight into a matrix
+    question_ids = Column(Text, nullable=False)
+    answer_ids = Column(Text, nullable=False)
+    correct = Column(Text, nullable=False)
+
+
 users = User.__table__
 companies = Company.__table__
 invites = Invite.__table__
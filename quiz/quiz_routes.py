@@ -4,8 +4,12 @@ from fastapi import APIRouter, Security, Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials
 from sqlalchemy.orm import Session
 from starlette import status
-from starlette.responses import FileResponse
+from starlette.responses import FileResponse, Response
 from core.database import get_db
+from core.etag import ConditionalGet
+from core.query_stats import query_budget
+from core.tracing import TracedRoute
+from quiz.schemas.export import ExportJob
 from quiz.schemas.result import ResultBase
 from quiz.schemas.quiz import (
     QuizCreate,
@@ -17,14 +21,15 @@ from quiz.schemas.quiz import (
 )
 from quiz.service import UserService, QuizService
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 
 def get_quiz_service(
     db: Session = Depends(get_db),
     credentials: HTTPAuthorizationCredentials = Security(UserService.security),
+    conditional: ConditionalGet = Depends(),
 ):
-    return QuizService(db=db, credentials=credentials)
+    return QuizService(db=db, credentials=credentials, conditional=conditional)
 
 
 @router.post("/create/{pk}", response_model=QuizList)
@@ -64,7 +69,11 @@ async def quiz_update(
     )
 
 
-@router.get("/{company_id}", response_model=List[QuizList])
+@router.get(
+    "/{company_id}",
+    response_model=List[QuizList],
+    dependencies=[Depends(query_budget(2))],
+)
 async def quiz_list(
     company_id: int,
     skip: int = 0,
@@ -76,17 +85,25 @@ async def quiz_list(
     )
 
 
-@router.get("/info/{quiz_id}", response_model=QuizInfo)
+@router.get(
+    "/info/{quiz_id}",
+    response_model=QuizInfo,
+    dependencies=[Depends(query_budget(2))],
+)
 async def quiz_info(
     quiz_id: int, quiz_repo: QuizService = Depends(get_quiz_service)
 ) -> QuizInfo:
     return await quiz_repo.get_quiz_info(quiz_id=quiz_id)
 
 
-@router.get("/read_question/{quiz_id}", response_model=QuizQuestions)
+@router.get(
+    "/read_question/{quiz_id}",
+    response_model=QuizQuestions,
+    dependencies=[Depends(query_budget(3))],
+)
 async def quiz_read_question(
     quiz_id: int, quiz_repo: QuizService = Depends(get_quiz_service)
-) -> QuizQuestions:
+) -> Response:
     return await quiz_repo.get_quiz_questions(quiz_id=quiz_id)
 
 
@@ -130,3 +147,28 @@ async def redis_test(
     return await quiz_repo.get_company_employee_answers_from_redis(
         company_id=company_id, employee_id=employee_id
     )
+
+
+@router.post(
+    "/export/company/{company_id}",
+    response_model=ExportJob,
+    status_code=status.HTTP_202_ACCEPTED,
+)
+async def export_company_answers(
+    company_id: int, quiz_repo: QuizService = Depends(get_quiz_service)
+) -> ExportJob:
+    return await quiz_repo.create_company_answers_export(company_id=company_id)
+
+
+@router.get("/export/{job_id}", response_model=ExportJob)
+async def export_status(
+    job_id: str, quiz_repo: QuizService = Depends(get_quiz_service)
+) -> ExportJob:
+    return await quiz_repo.get_export_job_status(job_id=job_id)
+
+
+@router.get("/export/{job_id}/download", status_code=status.HTTP_200_OK)
+async def export_download(
+    job_id: str, quiz_repo: QuizService = Depends(get_quiz_service)
+) -> FileResponse:
+    return await quiz_repo.download_export(job_id=job_id)
@@ -0,0 +1,13 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class ExportJob(BaseModel):
+    id: str
+    company_id: int
+    status: str
+    created_at: datetime
+    finished_at: Optional[datetime]
+    error: Optional[str]
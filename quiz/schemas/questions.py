@@ -1,3 +1,5 @@
+from typing import List, Optional
+
 from pydantic import BaseModel, conlist, validator
 
 from quiz.schemas.answers import AnswerCreate, AnswerRead
@@ -44,3 +46,18 @@ class QuestionPass(BaseModel):
 class QuestionAnswerRead(BaseModel):
     id: int
     answer: str
+
+
+class AnswerDistribution(BaseModel):
+    answer_id: int
+    answer_text: str
+    is_correct: bool
+    count: int
+
+
+class QuestionDistribution(BaseModel):
+    question_id: int
+    question_title: str
+    answers_count: int
+    percent_correct: Optional[float]
+    answers: List[AnswerDistribution]
@@ -1,4 +1,6 @@
-from datetime import datetime
+from datetime import datetime, date
+from enum import Enum
+from typing import List, Optional
 
 from pydantic import BaseModel
 
@@ -34,3 +36,49 @@ class UserQuizResultAvarage(BaseModel):
 class UserQuizLastActivity(BaseModel):
     quiz_id: int
     last_activity: datetime
+
+
+class RollupGranularity(str, Enum):
+    day = "day"
+    week = "week"
+    month = "month"
+
+
+class ResultRollupPoint(BaseModel):
+    period_start: date
+    count: int
+    average_result: float
+    min_result: float
+    max_result: float
+
+
+class HistogramBucket(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+
+class ResultStatistics(BaseModel):
+    count: int
+    average_result: Optional[float]
+    min_result: Optional[float]
+    max_result: Optional[float]
+    median: Optional[float]
+    p10: Optional[float]
+    p90: Optional[float]
+    pass_rate: Optional[float]
+    histogram: List[HistogramBucket]
+
+
+class ItemStatistics(BaseModel):
+    question_id: int
+    difficulty: Optional[float]
+    discrimination: Optional[float]
+    point_biserial: Optional[float]
+
+
+class ItemAnalysis(BaseModel):
+    quiz_id: int
+    submissions: int
+    cronbach_alpha: Optional[float]
+    items: List[ItemStatistics]
@@ -0,0 +1,487 @@
+import io
+import time
+from datetime import datetime
+from typing import Callable, Iterable, List, Optional
+
+import numpy
+from sqlalchemy.engine import Engine
+
+from core.database import redis_db
+from core.hashing import Hasher
+from quiz.answer_store import answer_store
+
+SEED_PASSWORD = "password"
+COPY_CHUNK_ROWS = 200000
+SEQUENCE_TABLES = ("users", "companies", "quizzes", "questions", "answers", "results")
+
+
+def copy_rows(cursor, table: str, columns: List[str], lines: Iterable[str]) -> None:
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(columns)}) FROM STDIN",
+        io.StringIO("".join(lines)),
+    )
+
+
+class DatasetGenerator:
+    """Bulk loads a synthetic but self-consistent dataset into Postgres.
+
+    Rows are generated with numpy in chunks and streamed with COPY. Users
+    join companies with a Zipf-like skew and take the quizzes of their
+    companies a skewed number of times. Answers follow a one-parameter IRT
+    model, user ability against question difficulty, so item analysis and
+    distributions look like real data. Results carry the same running
+    attempts, correct_answers and average_result the app would have stored,
+    the answer log, rollups, answer counters, user totals, the latest
+    answers in Redis and the leaderboards are derived from them.
+    """
+
+    def __init__(
+        self,
+        users: int,
+        companies: int,
+        quizzes: int,
+        results: int,
+        questions: int = 10,
+        answers: int = 4,
+        memberships: float = 1.5,
+        days: int = 365,
+        seed: int = 0,
+        redis_answers: bool = True,
+        progress: Optional[Callable[[str], None]] = None,
+    ):
+        self.users = users
+        self.companies = companies
+        self.quizzes = quizzes
+        self.results = results
+        self.questions = questions
+        self.answers = answers
+        self.memberships = memberships
+        self.days = days
+        self.redis_answers = redis_answers
+        self.progress = progress or (lambda message: None)
+        self.rng = numpy.random.default_rng(seed)
+        self.timings = {}
+        self._stage_started = None
+
+    def stage(self, name: str) -> None:
+        now = time.perf_counter()
+        if self._stage_started is not None:
+            previous, started = self._stage_started
+            self.timings[previous] = round(now - started, 2)
+        self._stage_started = (name, now) if name else None
+        if name:
+            self.progress(name)
+
+    async def generate(self, engine: Engine) -> dict:
+        if engine.dialect.name != "postgresql":
+            raise RuntimeError("seed loads data with COPY and needs Postgres")
+        connection = engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT EXISTS (SELECT 1 FROM users)")
+            if cursor.fetchone()[0]:
+                raise RuntimeError("seed needs an empty database")
+            self.skip_foreign_key_checks(connection, cursor)
+
+            self.stage("users and companies")
+            members, quiz_companies = self.copy_companies(cursor)
+            self.stage("quizzes")
+            correct_positions = self.copy_quizzes(cursor, quiz_companies)
+            self.stage("results")
+            answer_counts, user_results, user_correct = await self.copy_results(
+                cursor, members, quiz_companies, correct_positions
+            )
+            self.stage("answer counters and user totals")
+            self.copy_answer_stats(cursor, answer_counts)
+            self.update_user_totals(cursor, user_results, user_correct)
+            self.stage("rollups")
+            self.insert_rollups(cursor)
+            self.stage("sequences and statistics")
+            for table in SEQUENCE_TABLES:
+                cursor.execute(
+                    f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                    f"coalesce(max(id), 1)) FROM {table}"
+                )
+            connection.commit()
+            cursor.execute("ANALYZE")
+            connection.commit()
+            self.stage("")
+        except Exception:
+            connection.rollback()
+            raise
+        finally:
+            connection.close()
+        return {
+            "users": self.users,
+            "companies": self.companies,
+            "quizzes": self.quizzes,
+            "results": int(user_results.sum()),
+            "seconds": self.timings,
+        }
+
+    @staticmethod
+    def skip_foreign_key_checks(connection, cursor) -> None:
+        # rows are consistent by construction, checking every foreign key of
+        # millions of rows costs more than generating them; this needs
+        # superuser rights, without them the checks simply stay on
+        try:
+            cursor.execute("SET LOCAL session_replication_role = replica")
+        except Exception:
+            connection.rollback()
+
+    def copy_companies(self, cursor) -> tuple:
+        password = Hasher.get_password_hash(SEED_PASSWORD)
+        copy_rows(
+            cursor,
+            "users",
+            [
+                "id",
+                "username",
+                "email",
+                "password",
+                "passed_questions",
+                "correct_answers",
+            ],
+            (
+                f"{i}\tuser{i}\tuser{i}@example.com\t{password}\t0\t0\n"
+                for i in range(1, self.users + 1)
+            ),
+        )
+
+        # a few big companies and a long tail of small ones
+        weights = 1 / numpy.arange(1, self.companies + 1) ** 1.1
+        weights /= weights.sum()
+        owners = self.rng.integers(1, self.users + 1, self.companies)
+        copy_rows(
+            cursor,
+            "companies",
+            ["id", "name", "description", "visibility", "owner"],
+            (
+                f"{i}\tcompany {i}\tgenerated\tt\t{owner}\n"
+                for i, owner in enumerate(owners.tolist(), start=1)
+            ),
+        )
+
+        joined = 1 + self.rng.poisson(max(self.memberships - 1, 0), self.users)
+        member_users = numpy.repeat(numpy.arange(1, self.users + 1), joined)
+        member_companies = self.rng.choice(
+            numpy.arange(1, self.companies + 1), member_users.size, p=weights
+        )
+        pairs = numpy.unique(
+            numpy.concatenate(
+                [
+                    member_companies * (self.users + 1) + member_users,
+                    numpy.arange(1, self.companies + 1) * (self.users + 1) + owners,
+                ]
+            )
+        )
+        company_ids, user_ids = numpy.divmod(pairs, self.users + 1)
+        copy_rows(
+            cursor,
+            "company_user",
+            ["company_id", "user_id"],
+            (
+                f"{company}\t{user}\n"
+                for company, user in zip(company_ids.tolist(), user_ids.tolist())
+            ),
+        )
+        members = numpy.split(
+            user_ids,
+            numpy.searchsorted(company_ids, numpy.arange(2, self.companies + 1)),
+        )
+
+        # every company gets a quiz, the rest follow company size
+        quiz_companies = numpy.concatenate(
+            [
+                numpy.arange(1, min(self.quizzes, self.companies) + 1),
+                self.rng.choice(
+                    numpy.arange(1, self.companies + 1),
+                    max(self.quizzes - self.companies, 0),
+                    p=weights,
+                ),
+            ]
+        )
+        return members, quiz_companies
+
+    def copy_quizzes(self, cursor, quiz_companies: numpy.ndarray) -> numpy.ndarray:
+        copy_rows(
+            cursor,
+            "quizzes",
+            ["id", "title", "description", "company_id"],
+            (
+                f"{i}\tquiz {i}\tgenerated\t{company}\n"
+                for i, company in enumerate(quiz_companies.tolist(), start=1)
+            ),
+        )
+        question_count = self.quizzes * self.questions
+        copy_rows(
+            cursor,
+            "questions",
+            ["id", "question_title", "quiz_id"],
+            (
+                f"{i}\tquestion {i}\t{(i - 1) // self.questions + 1}\n"
+                for i in range(1, question_count + 1)
+            ),
+        )
+        correct_positions = self.rng.integers(0, self.answers, question_count)
+        copy_rows(
+            cursor,
+            "answers",
+            ["id", "answer_text", "is_correct", "question_id"],
+            (
+                f"{(question - 1) * self.answers + position + 1}\tanswer {position}\t"
+                f"{'t' if position == correct else 'f'}\t{question}\n"
+                for question, correct in enumerate(correct_positions.tolist(), start=1)
+                for position in range(self.answers)
+            ),
+        )
+        return correct_positions
+
+    async def copy_results(
+        self,
+        cursor,
+        members: List[numpy.ndarray],
+        quiz_companies: numpy.ndarray,
+        correct_positions: numpy.ndarray,
+    ) -> tuple:
+        quiz_ids = numpy.arange(1, self.quizzes + 1)
+        order = numpy.argsort(quiz_companies, kind="stable")
+        company_quizzes = numpy.split(
+            quiz_ids[order],
+            numpy.searchsorted(
+                quiz_companies[order], numpy.arange(2, self.companies + 1)
+            ),
+        )
+        pair_users = numpy.concatenate(
+            [
+                numpy.repeat(company_members, quizzes.size)
+                for company_members, quizzes in zip(members, company_quizzes)
+            ]
+        )
+        pair_quizzes = numpy.concatenate(
+            [
+                numpy.tile(quizzes, company_members.size)
+                for company_members, quizzes in zip(members, company_quizzes)
+            ]
+        )
+        # some users retake a quiz many times, most only once or never
+        popularity = self.rng.gamma(0.7, size=pair_users.size)
+        attempts = self.rng.multinomial(self.results, popularity / popularity.sum())
+        taken = attempts > 0
+        pair_users, pair_quizzes, attempts = (
+            pair_users[taken],
+            pair_quizzes[taken],
+            attempts[taken],
+        )
+
+        ability = self.rng.normal(0, 1, self.users + 1)
+        difficulty = self.rng.normal(-0.5, 1, (self.quizzes, self.questions))
+        layouts = [
+            ",".join(
+                str(question)
+                for question in range(
+                    (quiz - 1) * self.questions + 1, quiz * self.questions + 1
+                )
+            )
+            for quiz in range(self.quizzes + 1)
+        ]
+        now = datetime.utcnow()
+        answer_counts = numpy.zeros(
+            self.quizzes * self.questions * self.answers + 1, dtype=numpy.int64
+        )
+        user_results = numpy.zeros(self.users + 1, dtype=numpy.int64)
+        user_correct = numpy.zeros(self.users + 1, dtype=numpy.int64)
+
+        bounds = numpy.searchsorted(
+            numpy.cumsum(attempts),
+            numpy.arange(COPY_CHUNK_ROWS, attempts.sum(), COPY_CHUNK_ROWS),
+        )
+        next_id = 1
+        for chunk in numpy.split(numpy.arange(attempts.size), bounds + 1):
+            if not chunk.size:
+                continue
+            counts = attempts[chunk]
+            rows = int(counts.sum())
+            starts = numpy.cumsum(counts) - counts
+            pair = numpy.repeat(numpy.arange(chunk.size), counts)
+            attempt = numpy.arange(rows) - starts[pair] + 1
+            users = pair_users[chunk][pair]
+            quizzes = pair_quizzes[chunk][pair]
+
+            # a little better on every retake
+            logits = (
+                ability[users][:, None]
+                + 0.05 * (attempt - 1)[:, None]
+                - difficulty[quizzes - 1]
+            )
+            correct_matrix = self.rng.random(logits.shape) < 1 / (
+                1 + numpy.exp(-logits)
+            )
+            correct = correct_matrix.sum(axis=1)
+            running = numpy.cumsum(correct)
+            running -= numpy.repeat(running[starts] - correct[starts], counts)
+
+            question_ids = (quizzes - 1)[:, None] * self.questions + numpy.arange(
+                1, self.questions + 1
+            )
+            positions = correct_positions[question_ids - 1]
+            wrong = (
+                positions + self.rng.integers(1, self.answers, positions.shape)
+            ) % self.answers
+            chosen = (
+                (question_ids - 1) * self.answers
+                + 1
+                + numpy.where(correct_matrix, positions, wrong)
+            )
+            answer_counts += numpy.bincount(
+                chosen.ravel(), minlength=answer_counts.size
+            )
+            user_results += numpy.bincount(users, minlength=self.users + 1)
+            user_correct += numpy.bincount(
+                users, weights=correct, minlength=self.users + 1
+            ).astype(numpy.int64)
+
+            first_taken = self.rng.random(chunk.size) * self.days
+            span = first_taken * self.rng.random(chunk.size)
+            days_ago = (
+                first_taken[pair]
+                - span[pair] * (attempt - self.rng.random(rows)) / counts[pair]
+            )
+            created = numpy.datetime_as_string(
+                numpy.datetime64(now, "s")
+                - (days_ago * 86400).astype("timedelta64[s]"),
+                unit="s",
+            )
+            ids = numpy.arange(next_id, next_id + rows)
+            next_id += rows
+
+            result = correct / self.questions * 100
+            average = running / (self.questions * attempt) * 100
+            companies = quiz_companies[quizzes - 1]
+            copy_rows(
+                cursor,
+                "results",
+                [
+                    "id",
+                    "user_id",
+                    "company_id",
+                    "quiz_id",
+                    "result",
+                    "correct_answers",
+                    "attempts",
+                    "average_result",
+                    "created_at",
+                ],
+                (
+                    f"{row[0]}\t{row[1]}\t{row[2]}\t{row[3]}\t{row[4]}\t{row[5]}\t"
+                    f"{row[6]}\t{row[7]}\t{row[8]}\n"
+                    for row in zip(
+                        ids.tolist(),
+                        users.tolist(),
+                        companies.tolist(),
+                        quizzes.tolist(),
+                        result.tolist(),
+                        running.tolist(),
+                        attempt.tolist(),
+                        average.tolist(),
+                        created.tolist(),
+                    )
+                ),
+            )
+            patterns = (
+                (correct_matrix.astype(numpy.uint8) + ord("0"))
+                .view(f"S{self.questions}")
+                .ravel()
+            )
+            copy_rows(
+                cursor,
+                "result_answers",
+                ["result_id", "quiz_id", "question_ids", "answer_ids", "correct"],
+                (
+                    f"{result_id}\t{quiz}\t{layouts[quiz]}\t"
+                    f"{','.join(map(str, answer_ids))}\t{pattern.decode()}\n"
+                    for result_id, quiz, answer_ids, pattern in zip(
+                        ids.tolist(), quizzes.tolist(), chosen.tolist(), patterns
+                    )
+                ),
+            )
+            if self.redis_answers:
+                latest = starts + counts - 1
+                await self.save_latest_answers(
+                    users[latest], quizzes[latest], question_ids[latest], chosen[latest]
+                )
+            self.progress(f"results: {next_id - 1}")
+        return answer_counts, user_results, user_correct
+
+    @staticmethod
+    async def save_latest_answers(
+        users: numpy.ndarray,
+        quizzes: numpy.ndarray,
+        question_ids: numpy.ndarray,
+        chosen: numpy.ndarray,
+    ) -> None:
+        async with redis_db.pipeline(transaction=False) as pipe:
+            for user, quiz, questions, answers in zip(
+                users.tolist(), quizzes.tolist(), question_ids.tolist(), chosen.tolist()
+            ):
+                key = answer_store.answers_key(user_id=user, quiz_id=quiz)
+                pipe.hset(key, mapping=dict(zip(questions, answers)))
+                pipe.expire(key, answer_store.ttl)
+            await pipe.execute()
+
+    def copy_answer_stats(self, cursor, answer_counts: numpy.ndarray) -> None:
+        answer_ids = numpy.flatnonzero(answer_counts)
+        question_ids = (answer_ids - 1) // self.answers + 1
+        quiz_ids = (question_ids - 1) // self.questions + 1
+        copy_rows(
+            cursor,
+            "answer_stats",
+            ["answer_id", "question_id", "quiz_id", "count"],
+            (
+                f"{answer}\t{question}\t{quiz}\t{count}\n"
+                for answer, question, quiz, count in zip(
+                    answer_ids.tolist(),
+                    question_ids.tolist(),
+                    quiz_ids.tolist(),
+                    answer_counts[answer_ids].tolist(),
+                )
+            ),
+        )
+
+    def update_user_totals(
+        self, cursor, user_results: numpy.ndarray, user_correct: numpy.ndarray
+    ) -> None:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE seed_user_totals "
+            "(user_id integer, passed integer, correct integer) ON COMMIT DROP"
+        )
+        user_ids = numpy.flatnonzero(user_results)
+        copy_rows(
+            cursor,
+            "seed_user_totals",
+            ["user_id", "passed", "correct"],
+            (
+                f"{user}\t{passed}\t{correct}\n"
+                for user, passed, correct in zip(
+                    user_ids.tolist(),
+                    (user_results[user_ids] * self.questions).tolist(),
+                    user_correct[user_ids].tolist(),
+                )
+            ),
+        )
+        cursor.execute(
+            "UPDATE users SET passed_questions = totals.passed, "
+            "correct_answers = totals.correct, "
+            "average_result = totals.correct * 100.0 / totals.passed "
+            "FROM seed_user_totals AS totals WHERE users.id = totals.user_id"
+        )
+
+    @staticmethod
+    def insert_rollups(cursor) -> None:
+        cursor.execute(
+            "INSERT INTO result_rollups (quiz_id, user_id, day, company_id, "
+            "results_count, results_sum, results_min, results_max) "
+            "SELECT quiz_id, user_id, created_at::date, min(company_id), count(*), "
+            "sum(result), min(result), max(result) FROM results "
+            "GROUP BY quiz_id, user_id, created_at::date"
+        )
@@ -1,19 +1,27 @@
 import csv
-from datetime import datetime
+from datetime import date, timedelta
+from math import floor
 from functools import wraps
 from random import randint
 import logging
-from typing import List
+import os
+import tempfile
+from typing import Dict, List
 
 from fastapi import Security, Depends, HTTPException
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 from pydantic import EmailStr
-from sqlalchemy import desc
-from sqlalchemy.orm import Session
-from starlette.responses import FileResponse
+from sqlalchemy import desc, func, case
+from sqlalchemy.orm import Session, selectinload
+from starlette.background import BackgroundTask
+from starlette.responses import FileResponse, Response
 
 from core.auth import Auth
+from core.cache import analytics_cache, quiz_payloads
+from core.etag import ConditionalGet
+from core.responses import FastJSONResponse
 from core.hashing import Hasher
+from core.tracing import traced
 from core.utils import VerifyToken
 from .schemas.result import (
     ResultBase,
@@ -21,6 +29,12 @@ from .schemas.result import (
     UserResultAvarage,
     UserQuizResultAvarage,
     UserQuizLastActivity,
+    RollupGranularity,
+    ResultRollupPoint,
+    HistogramBucket,
+    ResultStatistics,
+    ItemStatistics,
+    ItemAnalysis,
 )
 from .schemas.answers import AnswerRead
 from .schemas.company import (
@@ -31,8 +45,20 @@ from .schemas.company import (
     CompanyUpdated,
     CompanyUserLastActivity,
 )
+from .answer_stats import answer_stats
+from .answer_store import answer_store
+from .export_jobs import export_jobs, DONE
+from .item_analysis import correctness_matrix, item_statistics
+from .leaderboard import leaderboard
+from .schemas.export import ExportJob
+from .schemas.leaderboard import LeaderboardEntry
 from .schemas.invite import InviteBase
-from .schemas.questions import QuestionRead, QuestionPass
+from .schemas.questions import (
+    QuestionRead,
+    QuestionPass,
+    QuestionDistribution,
+    AnswerDistribution,
+)
 from .schemas.quiz import (
     QuizCreate,
     QuizUpdate,
@@ -51,7 +77,7 @@ from .schemas.user import (
     UserInfo,
     UserAverageResult,
 )
-from core.database import get_db, redis_db
+from core.database import get_db, dialect_insert
 from quiz.models.db_models import (
     User,
     Company,
@@ -61,11 +87,16 @@ from quiz.models.db_models import (
     Question,
     Quiz,
     Result,
+    ResultRollup,
+    AnswerStat,
+    ResultAnswer,
+    company_user,
 )
 
 logger = logging.getLogger("quiz-logger")
 
 
+@traced
 class UserService:
     security = HTTPBearer()
     auth_handler = Auth()
@@ -82,13 +113,15 @@ class UserService:
         token = self.auth_handler.encode_token(user.email)
         return UserLogIn(token=token, username=user.username, email=user.email)
 
-    async def get_user_list(self, skip: int = 0, limit: int = 100) -> List[UserInfo]:
+    async def get_user_list(self, skip: int = 0, limit: int = 100) -> FastJSONResponse:
         user_list = self.db.query(User).offset(skip).limit(limit).all()
 
-        return [
-            UserInfo(id=user.id, email=user.email, username=user.username)
-            for user in user_list
-        ]
+        return FastJSONResponse(
+            [
+                UserInfo(id=user.id, email=user.email, username=user.username)
+                for user in user_list
+            ]
+        )
 
     async def get_detail_user(self, pk: int) -> UserInfo:
         user = self.db.query(User).filter_by(id=int(pk)).first()
@@ -201,6 +234,7 @@ class UserService:
         invite = self.db.query(Invite).filter_by(id=invite_id).first()
         self.db.delete(invite)
         self.db.commit()
+        await analytics_cache.bump(f"company:{company.id}")
         return HTTPException(
             status_code=200, detail=f"Welcome to {company.name} company"
         )
@@ -294,6 +328,7 @@ def auth_required(func):
     return wrapper
 
 
+@traced
 class CompanyService:
     def __init__(self, db: Session):
         self.db = db
@@ -304,25 +339,28 @@ class CompanyService:
 
     async def get_company_list(
         self, skip: int = 0, limit: int = 100
-    ) -> List[CompanyBase]:
+    ) -> FastJSONResponse:
         company_list = (
             self.db.query(Company)
+            .options(selectinload(Company.employees))
             .filter_by(visibility=True)
             .offset(skip)
             .limit(limit)
             .all()
         )
-        return [
-            CompanyBase(
-                id=company.id,
-                name=company.name,
-                description=company.description,
-                visibility=company.visibility,
-                owner=company.owner,
-                employees=company.employees,
-            )
-            for company in company_list
-        ]
+        return FastJSONResponse(
+            [
+                CompanyBase(
+                    id=company.id,
+                    name=company.name,
+                    description=company.description,
+                    visibility=company.visibility,
+                    owner=company.owner,
+                    employees=company.employees,
+                )
+                for company in company_list
+            ]
+        )
 
     async def create_company(
         self,
@@ -368,8 +406,13 @@ class CompanyService:
         company = self.db.query(Company).filter_by(owner=user.id).first()
         if not company:
             raise HTTPException(status_code=401, detail="You don't have company yet")
+        quiz_ids = [quiz.id for quiz in company.quizzes]
         self.db.delete(company)
         self.db.commit()
+        await analytics_cache.bump(
+            f"company_quizzes:{company.id}",
+            *(f"quiz_content:{quiz_id}" for quiz_id in quiz_ids),
+        )
         return HTTPException(
             status_code=204, detail=f"Company with id{company.id} deleted"
         )
@@ -419,6 +462,7 @@ class CompanyService:
         self.db.add(company)
         self.db.commit()
         self.db.refresh(company)
+        await analytics_cache.bump(f"company:{company.id}")
         return HTTPException(
             status_code=204,
             detail=f"User with id{user_to_remove_id} removed from company",
@@ -521,6 +565,7 @@ class CompanyService:
         request = self.db.query(Request).filter_by(id=request_id).first()
         self.db.delete(request)
         self.db.commit()
+        await analytics_cache.bump(f"company:{company.id}")
 
         return HTTPException(
             status_code=200, detail=f"Request from user {user.id} is accepted"
@@ -555,12 +600,27 @@ class CompanyService:
         )
 
 
+@traced
 class QuizService:
-    def __init__(self, db: Session, credentials: HTTPAuthorizationCredentials):
+    def __init__(
+        self,
+        db: Session,
+        credentials: HTTPAuthorizationCredentials,
+        conditional: ConditionalGet = None,
+    ):
         self.db = db
         self.user_service = UserService(self.db)
         self.company_service = CompanyService(self.db)
         self.credentials = credentials
+        self.conditional = conditional
+
+    async def check_not_modified(self, endpoint: str, scopes: List[str], **params):
+        if self.conditional:
+            return await self.conditional.check(endpoint, scopes, **params)
+
+    def respond(self, content) -> FastJSONResponse:
+        headers = self.conditional.headers if self.conditional else None
+        return FastJSONResponse(content, headers=headers)
 
     async def check_if_company_exist_and_usr_have_rights(
         self, company: Company
@@ -643,6 +703,7 @@ class QuizService:
         self.db.commit()
 
         await self.add_questions_and_answers_to_quiz(quiz_info=quiz_info, quiz=quiz)
+        await analytics_cache.bump(f"company_quizzes:{company_id}")
 
         return QuizList(
             id=quiz.id,
@@ -667,6 +728,9 @@ class QuizService:
         self.db.commit()
 
         await self.update_questions_and_answers_in_quiz(quiz_info=quiz_info, quiz=quiz)
+        await analytics_cache.bump(
+            f"quiz_content:{quiz.id}", f"company_quizzes:{company_id}"
+        )
 
         return QuizList(
             id=quiz.id,
@@ -688,12 +752,22 @@ class QuizService:
         quiz = self.db.query(Quiz).filter_by(id=quiz_id, company_id=company_id).first()
         self.db.delete(quiz)
         self.db.commit()
+        await analytics_cache.bump(
+            f"quiz_content:{quiz_id}", f"company_quizzes:{company_id}"
+        )
 
         return HTTPException(status_code=204, detail=f"Quiz deleted")
 
     async def get_quiz_list(
         self, company_id: int, skip: int = 0, limit: int = 100
-    ) -> List[QuizList]:
+    ) -> FastJSONResponse:
+        await self.check_not_modified(
+            "quiz_list",
+            [f"company_quizzes:{company_id}"],
+            company_id=company_id,
+            skip=skip,
+            limit=limit,
+        )
         quiz_list = (
             self.db.query(Quiz)
             .filter_by(company_id=company_id)
@@ -701,16 +775,18 @@ class QuizService:
             .limit(limit)
             .all()
         )
-        return [
-            QuizList(
-                id=quiz.id,
-                title=quiz.title,
-                description=quiz.description,
-                passing_frequency=quiz.passing_frequency,
-                company=quiz.company_id,
-            )
-            for quiz in quiz_list
-        ]
+        return self.respond(
+            [
+                QuizList(
+                    id=quiz.id,
+                    title=quiz.title,
+                    description=quiz.description,
+                    passing_frequency=quiz.passing_frequency,
+                    company=quiz.company_id,
+                )
+                for quiz in quiz_list
+            ]
+        )
 
     @staticmethod
     async def check_if_quiz_exist(quiz: Quiz) -> None:
@@ -721,12 +797,34 @@ class QuizService:
             )
 
     async def get_quiz_info(self, quiz_id: int) -> QuizInfo:
+        await self.check_not_modified(
+            "quiz_info", [f"quiz_content:{quiz_id}"], quiz_id=quiz_id
+        )
         quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
         await self.check_if_quiz_exist(quiz=quiz)
         return QuizInfo(id=quiz.id, title=quiz.title, description=quiz.description)
 
-    async def get_quiz_questions(self, quiz_id: int) -> QuizQuestions:
-        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+    async def get_quiz_questions(self, quiz_id: int) -> Response:
+        scopes = [f"quiz_content:{quiz_id}"]
+        versions = await self.check_not_modified(
+            "quiz_questions", scopes, quiz_id=quiz_id
+        )
+        payload = await quiz_payloads.get_or_set(
+            key=f"quiz_questions:{quiz_id}",
+            scopes=scopes,
+            builder=lambda: self.build_quiz_questions(quiz_id=quiz_id),
+            versions=versions,
+        )
+        headers = self.conditional.headers if self.conditional else None
+        return Response(payload, media_type="application/json", headers=headers)
+
+    async def build_quiz_questions(self, quiz_id: int) -> QuizQuestions:
+        quiz = (
+            self.db.query(Quiz)
+            .options(selectinload(Quiz.questions).selectinload(Question.answers))
+            .filter_by(id=quiz_id)
+            .first()
+        )
         await self.check_if_quiz_exist(quiz=quiz)
         return QuizQuestions(
             id=quiz.id,
@@ -817,8 +915,65 @@ class QuizService:
         )
         return result
 
+    async def update_result_rollup(self, result: Result) -> None:
+        insert = dialect_insert(self.db, ResultRollup).values(
+            quiz_id=result.quiz_id,
+            user_id=result.user_id,
+            company_id=result.company_id,
+            day=func.current_date(),
+            results_count=1,
+            results_sum=result.result,
+            results_min=result.result,
+            results_max=result.result,
+        )
+        excluded = insert.excluded
+        self.db.execute(
+            insert.on_conflict_do_update(
+                index_elements=["quiz_id", "user_id", "day"],
+                set_={
+                    "results_count": ResultRollup.results_count + 1,
+                    "results_sum": ResultRollup.results_sum + excluded.results_sum,
+                    "results_min": case(
+                        (
+                            excluded.results_min < ResultRollup.results_min,
+                            excluded.results_min,
+                        ),
+                        else_=ResultRollup.results_min,
+                    ),
+                    "results_max": case(
+                        (
+                            excluded.results_max > ResultRollup.results_max,
+                            excluded.results_max,
+                        ),
+                        else_=ResultRollup.results_max,
+                    ),
+                },
+            )
+        )
+
+    async def log_result_answers(self, result: Result, answers: List[Answer]) -> None:
+        if not answers:
+            return
+        answers = sorted(answers, key=lambda answer: answer.question_id)
+        self.db.add(
+            ResultAnswer(
+                result_id=result.id,
+                quiz_id=result.quiz_id,
+                question_ids=",".join(str(answer.question_id) for answer in answers),
+                answer_ids=",".join(str(answer.id) for answer in answers),
+                correct="".join(
+                    "1" if answer.is_correct else "0" for answer in answers
+                ),
+            )
+        )
+
     async def create_quiz_result(
-        self, correct_answers: int, questions_quantity: int, user: User, quiz: Quiz
+        self,
+        correct_answers: int,
+        questions_quantity: int,
+        user: User,
+        quiz: Quiz,
+        answers: List[Answer] = (),
     ) -> Result:
 
         quiz_result = correct_answers / questions_quantity * 100
@@ -846,12 +1001,28 @@ class QuizService:
                 quiz_result=quiz_result,
             )
         self.db.add(result)
+        self.db.flush()
+        await self.log_result_answers(result=result, answers=answers)
+        await self.update_result_rollup(result=result)
         self.db.commit()
         await self.update_user_average_result(
             user=user,
             correct_answers=correct_answers,
             questions_quantity=questions_quantity,
         )
+        employer_ids = [
+            company_id
+            for company_id, in self.db.query(company_user.c.company_id).filter(
+                company_user.c.user_id == user.id
+            )
+        ]
+        await analytics_cache.bump(
+            f"quiz:{quiz.id}",
+            f"company:{quiz.company_id}",
+            f"user:{user.id}",
+            # last activity counts the results of an employee in any company
+            *(f"company_activity:{company_id}" for company_id in employer_ids),
+        )
 
         return result
 
@@ -867,6 +1038,8 @@ class QuizService:
             quiz_answers=quiz_answers, questions_quantity=questions_quantity
         )
 
+        chosen_answers = {}
+        given_answers = []
         for answer in quiz_answers.answers:
             await self.validate_answers(quiz=quiz, answer=answer)
 
@@ -875,15 +1048,27 @@ class QuizService:
             )
             if answer.is_correct:
                 correct_answers += 1
-            await redis_db.set(
-                f"{user.id}:{answer.question.id}", answer.answer_text, ex=172800
-            )
+            chosen_answers[answer.question_id] = answer.id
+            given_answers.append(answer)
+        await answer_store.save_answers(
+            user_id=user.id, quiz_id=quiz.id, answers=chosen_answers
+        )
+        await answer_stats.record(quiz_id=quiz.id, answers=chosen_answers)
 
         result = await self.create_quiz_result(
             correct_answers=correct_answers,
             questions_quantity=questions_quantity,
             user=user,
             quiz=quiz,
+            answers=given_answers,
+        )
+        await leaderboard.record_result(
+            user_id=user.id,
+            company_id=quiz.company_id,
+            quiz_id=quiz.id,
+            quiz_average=result.average_result,
+            correct_answers=correct_answers,
+            questions_quantity=questions_quantity,
         )
 
         return ResultBase(
@@ -897,11 +1082,23 @@ class QuizService:
             created_at=result.created_at,
         )
 
-    async def writo_to_csv(self, headers: list, answers: list) -> None:
-        with open("answers.csv", "w") as f:
+    async def writo_to_csv(self, headers: list, answers: list) -> str:
+        # a file per request, concurrent downloads would overwrite a shared one
+        fd, path = tempfile.mkstemp(prefix="answers_", suffix=".csv")
+        with os.fdopen(fd, "w", newline="") as f:
             w = csv.writer(f)
             w.writerow(headers)
             w.writerows(answers)
+        return path
+
+    async def answers_csv_response(self, headers: list, answers: list) -> FileResponse:
+        path = await self.writo_to_csv(headers=headers, answers=answers)
+        return FileResponse(
+            path,
+            media_type="application/octet-stream",
+            filename="answers.csv",
+            background=BackgroundTask(os.remove, path),
+        )
 
     async def validate_user_and_company(self, company: Company, user: User) -> None:
         if not company:
@@ -915,22 +1112,52 @@ class QuizService:
 
     async def get_user_answers_from_redis(self) -> FileResponse:
         user = await self.user_service.get_current_user(self.credentials)
-        all_keys = await redis_db.keys()
-        all_user_answers = []
-        for key in all_keys:
-            if key.split(":")[0] == str(user.id):
-                key = f"{str(user.id)}:{key.split(':')[1]}"
-                all_user_answers.append([key.split(":")[1], await redis_db.get(key)])
-
-        await self.writo_to_csv(
+        keys = await answer_store.get_answer_keys(user_id=user.id)
+        answers = await self.collect_answers(
+            keys=keys,
+            answer_texts=await self.get_answer_texts(
+                quiz_ids={quiz_id for _, quiz_id in keys}
+            ),
+        )
+        all_user_answers = [[question_id, text] for _, question_id, text in answers]
+
+        return await self.answers_csv_response(
             headers=["Question_id", "Answer"], answers=all_user_answers
         )
 
-        return FileResponse(
-            "./answers.csv",
-            media_type="application/octet-stream",
-            filename="answers.csv",
+    @staticmethod
+    async def collect_answers(keys: list, answer_texts: Dict[int, str]) -> list:
+        return [
+            [user_id, question_id, answer_texts.get(answer_id)]
+            for user_id, _, answers in await answer_store.load_answers(keys)
+            for question_id, answer_id in answers.items()
+        ]
+
+    @classmethod
+    async def collect_company_answers(
+        cls, user_ids: set, quiz_ids: set, answer_texts: Dict[int, str]
+    ) -> list:
+        # every (employee, quiz) key is read directly, scanning would walk the
+        # answers of all users
+        keys = [
+            (user_id, quiz_id)
+            for user_id in sorted(user_ids)
+            for quiz_id in sorted(quiz_ids)
+        ]
+        return await cls.collect_answers(keys=keys, answer_texts=answer_texts)
+
+    async def get_company_quiz_ids(self, company: Company) -> set:
+        quizzes = self.db.query(Quiz.id).filter_by(company_id=company.id).all()
+        return {quiz.id for quiz in quizzes}
+
+    async def get_answer_texts(self, quiz_ids: set) -> Dict[int, str]:
+        answers = (
+            self.db.query(Answer.id, Answer.answer_text)
+            .join(Question)
+            .filter(Question.quiz_id.in_(quiz_ids))
+            .all()
         )
+        return {answer.id: answer.answer_text for answer in answers}
 
     async def get_all_company_user_answers_from_redis(
         self, company_id: int
@@ -939,29 +1166,15 @@ class QuizService:
         user = await self.user_service.get_user_by_email(email=email)
         company = self.db.query(Company).filter_by(id=company_id).first()
         await self.validate_user_and_company(company=company, user=user)
-        all_keys = await redis_db.keys()
-        answers = []
-        for key in all_keys:
-            user_from_key = (
-                self.db.query(User).filter_by(id=int(key.split(":")[0])).first()
-            )
-            if user_from_key in company.employees:
-                question_id = key.split(":")[1]
-                question = self.db.query(Question).filter_by(id=question_id).first()
-                if question.quiz in company.quizzes:
-                    key = f"{user_from_key.id}:{question_id}"
-                    answers.append(
-                        [user_from_key.id, key.split(":")[1], await redis_db.get(key)]
-                    )
-
-        await self.writo_to_csv(
-            headers=["User_id", "Question_id", "Answer"], answers=answers
+        quiz_ids = await self.get_company_quiz_ids(company=company)
+        answers = await self.collect_company_answers(
+            user_ids={employee.id for employee in company.employees},
+            quiz_ids=quiz_ids,
+            answer_texts=await self.get_answer_texts(quiz_ids=quiz_ids),
         )
 
-        return FileResponse(
-            "./answers.csv",
-            media_type="application/octet-stream",
-            filename="answers.csv",
+        return await self.answers_csv_response(
+            headers=["User_id", "Question_id", "Answer"], answers=answers
         )
 
     async def get_company_employee_answers_from_redis(
@@ -977,38 +1190,76 @@ class QuizService:
                 status_code=401,
                 detail="User with id not in your company or doesn't exsist",
             )
-        all_keys = await redis_db.keys()
-        answers = []
-        for key in all_keys:
-            user_from_key = (
-                self.db.query(User).filter_by(id=int(key.split(":")[0])).first()
-            )
-            if user_from_key == employee:
-                question_id = key.split(":")[1]
-                question = self.db.query(Question).filter_by(id=question_id).first()
-                if question.quiz in company.quizzes:
-                    key = f"{user_from_key.id}:{question_id}"
-                    answers.append(
-                        [user_from_key.id, key.split(":")[1], await redis_db.get(key)]
-                    )
-
-        await self.writo_to_csv(
+        quiz_ids = await self.get_company_quiz_ids(company=company)
+        answers = await self.collect_answers(
+            keys=[(employee.id, quiz_id) for quiz_id in quiz_ids],
+            answer_texts=await self.get_answer_texts(quiz_ids=quiz_ids),
+        )
+
+        return await self.answers_csv_response(
             headers=["User_id", "Question_id", "Answer"], answers=answers
         )
 
+    async def create_company_answers_export(self, company_id: int) -> ExportJob:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=company_id).first()
+        await self.validate_user_and_company(company=company, user=user)
+        user_ids = {employee.id for employee in company.employees}
+        quiz_ids = await self.get_company_quiz_ids(company=company)
+        answer_texts = await self.get_answer_texts(quiz_ids=quiz_ids)
+
+        job = await export_jobs.submit(
+            company_id=company.id,
+            headers=["User_id", "Question_id", "Answer"],
+            collect=lambda: self.collect_company_answers(
+                user_ids=user_ids, quiz_ids=quiz_ids, answer_texts=answer_texts
+            ),
+        )
+        return ExportJob(**job)
+
+    async def get_export_job(self, job_id: str) -> dict:
+        job = await export_jobs.get(job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=int(job["company_id"])).first()
+        await self.validate_user_and_company(company=company, user=user)
+        return job
+
+    async def get_export_job_status(self, job_id: str) -> ExportJob:
+        return ExportJob(**await self.get_export_job(job_id=job_id))
+
+    async def download_export(self, job_id: str) -> FileResponse:
+        job = await self.get_export_job(job_id=job_id)
+        if job["status"] != DONE:
+            raise HTTPException(
+                status_code=409, detail="Export job is not finished yet"
+            )
+        path = export_jobs.file_path(job_id)
+        if not os.path.exists(path):
+            raise HTTPException(status_code=410, detail="Export file has expired")
         return FileResponse(
-            "./answers.csv",
+            path,
             media_type="application/octet-stream",
-            filename="answers.csv",
+            filename=f"answers_company_{job['company_id']}.csv",
         )
 
 
+@traced
 class AnalyticService:
-    def __init__(self, db: Session, credentials: HTTPAuthorizationCredentials):
+    def __init__(
+        self,
+        db: Session,
+        credentials: HTTPAuthorizationCredentials,
+        conditional: ConditionalGet = None,
+    ):
         self.db = db
         self.user_service = UserService(self.db)
         self.company_service = CompanyService(self.db)
         self.credentials = credentials
+        self.conditional = conditional
 
     @staticmethod
     async def validate_user(user: User, company: Company) -> None:
@@ -1017,21 +1268,43 @@ class AnalyticService:
                 status_code=401, detail="You don't have rights to process request"
             )
 
-    async def get_last_activity(self, user: User) -> datetime:
-        result_with_last_activity = (
-            self.db.query(Result)
-            .filter_by(user_id=user.id)
-            .order_by(desc("created_at"))
-            .first()
+    async def check_not_modified(self, endpoint: str, scopes: List[str], **params):
+        if self.conditional:
+            return await self.conditional.check(endpoint, scopes, **params)
+
+    def respond(self, content) -> FastJSONResponse:
+        headers = self.conditional.headers if self.conditional else None
+        return FastJSONResponse(content, headers=headers)
+
+    async def cached(self, endpoint: str, scopes: List[str], builder, **params):
+        versions = await self.check_not_modified(endpoint, scopes, **params)
+        content, served_versions = await analytics_cache.get_or_set_versioned(
+            endpoint=endpoint,
+            params=params,
+            scopes=scopes,
+            builder=lambda: builder(**params),
+            versions=versions,
         )
-        return result_with_last_activity.created_at
+        if self.conditional and served_versions != versions:
+            self.conditional.served(endpoint, params, served_versions)
+        return self.respond(content)
 
-    async def get_quiz_average_results(self, quiz_id: int) -> List[QuizResultAvarage]:
+    async def get_quiz_average_results(self, quiz_id: int) -> FastJSONResponse:
         email = await self.user_service.get_current_user_email(self.credentials)
         user = await self.user_service.get_user_by_email(email=email)
         quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
         company = self.db.query(Company).filter_by(id=quiz.company_id).first()
         await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "quiz_average_results",
+            [f"quiz:{quiz.id}"],
+            self.query_quiz_average_results,
+            quiz_id=quiz.id,
+        )
+
+    async def query_quiz_average_results(
+        self, quiz_id: int
+    ) -> List[QuizResultAvarage]:
         results = self.db.query(Result).filter_by(quiz_id=quiz_id).order_by("user_id")
 
         return [
@@ -1045,7 +1318,7 @@ class AnalyticService:
 
     async def get_employee_avarege_results(
         self, company_id: int, user_id: int
-    ) -> List[UserResultAvarage]:
+    ) -> FastJSONResponse:
         email = await self.user_service.get_current_user_email(self.credentials)
         user = await self.user_service.get_user_by_email(email=email)
         company = self.db.query(Company).filter_by(id=company_id).first()
@@ -1055,10 +1328,20 @@ class AnalyticService:
         employee = self.db.query(User).filter_by(id=user_id).first()
         if not employee:
             raise HTTPException(status_code=401, detail="User doesn't exist")
+        return await self.cached(
+            "employee_average_results",
+            [f"company:{company.id}"],
+            self.query_employee_average_results,
+            company_id=company.id,
+            user_id=employee.id,
+        )
 
+    async def query_employee_average_results(
+        self, company_id: int, user_id: int
+    ) -> List[UserResultAvarage]:
         results = (
             self.db.query(Result)
-            .filter_by(user_id=employee.id, company_id=company.id)
+            .filter_by(user_id=user_id, company_id=company_id)
             .order_by("quiz_id")
         )
 
@@ -1071,9 +1354,30 @@ class AnalyticService:
             for result in results
         ]
 
-    async def get_employee_last_activity_list(
-        self, company_id: int
+    async def get_employees_last_activity(
+        self, company_id: int, skip: int = 0, limit: int = 100
     ) -> List[CompanyUserLastActivity]:
+        employees_activity = (
+            self.db.query(
+                Result.user_id, func.max(Result.created_at).label("last_activity")
+            )
+            .join(company_user, company_user.c.user_id == Result.user_id)
+            .filter(company_user.c.company_id == company_id)
+            .group_by(Result.user_id)
+            .order_by(Result.user_id)
+            .offset(skip)
+            .limit(limit)
+        )
+        return [
+            CompanyUserLastActivity(
+                user_id=activity.user_id, last_activity=activity.last_activity
+            )
+            for activity in employees_activity
+        ]
+
+    async def get_employee_last_activity_list(
+        self, company_id: int, skip: int = 0, limit: int = 100
+    ) -> FastJSONResponse:
         email = await self.user_service.get_current_user_email(self.credentials)
         user = await self.user_service.get_user_by_email(email=email)
         company = self.db.query(Company).filter_by(id=company_id).first()
@@ -1081,26 +1385,44 @@ class AnalyticService:
             raise HTTPException(status_code=401, detail="Company doesn't exist")
         await self.validate_user(user=user, company=company)
 
-        return [
-            CompanyUserLastActivity(
-                user_id=employee.id,
-                last_activity=await self.get_last_activity(user=employee),
-            )
-            for employee in company.employees
-        ]
+        return await self.cached(
+            "employees_last_activity",
+            [f"company:{company.id}", f"company_activity:{company.id}"],
+            self.get_employees_last_activity,
+            company_id=company.id,
+            skip=skip,
+            limit=limit,
+        )
+
+    async def get_user_average_result(self, user_id: int) -> FastJSONResponse:
+        return await self.cached(
+            "user_average_result",
+            [f"user:{user_id}"],
+            self.query_user_average_result,
+            user_id=user_id,
+        )
 
-    async def get_user_average_result(self, user_id: int) -> UserAverageResult:
+    async def query_user_average_result(self, user_id: int) -> UserAverageResult:
         user = self.db.query(User).filter_by(id=user_id).first()
         return UserAverageResult(user_id=user.id, average_result=user.average_result)
 
-    async def get_user_average_quiz_result(
-        self, quiz_id: int
-    ) -> List[UserQuizResultAvarage]:
+    async def get_user_average_quiz_result(self, quiz_id: int) -> FastJSONResponse:
         email = await self.user_service.get_current_user_email(self.credentials)
         user = await self.user_service.get_user_by_email(email=email)
+        return await self.cached(
+            "user_average_quiz_result",
+            [f"user:{user.id}"],
+            self.query_user_average_quiz_result,
+            quiz_id=quiz_id,
+            user_id=user.id,
+        )
+
+    async def query_user_average_quiz_result(
+        self, quiz_id: int, user_id: int
+    ) -> List[UserQuizResultAvarage]:
         results = (
             self.db.query(Result)
-            .filter_by(quiz_id=quiz_id, user_id=user.id)
+            .filter_by(quiz_id=quiz_id, user_id=user_id)
             .order_by("id")
         )
 
@@ -1111,19 +1433,472 @@ class AnalyticService:
             for result in results
         ]
 
-    async def get_list_quizzes_last_activity(self) -> List[UserQuizLastActivity]:
+    async def get_list_quizzes_last_activity(
+        self, skip: int = 0, limit: int = 100
+    ) -> FastJSONResponse:
         email = await self.user_service.get_current_user_email(self.credentials)
         user = await self.user_service.get_user_by_email(email=email)
-        all_results = self.db.query(Result).filter_by(user_id=user.id).all()
-        results = {}
-        for result in all_results:
-            if result.quiz_id in results:
-                if result.created_at > results[result.quiz_id]:
-                    results[result.quiz_id] = result.created_at
+        return await self.cached(
+            "quizzes_last_activity",
+            [f"user:{user.id}"],
+            self.query_quizzes_last_activity,
+            user_id=user.id,
+            skip=skip,
+            limit=limit,
+        )
+
+    async def query_quizzes_last_activity(
+        self, user_id: int, skip: int = 0, limit: int = 100
+    ) -> List[UserQuizLastActivity]:
+        quizzes_activity = (
+            self.db.query(
+                Result.quiz_id, func.max(Result.created_at).label("last_activity")
+            )
+            .filter(Result.user_id == user_id)
+            .group_by(Result.quiz_id)
+            .order_by(Result.quiz_id)
+            .offset(skip)
+            .limit(limit)
+        )
+
+        return [
+            UserQuizLastActivity(
+                quiz_id=activity.quiz_id, last_activity=activity.last_activity
+            )
+            for activity in quizzes_activity
+        ]
+
+    @staticmethod
+    def get_period_start(day: date, granularity: RollupGranularity) -> date:
+        if granularity == RollupGranularity.week:
+            return day - timedelta(days=day.weekday())
+        if granularity == RollupGranularity.month:
+            return day.replace(day=1)
+        return day
+
+    async def get_rollup_series(
+        self, granularity: RollupGranularity, **filters
+    ) -> List[ResultRollupPoint]:
+        days = (
+            self.db.query(
+                ResultRollup.day,
+                func.sum(ResultRollup.results_count).label("count"),
+                func.sum(ResultRollup.results_sum).label("total"),
+                func.min(ResultRollup.results_min).label("min_result"),
+                func.max(ResultRollup.results_max).label("max_result"),
+            )
+            .filter_by(**filters)
+            .group_by(ResultRollup.day)
+            .order_by(ResultRollup.day)
+        )
+        periods = {}
+        for day in days:
+            period_start = self.get_period_start(day.day, granularity)
+            if period_start in periods:
+                count, total, min_result, max_result = periods[period_start]
+                periods[period_start] = (
+                    count + day.count,
+                    total + day.total,
+                    min(min_result, day.min_result),
+                    max(max_result, day.max_result),
+                )
             else:
-                results[result.quiz_id] = result.created_at
+                periods[period_start] = (
+                    day.count,
+                    day.total,
+                    day.min_result,
+                    day.max_result,
+                )
 
         return [
-            UserQuizLastActivity(quiz_id=quiz_id, last_activity=last_activity)
-            for quiz_id, last_activity in results.items()
+            ResultRollupPoint(
+                period_start=period_start,
+                count=count,
+                average_result=total / count,
+                min_result=min_result,
+                max_result=max_result,
+            )
+            for period_start, (count, total, min_result, max_result) in periods.items()
+        ]
+
+    async def get_quiz_rollup(
+        self, quiz_id: int, granularity: RollupGranularity
+    ) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=401, detail="Quiz doesn't exist")
+        company = self.db.query(Company).filter_by(id=quiz.company_id).first()
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "rollup",
+            [f"quiz:{quiz.id}"],
+            self.get_rollup_series,
+            granularity=granularity,
+            quiz_id=quiz.id,
+        )
+
+    async def get_company_rollup(
+        self, company_id: int, granularity: RollupGranularity
+    ) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=company_id).first()
+        if not company:
+            raise HTTPException(status_code=401, detail="Company doesn't exist")
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "rollup",
+            [f"company:{company.id}"],
+            self.get_rollup_series,
+            granularity=granularity,
+            company_id=company.id,
+        )
+
+    async def get_employee_rollup(
+        self, company_id: int, user_id: int, granularity: RollupGranularity
+    ) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=company_id).first()
+        if not company:
+            raise HTTPException(status_code=401, detail="Company doesn't exist")
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "rollup",
+            [f"company:{company.id}"],
+            self.get_rollup_series,
+            granularity=granularity,
+            company_id=company.id,
+            user_id=user_id,
+        )
+
+    @staticmethod
+    def get_bucket_case(buckets: int):
+        width = 100 / buckets
+        return case(
+            *[
+                (Result.result < width * (bucket + 1), bucket)
+                for bucket in range(buckets - 1)
+            ],
+            else_=buckets - 1,
+        )
+
+    async def get_percentiles(
+        self, count: int, fractions: List[float], **filters
+    ) -> List[float]:
+        if self.db.get_bind().dialect.name == "postgresql":
+            return list(
+                self.db.query(
+                    *[
+                        func.percentile_cont(fraction).within_group(Result.result)
+                        for fraction in fractions
+                    ]
+                )
+                .filter_by(**filters)
+                .one()
+            )
+
+        percentiles = []
+        for fraction in fractions:
+            position = (count - 1) * fraction
+            lower = floor(position)
+            values = [
+                row.result
+                for row in self.db.query(Result.result)
+                .filter_by(**filters)
+                .order_by(Result.result)
+                .offset(lower)
+                .limit(2)
+            ]
+            if len(values) == 1:
+                percentiles.append(values[0])
+            else:
+                percentiles.append(
+                    values[0] + (values[1] - values[0]) * (position - lower)
+                )
+        return percentiles
+
+    async def get_result_statistics(
+        self, buckets: int, pass_mark: float, **filters
+    ) -> ResultStatistics:
+        totals = (
+            self.db.query(
+                func.count(Result.id).label("count"),
+                func.avg(Result.result).label("average_result"),
+                func.min(Result.result).label("min_result"),
+                func.max(Result.result).label("max_result"),
+                func.sum(case((Result.result >= pass_mark, 1), else_=0)).label(
+                    "passed"
+                ),
+            )
+            .filter_by(**filters)
+            .one()
+        )
+        bucket = self.get_bucket_case(buckets=buckets).label("bucket")
+        bucket_counts = dict(
+            self.db.query(bucket, func.count(Result.id))
+            .filter_by(**filters)
+            .group_by(bucket)
+            .all()
+        )
+        width = 100 / buckets
+        histogram = [
+            HistogramBucket(
+                lower=width * index,
+                upper=width * (index + 1),
+                count=bucket_counts.get(index, 0),
+            )
+            for index in range(buckets)
+        ]
+        if not totals.count:
+            return ResultStatistics(count=0, histogram=histogram)
+
+        p10, median, p90 = await self.get_percentiles(
+            count=totals.count, fractions=[0.1, 0.5, 0.9], **filters
+        )
+        return ResultStatistics(
+            count=totals.count,
+            average_result=totals.average_result,
+            min_result=totals.min_result,
+            max_result=totals.max_result,
+            median=median,
+            p10=p10,
+            p90=p90,
+            pass_rate=totals.passed / totals.count * 100,
+            histogram=histogram,
+        )
+
+    async def get_quiz_statistics(
+        self, quiz_id: int, buckets: int, pass_mark: float
+    ) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=401, detail="Quiz doesn't exist")
+        company = self.db.query(Company).filter_by(id=quiz.company_id).first()
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "result_statistics",
+            [f"quiz:{quiz.id}"],
+            self.get_result_statistics,
+            buckets=buckets,
+            pass_mark=pass_mark,
+            quiz_id=quiz.id,
+        )
+
+    async def get_company_statistics(
+        self, company_id: int, buckets: int, pass_mark: float
+    ) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=company_id).first()
+        if not company:
+            raise HTTPException(status_code=401, detail="Company doesn't exist")
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "result_statistics",
+            [f"company:{company.id}"],
+            self.get_result_statistics,
+            buckets=buckets,
+            pass_mark=pass_mark,
+            company_id=company.id,
+        )
+
+    async def get_item_analysis(self, quiz_id: int) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=401, detail="Quiz doesn't exist")
+        company = self.db.query(Company).filter_by(id=quiz.company_id).first()
+        await self.validate_user(user=user, company=company)
+        return await self.cached(
+            "item_analysis",
+            [f"quiz:{quiz.id}"],
+            self.query_item_analysis,
+            quiz_id=quiz.id,
+        )
+
+    async def query_item_analysis(self, quiz_id: int) -> ItemAnalysis:
+        question_ids = [
+            question_id
+            for (question_id,) in self.db.query(Question.id).filter_by(quiz_id=quiz_id)
         ]
+        # concatenate patterns in the database, one row per question layout
+        if self.db.get_bind().dialect.name == "postgresql":
+            patterns = func.string_agg(ResultAnswer.correct, "")
+        else:
+            patterns = func.group_concat(ResultAnswer.correct, "")
+        rows = (
+            self.db.query(ResultAnswer.question_ids, patterns)
+            .filter(ResultAnswer.quiz_id == quiz_id)
+            .group_by(ResultAnswer.question_ids)
+            .all()
+        )
+        statistics = item_statistics(correctness_matrix(rows, question_ids))
+        return ItemAnalysis(
+            quiz_id=quiz_id,
+            submissions=statistics["submissions"],
+            cronbach_alpha=statistics["cronbach_alpha"],
+            items=[
+                ItemStatistics(
+                    question_id=question_id,
+                    difficulty=difficulty,
+                    discrimination=discrimination,
+                    point_biserial=point_biserial,
+                )
+                for question_id, difficulty, discrimination, point_biserial in zip(
+                    sorted(question_ids),
+                    statistics["difficulty"],
+                    statistics["discrimination"],
+                    statistics["point_biserial"],
+                )
+            ],
+        )
+
+    async def get_question_distribution(self, quiz_id: int) -> FastJSONResponse:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=401, detail="Quiz doesn't exist")
+        company = self.db.query(Company).filter_by(id=quiz.company_id).first()
+        await self.validate_user(user=user, company=company)
+        # titles, answer texts and correctness change with quiz_content
+        await self.check_not_modified(
+            "question_distribution",
+            [f"quiz:{quiz.id}", f"quiz_content:{quiz.id}"],
+            quiz_id=quiz.id,
+        )
+
+        rows = (
+            self.db.query(
+                Question.id,
+                Question.question_title,
+                Answer.id,
+                Answer.answer_text,
+                Answer.is_correct,
+                AnswerStat.count,
+            )
+            .join(Answer, Answer.question_id == Question.id)
+            .outerjoin(AnswerStat, AnswerStat.answer_id == Answer.id)
+            .filter(Question.quiz_id == quiz.id)
+            .order_by(Question.id, Answer.id)
+            .all()
+        )
+        pending = await answer_stats.pending(quiz_id=quiz.id)
+
+        questions = {}
+        for question_id, title, answer_id, text, is_correct, count in rows:
+            if question_id not in questions:
+                questions[question_id] = QuestionDistribution(
+                    question_id=question_id,
+                    question_title=title,
+                    answers_count=0,
+                    percent_correct=None,
+                    answers=[],
+                )
+            question = questions[question_id]
+            count = (count or 0) + pending.get(answer_id, 0)
+            question.answers.append(
+                AnswerDistribution(
+                    answer_id=answer_id,
+                    answer_text=text,
+                    is_correct=is_correct,
+                    count=count,
+                )
+            )
+            question.answers_count += count
+        for question in questions.values():
+            if question.answers_count:
+                correct = sum(a.count for a in question.answers if a.is_correct)
+                question.percent_correct = correct / question.answers_count * 100
+        return self.respond(list(questions.values()))
+
+    @staticmethod
+    async def validate_member(user: User, company: Company) -> None:
+        if (
+            user.id != company.owner
+            and user not in company.admins
+            and user not in company.employees
+        ):
+            raise HTTPException(
+                status_code=401, detail="You are not a member of this company"
+            )
+
+    async def get_member_company(self, company_id: int) -> Company:
+        email = await self.user_service.get_current_user_email(self.credentials)
+        user = await self.user_service.get_user_by_email(email=email)
+        company = self.db.query(Company).filter_by(id=company_id).first()
+        if not company:
+            raise HTTPException(status_code=401, detail="Company doesn't exist")
+        await self.validate_member(user=user, company=company)
+        return company
+
+    async def get_member_quiz(self, quiz_id: int) -> Quiz:
+        quiz = self.db.query(Quiz).filter_by(id=quiz_id).first()
+        if not quiz:
+            raise HTTPException(status_code=401, detail="Quiz doesn't exist")
+        await self.get_member_company(company_id=quiz.company_id)
+        return quiz
+
+    @staticmethod
+    async def get_leaderboard_rank(key: str, user_id: int) -> LeaderboardEntry:
+        entry = await leaderboard.rank(key=key, user_id=user_id)
+        if not entry:
+            raise HTTPException(status_code=404, detail="User is not ranked yet")
+        user_id, score, rank = entry
+        return LeaderboardEntry(user_id=user_id, score=score, rank=rank)
+
+    async def get_company_leaderboard(
+        self, company_id: int, limit: int = 10
+    ) -> FastJSONResponse:
+        company = await self.get_member_company(company_id=company_id)
+        await self.check_not_modified(
+            "company_leaderboard",
+            [leaderboard.company_scope(company.id)],
+            company_id=company.id,
+            limit=limit,
+        )
+        return self.respond(
+            [
+                LeaderboardEntry(user_id=user_id, score=score, rank=rank)
+                for user_id, score, rank in await leaderboard.top(
+                    key=leaderboard.company_key(company.id), limit=limit
+                )
+            ]
+        )
+
+    async def get_company_rank(self, company_id: int, user_id: int) -> LeaderboardEntry:
+        company = await self.get_member_company(company_id=company_id)
+        return await self.get_leaderboard_rank(
+            key=leaderboard.company_key(company.id), user_id=user_id
+        )
+
+    async def get_quiz_leaderboard(
+        self, quiz_id: int, limit: int = 10
+    ) -> FastJSONResponse:
+        quiz = await self.get_member_quiz(quiz_id=quiz_id)
+        await self.check_not_modified(
+            "quiz_leaderboard",
+            [leaderboard.quiz_scope(quiz.id)],
+            quiz_id=quiz.id,
+            limit=limit,
+        )
+        return self.respond(
+            [
+                LeaderboardEntry(user_id=user_id, score=score, rank=rank)
+                for user_id, score, rank in await leaderboard.top(
+                    key=leaderboard.quiz_key(quiz.id), limit=limit
+                )
+            ]
+        )
+
+    async def get_quiz_rank(self, quiz_id: int, user_id: int) -> LeaderboardEntry:
+        quiz = await self.get_member_quiz(quiz_id=quiz_id)
+        return await self.get_leaderboard_rank(
+            key=leaderboard.quiz_key(quiz.id), user_id=user_id
+        )
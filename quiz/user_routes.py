@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 from starlette import status
 
 from core.database import get_db
+from core.query_stats import query_budget
+from core.tracing import TracedRoute
 from fastapi import APIRouter, HTTPException, Depends, Security
 from quiz.schemas.user import (
     UserBase,
@@ -19,7 +21,7 @@ from .schemas.invite import InviteBase
 from .schemas.request import RequestBase
 from .service import UserService, auth_required
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 logger = logging.getLogger("quiz-logger")
 
@@ -49,7 +51,11 @@ async def user_detail(pk: int, db: Session = Depends(get_db)) -> UserInfo:
     return await user_repo.get_detail_user(pk=pk)
 
 
-@router.get("/", response_model=List[UserInfo])
+@router.get(
+    "/",
+    response_model=List[UserInfo],
+    dependencies=[Depends(query_budget(2))],
+)
 async def user_list(
     skip: int = 0, limit: int = 100, db: Session = Depends(get_db)
 ) -> List[UserInfo]:
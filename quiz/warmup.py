@@ -0,0 +1,133 @@
+import asyncio
+import datetime
+import logging
+import os
+import time
+from typing import Callable, Dict
+
+from sqlalchemy import func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, configure_mappers
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+
+from core.database import SessionLocal, engine, redis_db
+from core.utils import jwks_client, set_up
+from quiz.models.db_models import ResultRollup
+from quiz.service import QuizService
+
+logger = logging.getLogger("quiz-logger")
+
+WARMUP = os.getenv("WARMUP", "1") == "1"
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "5"))
+WARMUP_QUIZZES = int(os.getenv("WARMUP_QUIZZES", "50"))
+WARMUP_ACTIVE_DAYS = int(os.getenv("WARMUP_ACTIVE_DAYS", "7"))
+
+
+class WarmUp:
+    """Pays the first-request costs of a worker before it is reported ready.
+
+    Configures the mappers, opens pool and Redis connections, fetches the
+    JWKS and renders the questions of the most taken quizzes of the last
+    active_days into quiz_payloads. A failing step is logged and skipped, a
+    worker without a reachable JWKS can still serve our own tokens.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = WARMUP,
+        db_connections: int = WARMUP_DB_CONNECTIONS,
+        quizzes: int = WARMUP_QUIZZES,
+        active_days: int = WARMUP_ACTIVE_DAYS,
+    ):
+        self.enabled = enabled
+        self.db_connections = db_connections
+        self.quizzes = quizzes
+        self.active_days = active_days
+        self.done = not enabled
+        self.steps: Dict[str, dict] = {}
+        self._task = None
+
+    async def step(self, name: str, action: Callable, *args) -> None:
+        start = time.perf_counter()
+        try:
+            result = await action(*args)
+        except Exception as error:
+            logger.warning(f"Warm-up step {name} failed: {error!r}")
+            result = {"error": repr(error)}
+        self.steps[name] = {
+            "ms": round((time.perf_counter() - start) * 1000, 1),
+            **(result or {}),
+        }
+
+    async def run(
+        self, db_engine: Engine = engine, session_factory: Callable = SessionLocal
+    ) -> None:
+        await self.step("mappers", run_in_threadpool, configure_mappers)
+        await self.step("database", run_in_threadpool, self.open_connections, db_engine)
+        await self.step("redis", self.open_redis)
+        await self.step("jwks", run_in_threadpool, self.fetch_signing_keys)
+        await self.step("quizzes", self.render_active_quizzes, session_factory)
+        self.done = True
+        logger.info(f"Warm-up done {self.steps}")
+
+    def open_connections(self, db_engine: Engine) -> dict:
+        size = getattr(db_engine.pool, "size", None)
+        count = min(self.db_connections, size()) if size else 1
+        connections = [db_engine.connect() for _ in range(count)]
+        for connection in connections:
+            connection.close()
+        return {"connections": count}
+
+    @staticmethod
+    async def open_redis() -> dict:
+        await redis_db.ping()
+        return {}
+
+    @staticmethod
+    def fetch_signing_keys() -> dict:
+        return {"keys": len(jwks_client(set_up()["JWKS_URL"]).get_signing_keys())}
+
+    async def render_active_quizzes(self, session_factory: Callable) -> dict:
+        db: Session = session_factory()
+        try:
+            since = datetime.date.today() - datetime.timedelta(days=self.active_days)
+            quiz_ids = [
+                quiz_id
+                for quiz_id, in db.query(ResultRollup.quiz_id)
+                .filter(ResultRollup.day >= since)
+                .group_by(ResultRollup.quiz_id)
+                .order_by(func.sum(ResultRollup.results_count).desc())
+                .limit(self.quizzes)
+            ]
+            service = QuizService(db=db, credentials=None)
+            for quiz_id in quiz_ids:
+                await service.get_quiz_questions(quiz_id=quiz_id)
+        finally:
+            db.close()
+        return {"quizzes": len(quiz_ids)}
+
+    def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def shutdown(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+
+warm_up = WarmUp()
+
+
+async def live(request: Request) -> JSONResponse:
+    return JSONResponse({"status": "ok"})
+
+
+async def ready(request: Request) -> JSONResponse:
+    if not warm_up.done:
+        return JSONResponse({"status": "warming up"}, status_code=503)
+    return JSONResponse({"status": "ready", "warm_up": warm_up.steps})
@@ -1,4 +1,5 @@
 import datetime
+import uuid
 from typing import Any
 from typing import Generator
 
@@ -17,10 +18,18 @@ import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 # this is to include backend dir in sys.path so that we can import from db,main.py
+# routes going over their declared query budget fail the test
+os.environ.setdefault("QUERY_BUDGET_STRICT", "1")
+# tests build their data themselves, warm-up would only reach the dev database
+os.environ.setdefault("WARMUP", "0")
 
 from main import app
 from core.database import Base, get_db
 from core.auth import Auth
+from core.cache import analytics_cache, quiz_payloads
+from quiz.answer_stats import answer_stats
+from quiz.answer_store import answer_store
+from quiz.leaderboard import leaderboard
 from quiz.models.db_models import Company, Quiz, Question, Answer, User, Request, Result
 
 auth_handler = Auth()
@@ -44,6 +53,26 @@ def app(app=app) -> Generator[FastAPI, Any, None]:
     Base.metadata.drop_all(engine)
 
 
+@pytest.fixture(scope="function", autouse=True)
+def redis_namespace() -> Generator[None, Any, None]:
+    """
+    Keep Redis analytics, leaderboards and counters of one test away from the others.
+    """
+    namespace = uuid.uuid4().hex
+    analytics_cache.prefix = f"test-cache:{namespace}"
+    leaderboard.prefix = f"test-leaderboard:{namespace}"
+    answer_stats.prefix = f"test-answer-stats:{namespace}"
+    quiz_payloads.prefix = f"test-payload:{namespace}"
+    answer_store.prefix = f"test-answers:{namespace}"
+    quiz_payloads.clear()
+    yield
+    analytics_cache.prefix = "cache"
+    leaderboard.prefix = "leaderboard"
+    answer_stats.prefix = "answer_stats"
+    quiz_payloads.prefix = "payload"
+    answer_store.prefix = "answers"
+
+
 @pytest.fixture(scope="function")
 def db_session(app: FastAPI) -> Generator[SessionTesting, Any, None]:
     connection = engine.connect()
@@ -1,6 +1,14 @@
+import datetime
 import json
 
-from quiz.models.db_models import User
+import pytest
+
+from core.cache import analytics_cache
+from core.database import redis_db
+from quiz.answer_stats import answer_stats
+from quiz.item_analysis import correctness_matrix
+from quiz.leaderboard import leaderboard
+from quiz.models.db_models import Company, User, Question, Result, AnswerStat
 
 
 def test_quiz_avarege_result(
@@ -55,6 +63,33 @@ def test_list_employees_last_activity(
     ]
 
 
+def test_employees_last_activity_follows_results_in_other_companies(
+    token, client, db_session, quiz, user
+):
+    other_company = Company(name="other", description="other", owner=user.id)
+    other_company.employees = [user]
+    db_session.add(other_company)
+    db_session.commit()
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"analytic/list_employees_last_activity/{other_company.id}"
+    response = client.get(url, headers=headers)
+    assert response.json() == []
+    etag = response.headers["ETag"]
+
+    # the quiz belongs to the first company
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 1},
+            {"question_id": 2, "choosed_answer_id": 3},
+        ]
+    }
+    client.post(f"/quiz/pass/{quiz.id}", json.dumps(data), headers=headers)
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert [entry["user_id"] for entry in response.json()] == [user.id]
+
+
 def test_user_average_result(token, client, db_session, quiz):
     data = {
         "answers": [
@@ -112,3 +147,316 @@ def test_list_user_quizzes_last_activity(
 
     assert response.status_code == 200
     assert response.json() == [{"last_activity": datetime_now, "quiz_id": quiz.id}]
+
+
+def test_quiz_and_company_rollup(token, client, db_session, quiz, company):
+    for choosed_answer_id in (3, 4):
+        data = {
+            "answers": [
+                {"question_id": 1, "choosed_answer_id": 1},
+                {"question_id": 2, "choosed_answer_id": choosed_answer_id},
+            ]
+        }
+        client.post(
+            "/quiz/pass/1",
+            json.dumps(data),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    today = datetime.datetime.utcnow().date()
+    response = client.get(
+        f"analytic/quiz_rollup/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [
+        {
+            "period_start": today.isoformat(),
+            "count": 2,
+            "average_result": 75.0,
+            "min_result": 50.0,
+            "max_result": 100.0,
+        }
+    ]
+
+    response = client.get(
+        f"analytic/company_rollup/{company.id}?granularity=month",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["period_start"] == today.replace(day=1).isoformat()
+    assert response.json()[0]["count"] == 2
+
+
+def test_quiz_avarege_result_cached_until_new_result(
+    token, client, db_session, quiz, user, result
+):
+    response = client.get(
+        f"analytic/quiz_avarege_result/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert len(response.json()) == 1
+
+    db_session.add(
+        Result(
+            user_id=user.id,
+            company_id=quiz.company_id,
+            quiz_id=quiz.id,
+            result=0,
+            correct_answers=0,
+            attempts=1,
+            average_result=0,
+        )
+    )
+    db_session.commit()
+    response = client.get(
+        f"analytic/quiz_avarege_result/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert len(response.json()) == 1
+
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 1},
+            {"question_id": 2, "choosed_answer_id": 3},
+        ]
+    }
+    client.post(
+        "/quiz/pass/1", json.dumps(data), headers={"Authorization": f"Bearer {token}"}
+    )
+    response = client.get(
+        f"analytic/quiz_avarege_result/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert len(response.json()) == 3
+
+
+def test_quiz_statistics(token, client, db_session, quiz, user, company):
+    for score in (0, 40, 60, 80, 100):
+        db_session.add(
+            Result(
+                user_id=user.id,
+                company_id=company.id,
+                quiz_id=quiz.id,
+                result=score,
+                correct_answers=0,
+                attempts=1,
+                average_result=score,
+            )
+        )
+    db_session.commit()
+
+    response = client.get(
+        f"analytic/quiz_statistics/{quiz.id}?buckets=4&pass_mark=60",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "count": 5,
+        "average_result": 56.0,
+        "min_result": 0.0,
+        "max_result": 100.0,
+        "median": 60.0,
+        "p10": 16.0,
+        "p90": 92.0,
+        "pass_rate": 60.0,
+        "histogram": [
+            {"lower": 0.0, "upper": 25.0, "count": 1},
+            {"lower": 25.0, "upper": 50.0, "count": 1},
+            {"lower": 50.0, "upper": 75.0, "count": 1},
+            {"lower": 75.0, "upper": 100.0, "count": 2},
+        ],
+    }
+
+
+def test_company_and_quiz_leaderboard(token, client, db_session, quiz, company):
+    for choosed_answer_id in (3, 4):
+        data = {
+            "answers": [
+                {"question_id": 1, "choosed_answer_id": 1},
+                {"question_id": 2, "choosed_answer_id": choosed_answer_id},
+            ]
+        }
+        client.post(
+            "/quiz/pass/1",
+            json.dumps(data),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    response = client.get(
+        f"analytic/leaderboard/company/{company.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"user_id": 1, "score": 75.0, "rank": 1}]
+
+    response = client.get(
+        f"analytic/leaderboard/quiz/{quiz.id}/rank/1",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.json() == {"user_id": 1, "score": 75.0, "rank": 1}
+
+    response = client.get(
+        f"analytic/leaderboard/quiz/{quiz.id}/rank/2",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 404
+
+
+def test_leaderboard_etag_follows_sorted_set(token, client, db_session, quiz, company):
+    response = client.get(
+        f"analytic/leaderboard/quiz/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.json() == []
+    etag = response.headers["ETag"]
+
+    client.portal.call(leaderboard.record_result, 1, company.id, quiz.id, 50.0, 1, 2)
+
+    response = client.get(
+        f"analytic/leaderboard/quiz/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json() == [{"user_id": 1, "score": 50.0, "rank": 1}]
+
+
+def test_question_distribution(token, client, db_session, quiz):
+    for choosed_answer_id in (3, 4, 4):
+        data = {
+            "answers": [
+                {"question_id": 1, "choosed_answer_id": 1},
+                {"question_id": 2, "choosed_answer_id": choosed_answer_id},
+            ]
+        }
+        client.post(
+            "/quiz/pass/1",
+            json.dumps(data),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    response = client.get(
+        f"analytic/question_distribution/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    before_flush = response.json()
+    assert before_flush[1] == {
+        "question_id": 2,
+        "question_title": "test2",
+        "answers_count": 3,
+        "percent_correct": pytest.approx(100 / 3),
+        "answers": [
+            {"answer_id": 3, "answer_text": "test", "is_correct": True, "count": 1},
+            {"answer_id": 4, "answer_text": "test", "is_correct": False, "count": 2},
+        ],
+    }
+    assert before_flush[0]["percent_correct"] == 100
+
+    assert client.portal.call(answer_stats.flush, db_session) == 1
+    assert db_session.query(AnswerStat).filter_by(answer_id=4).first().count == 2
+
+    response = client.get(
+        f"analytic/question_distribution/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.json() == before_flush
+    etag = response.headers["ETag"]
+
+    # what update_quiz does
+    db_session.query(Question).filter_by(quiz_id=quiz.id).update(
+        {"question_title": "renamed"}
+    )
+    db_session.commit()
+    client.portal.call(analytics_cache.bump, f"quiz_content:{quiz.id}")
+    response = client.get(
+        f"analytic/question_distribution/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}", "If-None-Match": etag},
+    )
+    assert response.status_code == 200
+    assert response.json()[0]["question_title"] == "renamed"
+
+
+def test_item_analysis(token, client, db_session, quiz):
+    for first, second in ((1, 3), (1, 4), (2, 4), (2, 4)):
+        data = {
+            "answers": [
+                {"question_id": 1, "choosed_answer_id": first},
+                {"question_id": 2, "choosed_answer_id": second},
+            ]
+        }
+        client.post(
+            "/quiz/pass/1",
+            json.dumps(data),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+
+    response = client.get(
+        f"analytic/item_analysis/{quiz.id}",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    analysis = response.json()
+    assert analysis["submissions"] == 4
+    assert analysis["cronbach_alpha"] == pytest.approx(8 / 11)
+    assert analysis["items"][0] == {
+        "question_id": 1,
+        "difficulty": 0.5,
+        "discrimination": 1.0,
+        "point_biserial": pytest.approx(1 / 3**0.5),
+    }
+    assert analysis["items"][1]["difficulty"] == 0.25
+
+
+def test_correctness_matrix_aligns_question_layouts():
+    rows = [("1,2", "1001"), ("1,2,3", "011")]
+    assert correctness_matrix(rows, [3, 2]).tolist() == [[0, 0], [1, 0], [1, 1]]
+
+
+def test_analytics_not_modified_until_new_result(token, client, quiz):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("analytic/quiz_statistics/1", headers=headers)
+    etag = response.headers["ETag"]
+    response = client.get(
+        "analytic/quiz_statistics/1", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 304
+
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 1},
+            {"question_id": 2, "choosed_answer_id": 3},
+        ]
+    }
+    client.post("/quiz/pass/1", json.dumps(data), headers=headers)
+    response = client.get(
+        "analytic/quiz_statistics/1", headers={**headers, "If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+
+
+def test_stale_analytics_keep_their_own_etag(token, client, quiz):
+    headers = {"Authorization": f"Bearer {token}"}
+    url = f"analytic/quiz_avarege_result/{quiz.id}"
+    response = client.get(url, headers=headers)
+    etag = response.headers["ETag"]
+
+    # another worker is rebuilding the entry of the new version
+    client.portal.call(analytics_cache.bump, f"quiz:{quiz.id}")
+    versions = client.portal.call(analytics_cache.get_versions, f"quiz:{quiz.id}")
+    key = analytics_cache.entry_key(
+        "quiz_average_results", {"quiz_id": quiz.id}, versions
+    )
+    client.portal.call(redis_db.set, f"{key}:lock", "held")
+    try:
+        response = client.get(url, headers={**headers, "If-None-Match": etag})
+    finally:
+        client.portal.call(redis_db.delete, f"{key}:lock")
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+
+    response = client.get(url, headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
@@ -0,0 +1,292 @@
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import zlib
+
+import pytest
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, text
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from core.middleware import CompressionMiddleware, RequestIdMiddleware
+from core import profiling
+from core.query_stats import QueryBudgetExceeded, QueryStatsMiddleware, query_budget
+from core.slow_queries import slow_query_log
+from core.structured_logging import (
+    JsonFormatter,
+    QueueLogging,
+    RequestContextFilter,
+    SamplingFilter,
+    SharedRotatingFileHandler,
+)
+
+
+def big(request):
+    return PlainTextResponse("x" * 2000)
+
+
+def small(request):
+    return PlainTextResponse("x" * 10)
+
+
+def encoded(request):
+    return PlainTextResponse("x" * 2000, headers={"Content-Encoding": "identity"})
+
+
+def stream(request):
+    async def rows():
+        for number in range(3):
+            yield f"row {number}\n" * 100
+
+    return StreamingResponse(rows(), media_type="text/csv")
+
+
+app = Starlette(
+    routes=[
+        Route("/big", big),
+        Route("/small", small),
+        Route("/encoded", encoded),
+        Route("/stream", stream),
+        Route("/excluded/big", big),
+    ]
+)
+compressed_app = CompressionMiddleware(
+    app, minimum_size=1024, exclude_paths=["/excluded"]
+)
+
+
+def test_compression_threshold_and_opt_outs():
+    client = TestClient(compressed_app)
+    headers = {"Accept-Encoding": "gzip"}
+
+    response = client.get("/big", headers=headers)
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.text == "x" * 2000
+
+    for path in ("/small", "/excluded/big"):
+        response = client.get(path, headers=headers)
+        assert "content-encoding" not in response.headers
+
+    response = client.get("/encoded", headers=headers)
+    assert response.headers["content-encoding"] == "identity"
+
+    response = client.get("/big", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+
+
+def test_streamed_chunks_are_flushed():
+    messages = []
+
+    async def receive():
+        # nothing to read and the client never disconnects
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/stream",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    asyncio.run(compressed_app(scope, receive, send))
+
+    start, *bodies = messages
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    assert decompressor.decompress(bodies[0]["body"]) == b"row 0\n" * 100
+    assert b"".join(
+        decompressor.decompress(body["body"]) for body in bodies[1:]
+    ) == b"".join(f"row {number}\n".encode() * 100 for number in (1, 2))
+
+
+def test_query_budget_in_strict_mode():
+    engine = create_engine("sqlite://")
+    budget_app = FastAPI()
+
+    @budget_app.get("/one", dependencies=[Depends(query_budget(1))])
+    def one():
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+        return {}
+
+    @budget_app.get("/two", dependencies=[Depends(query_budget(1))])
+    def two():
+        with engine.connect() as connection:
+            connection.execute(text("select 1"))
+            connection.execute(text("select 2"))
+        return {}
+
+    client = TestClient(QueryStatsMiddleware(budget_app, strict=True))
+    response = client.get("/one")
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
+
+    with pytest.raises(QueryBudgetExceeded):
+        client.get("/two")
+
+    lenient_client = TestClient(QueryStatsMiddleware(budget_app, strict=False))
+    assert lenient_client.get("/two").status_code == 200
+
+
+def test_slow_queries_are_logged_with_route(monkeypatch):
+    engine = create_engine("sqlite://")
+    slow_app = FastAPI()
+
+    @slow_app.get("/slow")
+    def slow():
+        with engine.connect() as connection:
+            connection.execute(text("select :value"), {"value": 42})
+        return {}
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    # in place of the file handler, which would write to the working directory
+    monkeypatch.setattr(logging.getLogger("slow-query-logger"), "handlers", [handler])
+    monkeypatch.setattr(slow_query_log, "threshold_ms", 0)
+    TestClient(QueryStatsMiddleware(slow_app)).get("/slow")
+
+    entry = json.loads(records[-1].getMessage())
+    assert entry["event"] == "slow_query"
+    assert entry["route"] == "GET /slow"
+    assert entry["statement"] == "select ?"
+    assert "42" in entry["parameters"]
+
+
+def test_request_log_records_are_structured_and_queued(monkeypatch):
+    logged_app = FastAPI()
+
+    @logged_app.get("/logged")
+    def logged():
+        return {}
+
+    records = []
+    handler = logging.Handler()
+    handler.emit = records.append
+    test_logger = logging.getLogger("structured-logging-test")
+    test_logger.addHandler(handler)
+    test_logger.addFilter(RequestContextFilter())
+    test_logger.addFilter(SamplingFilter({"DEBUG": 0}))
+    test_logger.setLevel(logging.DEBUG)
+    queue_logging = QueueLogging(["structured-logging-test"])
+    queue_logging.start()
+    monkeypatch.setattr("core.query_stats.logger", test_logger)
+    try:
+        client = TestClient(RequestIdMiddleware(QueryStatsMiddleware(logged_app)))
+        response = client.get("/logged", headers={"X-Request-ID": "abc-123"})
+        generated = client.get("/logged").headers["X-Request-ID"]
+        test_logger.debug("sampled away")
+    finally:
+        queue_logging.stop()
+        test_logger.removeHandler(handler)
+        test_logger.filters.clear()
+
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert [record.request_id for record in records] == ["abc-123", generated]
+    entry = json.loads(JsonFormatter().format(records[0]))
+    assert entry["request_id"] == "abc-123"
+    assert entry["status"] == 200
+    assert entry["queries"] == 0
+    assert entry["message"].startswith("GET /logged 200")
+
+
+def test_workers_share_a_rotating_log_file(tmp_path):
+    path = tmp_path / "shared.log"
+    # two handlers on one file stand in for two workers
+    workers = [
+        SharedRotatingFileHandler(str(path), maxBytes=100, backupCount=100, delay=True)
+        for _ in range(2)
+    ]
+    for worker in workers:
+        worker.setFormatter(logging.Formatter("%(message)s"))
+    try:
+        for number in range(40):
+            record = logging.makeLogRecord({"msg": f"record {number:02}"})
+            workers[number % 2].emit(record)
+    finally:
+        for worker in workers:
+            worker.close()
+
+    # oldest backup first, every record went to the current file of its time
+    backups = sorted(
+        tmp_path.glob("shared.log.*[0-9]"),
+        key=lambda backup: int(backup.suffix[1:]),
+        reverse=True,
+    )
+    files = [*backups, path]
+    lines = [line for file in files for line in file.read_text().splitlines()]
+    assert lines == [f"record {number:02}" for number in range(40)]
+    assert len(files) > 2
+    assert all(file.stat().st_size <= 100 for file in files)
+
+
+def test_requests_with_signed_header_are_profiled(tmp_path, monkeypatch):
+    profiled_app = FastAPI()
+
+    @profiled_app.get("/work")
+    async def work():
+        return {"total": sum(range(100000))}
+
+    store = profiling.ProfileStore(str(tmp_path))
+    monkeypatch.setattr(profiling, "PROFILING_SECRET", "secret")
+    monkeypatch.setattr(profiling, "profile_store", store)
+    profiled_app.add_route("/profiles/{profile_id}", profiling.profile)
+    client = TestClient(
+        RequestIdMiddleware(
+            profiling.ProfilingMiddleware(profiled_app, secret="secret", store=store)
+        )
+    )
+    token = profiling.profile_token(60, "secret")
+
+    assert "X-Profile-URL" not in client.get("/work").headers
+    forged = {"X-Profile": profiling.profile_token(60, "guess")}
+    assert "X-Profile-URL" not in client.get("/work", headers=forged).headers
+
+    response = client.get("/work", headers={"X-Profile": token})
+    url = response.headers["X-Profile-URL"]
+    assert url == f"/profiles/{response.headers['X-Request-ID']}"
+
+    assert client.get(url).status_code == 403
+    tree = client.get(f"{url}?format=text", headers={"X-Profile": token})
+    assert tree.status_code == 200
+    assert "work" in tree.text
+    assert (
+        client.get("/profiles/missing", headers={"X-Profile": token}).status_code == 404
+    )
+
+
+def test_gunicorn_config_puts_metrics_in_multiprocess_mode(tmp_path):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    script = """
+import runpy
+runpy.run_path("gunicorn.conf.py")
+from prometheus_client import CollectorRegistry, multiprocess, values
+from core.metrics import CACHE_REQUESTS
+CACHE_REQUESTS.labels("payload", "hit").inc()
+registry = CollectorRegistry()
+multiprocess.MultiProcessCollector(registry)
+print(values.ValueClass.__name__)
+print(registry.get_sample_value(
+    "cache_requests_total", {"cache": "payload", "result": "hit"}
+))
+"""
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(tmp_path / "metrics"))
+    output = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=root,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout.split()
+
+    assert output == ["MmapedValue", "1.0"]
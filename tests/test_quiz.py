@@ -1,7 +1,18 @@
+import asyncio
+import datetime
 import json
+import os
+import tempfile
+import time
 
+from sqlalchemy.orm import Session
 
-from quiz.models.db_models import Result
+from core.cache import analytics_cache, quiz_payloads
+from core.tracing import SpanExporter, tracer
+from quiz import warmup
+from quiz.answer_store import answer_store
+from quiz.export_jobs import ExportJobQueue, export_jobs
+from quiz.models.db_models import Question, Result, ResultRollup
 
 
 def test_quiz_create_update_delete(client, token, company):
@@ -66,6 +77,40 @@ def test_quiz_list_and_info(quiz, token, client):
     assert response.json() == {"description": "test_descr", "id": 1, "title": "test"}
 
 
+def test_quiz_reads_support_etags(quiz, token, client):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/quiz/info/1", headers=headers)
+    etag = response.headers["ETag"]
+
+    response = client.get("/quiz/info/1", headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+
+    response = client.get("/quiz/1", headers=headers)
+    list_etag = response.headers["ETag"]
+    question = {
+        "question_title": "string",
+        "answers": [
+            {"answer_text": "string", "is_correct": False},
+            {"answer_text": "string", "is_correct": True},
+        ],
+    }
+    data = {
+        "id": 0,
+        "title": "another",
+        "description": "string",
+        "questions": [question, question],
+    }
+    response = client.post("/quiz/create/1", json.dumps(data), headers=headers)
+    assert response.status_code == 200
+
+    response = client.get("/quiz/1", headers={**headers, "If-None-Match": list_etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+    assert response.headers["ETag"] != list_etag
+
+
 def test_quiz_read_questions(quiz, token, client):
     response = client.get(
         "/quiz/read_question/1", headers={"Authorization": f"Bearer {token}"}
@@ -100,6 +145,27 @@ def test_quiz_read_questions(quiz, token, client):
     assert response.json() == {"detail": "Quiz with id not found"}
 
 
+def test_quiz_questions_payload_cached_until_quiz_changes(
+    quiz, token, client, db_session
+):
+    headers = {"Authorization": f"Bearer {token}"}
+    response = client.get("/quiz/read_question/1", headers=headers)
+    assert response.headers["content-type"] == "application/json"
+
+    db_session.query(Question).filter_by(id=1).update({"question_title": "edited"})
+    db_session.commit()
+    response = client.get("/quiz/read_question/1", headers=headers)
+    assert response.json()["questions"][0]["question_title"] == "test1"
+
+    quiz_payloads.clear()
+    response = client.get("/quiz/read_question/1", headers=headers)
+    assert response.json()["questions"][0]["question_title"] == "test1"
+
+    client.portal.call(analytics_cache.bump, "quiz_content:1")
+    response = client.get("/quiz/read_question/1", headers=headers)
+    assert response.json()["questions"][0]["question_title"] == "edited"
+
+
 def test_quiz_pass(quiz, token, client, db_session, datetime_now, user):
     data = {
         "answers": [
@@ -134,3 +200,241 @@ def test_quiz_pass(quiz, token, client, db_session, datetime_now, user):
     )
     assert user.average_result == 100
     assert user.average_result == user.correct_answers / user.passed_questions * 100
+
+
+def test_export_company_answers(
+    quiz, token, client, db_session, company, user, monkeypatch
+):
+    async def scan(*args, **kwargs):
+        raise AssertionError("exports read their keys directly")
+
+    monkeypatch.setattr(answer_store, "get_answer_keys", scan)
+    company.employees = [user]
+    db_session.commit()
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 1},
+            {"question_id": 2, "choosed_answer_id": 4},
+        ]
+    }
+    client.post(
+        "/quiz/pass/1", json.dumps(data), headers={"Authorization": f"Bearer {token}"}
+    )
+
+    response = client.post(
+        "/quiz/export/company/1", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.json()["company_id"] == 1
+
+    for _ in range(50):
+        response = client.get(
+            f"/quiz/export/{job_id}", headers={"Authorization": f"Bearer {token}"}
+        )
+        if response.json()["status"] == "done":
+            break
+        time.sleep(0.1)
+    assert response.status_code == 200
+    assert response.json()["status"] == "done"
+
+    response = client.get(
+        f"/quiz/export/{job_id}/download",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert sorted(response.text.splitlines()) == [
+        "1,1,test",
+        "1,2,test",
+        "User_id,Question_id,Answer",
+    ]
+
+    os.remove(export_jobs.file_path(job_id))
+    response = client.get(
+        f"/quiz/export/{job_id}/download",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 410
+
+    response = client.get(
+        "/quiz/export/unknown", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 404
+
+
+def test_export_jobs_finish_before_shutdown(client, tmp_path):
+    queue = ExportJobQueue(export_dir=str(tmp_path), drain_timeout=5)
+
+    async def collect():
+        await asyncio.sleep(0.2)
+        return [[1, 1, "test"]]
+
+    async def submit_and_shut_down():
+        job = await queue.submit(1, ["User_id", "Question_id", "Answer"], collect)
+        await queue.shutdown()
+        return await queue.get(job["id"])
+
+    job = client.portal.call(submit_and_shut_down)
+    assert job["status"] == "done"
+    assert (tmp_path / f"{job['id']}.csv").exists()
+
+    queue.drain_timeout = 0
+    job = client.portal.call(submit_and_shut_down)
+    assert job["status"] == "failed"
+    assert job["error"] == "cancelled by worker shutdown"
+
+
+def test_export_jobs_of_a_company_are_bounded_across_workers(client, tmp_path):
+    company_id = int(time.time() * 1000)
+    workers = [
+        ExportJobQueue(
+            export_dir=str(tmp_path), concurrency_per_company=1, slot_poll_interval=0.01
+        )
+        for _ in range(2)
+    ]
+    running = []
+    overlaps = []
+
+    async def collect():
+        running.append(1)
+        overlaps.append(len(running))
+        await asyncio.sleep(0.1)
+        running.pop()
+        return []
+
+    async def submit_to_each_worker():
+        jobs = [await worker.submit(company_id, [], collect) for worker in workers]
+        for worker in workers:
+            await worker.wait()
+        return [await workers[0].get(job["id"]) for job in jobs]
+
+    jobs = client.portal.call(submit_to_each_worker)
+    assert [job["status"] for job in jobs] == ["done", "done"]
+    assert overlaps == [1, 1]
+
+
+def test_employee_answers_export(
+    quiz, token, client, db_session, company, user, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    company.employees = [user]
+    db_session.commit()
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 2},
+            {"question_id": 2, "choosed_answer_id": 3},
+        ]
+    }
+    client.post(
+        "/quiz/pass/1", json.dumps(data), headers={"Authorization": f"Bearer {token}"}
+    )
+
+    response = client.get(
+        "/quiz/get_answers_for_company_employee/1/1",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == 200
+    assert response.text.splitlines() == [
+        "User_id,Question_id,Answer",
+        "1,1,test",
+        "1,2,test",
+    ]
+    # the file of the response is removed once it is sent
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_metrics_label_requests_by_route_template(quiz, token, client):
+    headers = {"Authorization": f"Bearer {token}"}
+    client.get("/quiz/read_question/1", headers=headers)
+    client.get("/quiz/read_question/1", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/quiz/read_question/{quiz_id}",status="200"}'
+    ) in response.text
+    assert 'cache_requests_total{cache="payload",result="local_hit"}' in response.text
+    assert 'redis_command_duration_seconds_count{command="MGET"}' in response.text
+
+
+def test_warm_up_renders_active_quizzes_before_ready(
+    client, db_session, user, quiz, monkeypatch
+):
+    db_session.add(
+        ResultRollup(
+            quiz_id=quiz.id,
+            user_id=user.id,
+            day=datetime.date.today(),
+            company_id=quiz.company_id,
+            results_count=1,
+            results_sum=50,
+            results_min=50,
+            results_max=50,
+        )
+    )
+    db_session.commit()
+    warm_up = warmup.WarmUp(enabled=True)
+    monkeypatch.setattr(warmup, "warm_up", warm_up)
+
+    assert client.get("/live").status_code == 200
+    assert client.get("/ready").status_code == 503
+
+    # the warm-up closes its session, it gets one of its own on the connection
+    # holding the test data
+    connection = db_session.get_bind()
+    client.portal.call(warm_up.run, connection, lambda: Session(bind=connection))
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["warm_up"]["quizzes"]["quizzes"] == 1
+    assert "error" in response.json()["warm_up"]["jwks"]
+    assert any(
+        key.startswith(f"{quiz_payloads.prefix}:quiz_questions:{quiz.id}:")
+        for key in quiz_payloads._entries
+    )
+    # closing the warm-up session left the test data alone
+    assert db_session.query(ResultRollup).filter_by(quiz_id=quiz.id).count() == 1
+
+
+class MemoryExporter(SpanExporter):
+    def __init__(self):
+        self.spans = []
+
+    def export(self, spans):
+        self.spans.extend(spans)
+
+
+def test_quiz_pass_is_traced_through_all_layers(quiz, token, client, user, monkeypatch):
+    exporter = MemoryExporter()
+    monkeypatch.setattr(tracer, "exporter", exporter)
+    data = {
+        "answers": [
+            {"question_id": 1, "choosed_answer_id": 1},
+            {"question_id": 2, "choosed_answer_id": 3},
+        ]
+    }
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    response = client.post(
+        "/quiz/pass/1",
+        json.dumps(data),
+        headers={
+            "Authorization": f"Bearer {token}",
+            "traceparent": f"00-{trace_id}-00f067aa0ba902b7-01",
+        },
+    )
+
+    assert response.status_code == 200
+    assert response.headers["X-Trace-Id"] == trace_id
+    assert response.headers["traceparent"].startswith(f"00-{trace_id}-")
+    spans = {span["name"]: span for span in exporter.spans}
+    assert {span["trace_id"] for span in exporter.spans} == {trace_id}
+    root = spans["POST /quiz/pass/{quiz_id}"]
+    assert root["parent_id"] == "00f067aa0ba902b7"
+    assert root["attributes"]["status"] == 200
+    route = spans["route /quiz/pass/{quiz_id}"]
+    assert route["parent_id"] == root["span_id"]
+    assert spans["QuizService.pass_quiz"]["parent_id"] == route["span_id"]
+    assert "VerifyToken.verify" in spans
+    kinds = {span["kind"] for span in exporter.spans}
+    assert {"server", "route", "internal", "db", "redis"} <= kinds
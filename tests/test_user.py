@@ -1,6 +1,7 @@
 import json
 
 from core.auth import Auth
+from core.local_idp import LocalIdentityProvider
 
 auth_handler = Auth()
 
@@ -114,3 +115,20 @@ def test_about_me_with_auth0_token(client, token):
 
     assert wrong_token_response.status_code == 401
     assert wrong_token_response.json()["detail"] == "Invalid token"
+
+
+def test_about_me_with_local_idp_token(client, user, tmp_path, monkeypatch):
+    idp = LocalIdentityProvider(tmp_path)
+    idp.init()
+    monkeypatch.setenv("JWKS_URL", idp.jwks_url)
+
+    token = idp.mint(email=user.email)
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 200
+    assert response.json()["email"] == "user@example.com"
+
+    token = idp.mint(email=user.email, claims={"aud": "someone.else.com"})
+    response = client.get("/user/me", headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401